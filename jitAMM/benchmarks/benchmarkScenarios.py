@@ -0,0 +1,220 @@
+import argparse
+import copy
+import math
+import sys
+import time
+import tracemalloc
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.src.libraries import TickMath
+from jitAMM.src.ChainflipPool import ChainflipPool
+from jitAMM.src.PoolReplay import ReplayLedger
+from jitAMM.src.libraries import CostMeter
+from jitAMM.src.libraries.SharedLimitOrder import getMaxTickLO
+
+# Adversarial scenarios: books an attacker can shape to make the pool calls as expensive as possible. Each scenario
+# is built for a size n, and a swap through the shaped book plus the mint and burn of a limit order in it are timed,
+# traced for memory (peak bytes allocated during the call) and metered (see CostMeter).
+# The checks compare the operation counts at sizes n and 2n, which unlike timings are deterministic: a count
+# growing as n**e has a growth exponent e = log2(count(2n) / count(n)). Any exponent above LINEAR (or above the
+# known exponents in SUPERLINEAR) fails the check, so a change making a scenario superlinear is caught.
+# Usage: python -m jitAMM.benchmarks.benchmarkScenarios [--sizes 64 128 256] [--fullRange] [--check]
+
+CALLS = ["swap", "mintLimitOrder", "burnLimitOrder"]
+
+## Limit orders with the minimum amount that can be swapped
+DUST = 1000
+
+## Maximum growth exponent of a linear count
+LINEAR = 1.1
+
+## Scenario, call and counter => maximum growth exponent, for the counts that are already superlinear. Crossing a
+## limit tick rescans its side of the book to find the new best tick (findBestLimitTick) and every range step scans
+## the range ticks (UniswapPool.nextTick), so the entries scanned grow quadratically with the ticks crossed.
+SUPERLINEAR = {
+    ("dustLadder", "swap", "tickScans"): 2.1,
+    ("alternatingBooks", "swap", "tickScans"): 2.1,
+}
+
+
+def createPool():
+    # Accounts are created on demand and balances are not checked
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ReplayLedger(TEST_TOKENS),
+    )
+    pool.initialize(encodePriceSqrt(1, 1))
+    return pool
+
+
+def swapDown(pool, ticks):
+    return (
+        "swapper",
+        True,
+        expandTo18Decimals(10**6),
+        TickMath.getSqrtRatioAtTick(-(ticks + 1) * pool.tickSpacing),
+    )
+
+
+# Each scenario returns the pool, the swap arguments and the limit order (token, owner, tick) minted and burnt.
+# The swap is zeroForOne, crossing the shaped token1 book below the current tick.
+
+
+# A dust limit order from a different owner on each of the `n` spaced ticks on both sides of the current tick
+def dustLadder(n):
+    pool = createPool()
+    for i in range(1, n + 1):
+        pool.mintLimitOrder(TEST_TOKENS[1], "lp" + str(i), -i * pool.tickSpacing, DUST)
+        pool.mintLimitOrder(TEST_TOKENS[0], "lp" + str(i), i * pool.tickSpacing, DUST)
+    return pool, swapDown(pool, n), (TEST_TOKENS[1], "attacker", -pool.tickSpacing)
+
+
+# `n` owners with a dust limit order on the same tick
+def crowdedTick(n):
+    pool = createPool()
+    for i in range(n):
+        pool.mintLimitOrder(TEST_TOKENS[1], "lp" + str(i), -pool.tickSpacing, DUST)
+    return pool, swapDown(pool, 1), (TEST_TOKENS[1], "attacker", -pool.tickSpacing)
+
+
+# `n` limit ticks interleaved with `n` range ticks so the swap switches between the books on every step
+def alternatingBooks(n):
+    pool = createPool()
+    for i in range(1, n + 1):
+        pool.mintLimitOrder(
+            TEST_TOKENS[1],
+            "lp" + str(i),
+            -(2 * i - 1) * pool.tickSpacing,
+            expandTo18Decimals(1),
+        )
+        pool.mint(
+            "lp",
+            -2 * i * pool.tickSpacing,
+            2 * i * pool.tickSpacing,
+            expandTo18Decimals(1),
+        )
+    return pool, swapDown(pool, 2 * n), (TEST_TOKENS[1], "attacker", -pool.tickSpacing)
+
+
+SCENARIOS = {
+    "dustLadder": dustLadder,
+    "crowdedTick": crowdedTick,
+    "alternatingBooks": alternatingBooks,
+}
+
+
+## @notice Size of the dustLadder scenario covering every spaced tick from getMinTickLO to getMaxTickLO.
+def fullRangeSize():
+    tickSpacing = TICK_SPACINGS[FeeAmount.MEDIUM]
+    return getMaxTickLO(tickSpacing) // tickSpacing
+
+
+# Runs the mint, the burn and the swap on a copy of the scenario pool.
+# mode: "time" (latency in ns), "memory" (peak bytes allocated) or "count" (CostMeter counts)
+# Returns a dictionary call => measure
+def runScenario(scenario, mode):
+    (pool, swapArgs, (token, owner, tick)) = scenario
+    pool = copy.deepcopy(pool)
+    meter = CostMeter.CostMeter()
+    results = dict()
+
+    def measure(call, function, *args):
+        if mode == "time":
+            start = time.perf_counter_ns()
+            function(*args)
+            results[call] = time.perf_counter_ns() - start
+        elif mode == "memory":
+            tracemalloc.start()
+            function(*args)
+            results[call] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            with meter.attach(pool):
+                function(*args)
+            results[call] = dict(meter.counts)
+            meter.counts = dict.fromkeys(CostMeter.COUNTERS, 0)
+
+    measure("mintLimitOrder", pool.mintLimitOrder, token, owner, tick, DUST)
+    measure("burnLimitOrder", pool.burnLimitOrder, token, owner, tick, DUST)
+    measure("swap", pool.swap, *swapArgs)
+    return results
+
+
+## @notice Growth exponents of the operation counts of a scenario between sizes n and 2n.
+## @return exponents Dictionary (call, counter) => exponent, for the counts that are not zero at size n
+def growthExponents(name, n):
+    counts = runScenario(SCENARIOS[name](n), "count")
+    countsDouble = runScenario(SCENARIOS[name](2 * n), "count")
+    exponents = dict()
+    for call in CALLS:
+        for counter in CostMeter.COUNTERS:
+            if counts[call][counter] > 0:
+                exponents[(call, counter)] = math.log2(
+                    countsDouble[call][counter] / counts[call][counter]
+                )
+    return exponents
+
+
+## @notice Checks that the operation counts of a scenario don't grow faster than the thresholds.
+## @return failures List of (call, counter, exponent, threshold) exceeding the thresholds
+def checkScenario(name, n):
+    failures = []
+    for (call, counter), exponent in growthExponents(name, n).items():
+        threshold = SUPERLINEAR.get((name, call, counter), LINEAR)
+        if exponent > threshold:
+            failures.append((call, counter, round(exponent, 2), threshold))
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adversarial pool scenarios")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument(
+        "--fullRange",
+        action="store_true",
+        help="also run the dust ladder over the whole limit order tick range",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="exit with an error if any count grows faster than its threshold",
+    )
+    arguments = parser.parse_args()
+
+    runs = [(name, size) for name in arguments.scenarios for size in arguments.sizes]
+    if arguments.fullRange:
+        runs.append(("dustLadder", fullRangeSize()))
+
+    print(
+        "scenario".ljust(18),
+        "size".rjust(6),
+        "call".ljust(16),
+        "ms".rjust(10),
+        "KiB".rjust(10),
+    )
+    for name, size in runs:
+        scenario = SCENARIOS[name](size)
+        latency = runScenario(scenario, "time")
+        memory = runScenario(scenario, "memory")
+        for call in CALLS:
+            print(
+                name.ljust(18),
+                str(size).rjust(6),
+                call.ljust(16),
+                str(round(latency[call] / 1e6, 3)).rjust(10),
+                str(round(memory[call] / 1024, 1)).rjust(10),
+            )
+
+    if arguments.check:
+        failed = False
+        for name in arguments.scenarios:
+            for failure in checkScenario(name, min(arguments.sizes)):
+                print("superlinear:", name, *failure)
+                failed = True
+        sys.exit(1 if failed else 0)
@@ -0,0 +1,80 @@
+import argparse
+import os
+import tempfile
+import time
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.src.libraries import TickMath
+from jitAMM.src.ChainflipPool import ChainflipPool
+from jitAMM.src.PoolReplay import ReplayLedger
+
+# Benchmark of ChainflipPool.save and ChainflipPool.load compared to rebuilding the pool by minting every position.
+# Usage: python -m jitAMM.benchmarks.benchmarkSnapshot [--positions 1000000]
+
+
+def buildPool(positions, rangeFraction):
+    # Accounts are created on demand and balances are not checked
+    ledger = ReplayLedger(TEST_TOKENS)
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    pool.initialize(encodePriceSqrt(1, 1))
+    tickSpacing = pool.tickSpacing
+
+    rangePositions = int(positions * rangeFraction)
+    for i in range(rangePositions):
+        width = (i % 1000 + 1) * tickSpacing
+        pool.mint("range" + str(i // 1000), -width, width, expandTo18Decimals(1))
+
+    # Limit orders on 1000 ticks on each side of the current tick
+    for i in range(positions - rangePositions):
+        tick = (i // 2 % 1000 + 1) * tickSpacing
+        isToken0 = i % 2 == 0
+        pool.mintLimitOrder(
+            TEST_TOKENS[0] if isToken0 else TEST_TOKENS[1],
+            "limit" + str(i // 2000),
+            tick if isToken0 else -tick,
+            expandTo18Decimals(1),
+        )
+
+    # Partially swap some ticks so oneMinusPercSwap values are not trivial
+    pool.swap("swapper", True, expandTo18Decimals(100), TickMath.MIN_SQRT_RATIO + 1)
+    pool.swap("swapper", False, expandTo18Decimals(100), TickMath.MAX_SQRT_RATIO - 1)
+    return pool, ledger
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pool snapshot benchmark")
+    parser.add_argument("--positions", type=int, default=1000000)
+    parser.add_argument(
+        "--rangeFraction",
+        type=float,
+        default=0.1,
+        help="fraction of the positions that are range orders",
+    )
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    (pool, ledger) = buildPool(arguments.positions, arguments.rangeFraction)
+    buildTime = time.perf_counter() - start
+    print("positions:            ", len(pool.positions) + len(pool.limitOrders))
+    print("build by minting (s): ", round(buildTime, 2))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "pool.snapshot")
+
+        start = time.perf_counter()
+        pool.save(path)
+        print("save (s):             ", round(time.perf_counter() - start, 2))
+        print("snapshot size (MB):   ", round(os.path.getsize(path) / 2**20, 2))
+
+        start = time.perf_counter()
+        loadedPool = ChainflipPool.load(path, ledger)
+        print("load (s):             ", round(time.perf_counter() - start, 2))
+
+    assert loadedPool.stateHash() == pool.stateHash()
+    print("state hash:           ", pool.stateHash())
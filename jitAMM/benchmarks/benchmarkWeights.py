@@ -0,0 +1,243 @@
+import argparse
+import copy
+import json
+import statistics
+import time
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.src.libraries import TickMath
+from jitAMM.src.ChainflipPool import ChainflipPool
+from jitAMM.src.PoolReplay import ReplayLedger
+from jitAMM.src.libraries import CostMeter
+
+# Weight benchmarks of the pool calls, in the style of Substrate's benchmarking: every component the cost of a call
+# depends on is varied one at a time, the calls are timed and metered (see CostMeter) for each value, and a
+# linear model base + slope * component is fitted to the timings and to every counter. The models are the weights
+# to charge for the worst case of each component. A model is flagged superlinear if its slope over the upper half
+# of the component values is more than SUPERLINEAR_RATIO times its slope over the lower half.
+# Usage: python -m jitAMM.benchmarks.benchmarkWeights [--values 8 16 32 64] [--output weights.json]
+
+FUNCTIONS = ["swap", "burnCrossedTicksAndPositions", "mintLimitOrder", "burnLimitOrder"]
+
+SUPERLINEAR_RATIO = 2
+# Fraction of the worst case the upper half growth must exceed to flag a model as superlinear
+NOISE_FRACTION = 0.1
+
+AMOUNT = expandTo18Decimals(1)
+
+
+def createPool():
+    # Accounts are created on demand and balances are not checked
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ReplayLedger(TEST_TOKENS),
+    )
+    pool.initialize(encodePriceSqrt(1, 1))
+    return pool
+
+
+# Each setup returns the pool, the swap arguments and the limit order minted and burnt (owner, tick). The swaps are
+# zeroForOne, against the token1 limit orders below the current tick, and stop at the price limit once the
+# component's ticks have been crossed.
+
+
+def swapDown(pool, ticks):
+    return (
+        "swapper",
+        True,
+        expandTo18Decimals(10**6),
+        TickMath.getSqrtRatioAtTick(-(ticks + 1) * pool.tickSpacing),
+    )
+
+
+# One token1 limit order on each of `n` ticks, all of them crossed
+def setupLimitTicksCrossed(n):
+    pool = createPool()
+    for i in range(1, n + 1):
+        pool.mintLimitOrder(
+            TEST_TOKENS[1], "lp" + str(i), -i * pool.tickSpacing, AMOUNT
+        )
+    return pool, swapDown(pool, n), ("owner", -pool.tickSpacing)
+
+
+# `n` token1 limit orders on a single tick, crossed
+def setupPositionsPerTick(n):
+    pool = createPool()
+    for i in range(n):
+        pool.mintLimitOrder(TEST_TOKENS[1], "lp" + str(i), -pool.tickSpacing, AMOUNT)
+    return pool, swapDown(pool, 1), ("owner", -pool.tickSpacing)
+
+
+# Nested range orders with `n` initialized ticks below the current tick, all of them crossed
+def setupRangeTicksCrossed(n):
+    pool = createPool()
+    for i in range(1, n + 1):
+        pool.mint("lp", -i * pool.tickSpacing, i * pool.tickSpacing, AMOUNT)
+    return pool, swapDown(pool, n), ("owner", -pool.tickSpacing)
+
+
+# An owner with limit orders on `n` ticks, minting and burning one more. The swap partially fills the best tick.
+def setupOwnerLadder(n):
+    pool = createPool()
+    for i in range(1, n + 1):
+        pool.mintLimitOrder(TEST_TOKENS[1], "owner", -i * pool.tickSpacing, AMOUNT)
+    swapArgs = ("swapper", True, AMOUNT // 2, TickMath.MIN_SQRT_RATIO + 1)
+    return pool, swapArgs, ("owner", -(n + 1) * pool.tickSpacing)
+
+
+COMPONENTS = {
+    "limitTicksCrossed": setupLimitTicksCrossed,
+    "positionsPerTick": setupPositionsPerTick,
+    "rangeTicksCrossed": setupRangeTicksCrossed,
+    "ownerLadder": setupOwnerLadder,
+}
+
+
+# Runs the limit order mint, the limit order burn and the swap on a copy of the pool.
+# Returns a dictionary function => (time in ns, counts or None if not metered)
+def runCalls(pool, swapArgs, limitOrder, metered):
+    pool = copy.deepcopy(pool)
+    (owner, tick) = limitOrder
+    meter = CostMeter.CostMeter()
+    results = dict()
+
+    def measure(name, function, *args):
+        countsBefore = dict(meter.counts)
+        start = time.perf_counter_ns()
+        result = function(*args)
+        elapsed = time.perf_counter_ns() - start
+        counts = {
+            counter: count - countsBefore[counter]
+            for counter, count in meter.counts.items()
+        }
+        # Nested calls (burnCrossedTicksAndPositions) are added up
+        (elapsedBefore, countsPrevious) = results.get(name, (0, None))
+        if countsPrevious != None:
+            counts = {
+                counter: count + countsPrevious[counter]
+                for counter, count in counts.items()
+            }
+        results[name] = (elapsedBefore + elapsed, counts if metered else None)
+        return result
+
+    # Swap calls it through the instance, so the wrapper measures every crossed tick settled
+    burnCrossed = pool.burnCrossedTicksAndPositions
+    pool.burnCrossedTicksAndPositions = lambda *args: measure(
+        "burnCrossedTicksAndPositions", burnCrossed, *args
+    )
+    results["burnCrossedTicksAndPositions"] = (
+        0,
+        dict.fromkeys(CostMeter.COUNTERS, 0) if metered else None,
+    )
+
+    # The limit order is minted and burnt before swapping so it meets the book the component describes
+    def calls():
+        measure(
+            "mintLimitOrder", pool.mintLimitOrder, TEST_TOKENS[1], owner, tick, AMOUNT
+        )
+        measure(
+            "burnLimitOrder", pool.burnLimitOrder, TEST_TOKENS[1], owner, tick, AMOUNT
+        )
+        measure("swap", pool.swap, *swapArgs)
+
+    if metered:
+        with meter.attach(pool):
+            calls()
+    else:
+        calls()
+    return results
+
+
+# Least squares fit of ys = base + slope * xs
+def fitLinear(xs, ys):
+    meanX = statistics.mean(xs)
+    meanY = statistics.mean(ys)
+    varianceX = sum((x - meanX) ** 2 for x in xs)
+    slope = sum((x - meanX) * (y - meanY) for x, y in zip(xs, ys)) / varianceX
+    return meanY - slope * meanX, slope
+
+
+def fitModel(xs, ys):
+    (base, slope) = fitLinear(xs, ys)
+    half = len(xs) // 2
+    (_, lowerSlope) = fitLinear(xs[: half + 1], ys[: half + 1])
+    (_, upperSlope) = fitLinear(xs[half:], ys[half:])
+    # Growth over the upper half that is small compared to the value is timing noise
+    upperGrowth = upperSlope * (xs[-1] - xs[half])
+    return dict(
+        base=base,
+        slope=slope,
+        worstCase=max(ys),
+        superlinear=upperSlope > SUPERLINEAR_RATIO * max(lowerSlope, 0)
+        and upperGrowth > NOISE_FRACTION * max(ys),
+    )
+
+
+## @notice Benchmarks one component.
+## @return result Dictionary function => {"points": [...], "models": {"timeNs": model, counter: model...}}
+def benchmarkComponent(setup, values, repeats):
+    points = {function: [] for function in FUNCTIONS}
+    for value in values:
+        (pool, swapArgs, limitOrder) = setup(value)
+        counts = runCalls(pool, swapArgs, limitOrder, True)
+        timings = [runCalls(pool, swapArgs, limitOrder, False) for _ in range(repeats)]
+        for function in FUNCTIONS:
+            points[function].append(
+                dict(
+                    component=value,
+                    timeNs=statistics.median(timing[function][0] for timing in timings),
+                    counts=counts[function][1],
+                )
+            )
+
+    result = dict()
+    for function in FUNCTIONS:
+        models = dict(
+            timeNs=fitModel(values, [point["timeNs"] for point in points[function]])
+        )
+        for counter in CostMeter.COUNTERS:
+            models[counter] = fitModel(
+                values, [point["counts"][counter] for point in points[function]]
+            )
+        result[function] = dict(points=points[function], models=models)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pool call weight benchmarks")
+    parser.add_argument("--values", type=int, nargs="+", default=[8, 16, 32, 64, 128])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--components", nargs="+", choices=list(COMPONENTS), default=list(COMPONENTS)
+    )
+    parser.add_argument("--output", default="weights.json")
+    arguments = parser.parse_args()
+    assert len(arguments.values) >= 3, "At least three component values needed"
+    values = sorted(arguments.values)
+
+    weights = dict(values=values, repeats=arguments.repeats, components=dict())
+    for component in arguments.components:
+        start = time.perf_counter()
+        weights["components"][component] = benchmarkComponent(
+            COMPONENTS[component], values, arguments.repeats
+        )
+        print(component, "(s):", round(time.perf_counter() - start, 2))
+        for function, result in weights["components"][component].items():
+            superlinear = [
+                name for name, model in result["models"].items() if model["superlinear"]
+            ]
+            print(
+                "   ",
+                function.ljust(30),
+                "time slope (ns):",
+                round(result["models"]["timeNs"]["slope"]),
+                " superlinear:" if superlinear else "",
+                *superlinear
+            )
+
+    with open(arguments.output, "w") as file:
+        json.dump(weights, file, indent=2)
+    print("weights written to", arguments.output)
@@ -0,0 +1,294 @@
+import argparse
+import array
+import csv
+import itertools
+import json
+import struct
+import time
+
+from uniswapV3Python.src.libraries.Shared import *
+from .ChainflipPool import ChainflipPool
+from .PoolReplay import ReplayLedger
+from .libraries import SwapTrace
+
+### @title Backtest
+### @notice Streams historical pool operations from JSONL or CSV files through a ChainflipPool and writes per-block
+### metrics to a columnar file.
+### @dev Operation files have one operation per line/row with the fields block, operation (the name of the pool
+### function) and args (a JSON array, also in CSV rows). Operations are read in chunks and the metrics of the
+### blocks completed in a chunk are written before reading the next one, so memory stays flat regardless of the
+### input size. Operations are called atomically (see ChainflipPool.atomicCall): the ones that revert leave the pool
+### unchanged, they are counted and their exceptions swallowed.
+###
+### Metrics file layout: MAGIC | uint16 version | uint16 number of columns | column names (uint8 length, utf-8)
+### followed by chunks: uint32 rows | columns. INT_COLUMNS are int64 arrays and the rest are 32-byte little-endian
+### unsigned integers.
+
+MAGIC = b"CFBM"
+VERSION = 1
+
+## Block number, operations and reverted operations in the block, price and liquidity at the end of the block,
+## amount of limit orders filled (in their token), liquidity provider fees (in the token swapped in, the protocol
+## fee excluded), and limit ticks and positions settled at the end of the swaps
+COLUMNS = [
+    "block",
+    "operations",
+    "reverted",
+    "tick",
+    "sqrtPriceX96",
+    "liquidity",
+    "limitFillVolume0",
+    "limitFillVolume1",
+    "fees0",
+    "fees1",
+    "settledTicks",
+    "settledPositions",
+]
+INT_COLUMNS = {
+    "block",
+    "operations",
+    "reverted",
+    "tick",
+    "settledTicks",
+    "settledPositions",
+}
+
+## Validation levels: no validation, pool state validated at the end of every block or after every operation
+VALIDATION_NONE = "none"
+VALIDATION_BLOCK = "block"
+VALIDATION_OPERATION = "operation"
+
+_header = struct.Struct("<4sHH")
+_uint32 = struct.Struct("<I")
+
+
+## @notice Reads an operations file lazily.
+## @param file Text file object
+## @param format "jsonl" or "csv"
+## @return operations Generator of (block, name, args)
+def readOperations(file, format):
+    if format == "jsonl":
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield record["block"], record["operation"], record["args"]
+    else:
+        assert format == "csv", "Unsupported operations format"
+        for row in csv.DictReader(file):
+            yield int(row["block"]), row["operation"], json.loads(row["args"])
+
+
+## @notice Writes an operations file.
+## @param file Text file object
+## @param operations Iterable of (block, name, args)
+## @param format "jsonl" or "csv"
+def writeOperations(file, operations, format):
+    if format == "jsonl":
+        for block, name, args in operations:
+            file.write(
+                json.dumps(dict(block=block, operation=name, args=list(args))) + "\n"
+            )
+    else:
+        assert format == "csv", "Unsupported operations format"
+        writer = csv.writer(file)
+        writer.writerow(["block", "operation", "args"])
+        for block, name, args in operations:
+            writer.writerow([block, name, json.dumps(list(args))])
+
+
+class MetricsWriter:
+    ## @param file Binary file object the metrics are written to
+    def __init__(self, file):
+        self.file = file
+        self.file.write(_header.pack(MAGIC, VERSION, len(COLUMNS)))
+        for column in COLUMNS:
+            encoded = column.encode()
+            self.file.write(bytes((len(encoded),)) + encoded)
+
+    ## @notice Writes a chunk of rows.
+    ## @param rows List of dictionaries column => value
+    def writeRows(self, rows):
+        if len(rows) == 0:
+            return
+        parts = [_uint32.pack(len(rows))]
+        for column in COLUMNS:
+            if column in INT_COLUMNS:
+                parts.append(array.array("q", [row[column] for row in rows]).tobytes())
+            else:
+                parts.append(
+                    b"".join(row[column].to_bytes(32, "little") for row in rows)
+                )
+        self.file.write(b"".join(parts))
+        self.file.flush()
+
+
+## @notice Reads a metrics file chunk by chunk.
+## @param file Binary file object
+## @return chunks Generator of dictionaries column => list of values
+def readMetrics(file):
+    (magic, version, columnsCount) = _header.unpack(file.read(_header.size))
+    assert magic == MAGIC, "Not a backtest metrics file"
+    assert version == VERSION, "Unsupported metrics version"
+    columns = []
+    for _ in range(columnsCount):
+        columns.append(file.read(file.read(1)[0]).decode())
+
+    while True:
+        data = file.read(_uint32.size)
+        if len(data) == 0:
+            return
+        (rows,) = _uint32.unpack(data)
+        chunk = dict()
+        for column in columns:
+            if column in INT_COLUMNS:
+                values = array.array("q")
+                values.frombytes(file.read(8 * rows))
+                chunk[column] = values.tolist()
+            else:
+                data = file.read(32 * rows)
+                chunk[column] = [
+                    int.from_bytes(data[i : i + 32], "little")
+                    for i in range(0, len(data), 32)
+                ]
+        yield chunk
+
+
+## @notice Checks the consistency of the pool state. Linear in the number of ticks.
+def validatePool(pool):
+    for token in [pool.token0, pool.token1]:
+        assert pool.balances[token] >= 0, "Negative pool balance"
+    liquidity = sum(
+        info.liquidityNet
+        for tick, info in pool.ticks.items()
+        if tick <= pool.slot0.tick
+    )
+    assert liquidity == pool.liquidity, "Liquidity doesn't match the range ticks"
+    for ticksLimitMap in [pool.ticksLimitTokens0, pool.ticksLimitTokens1]:
+        for info in ticksLimitMap.values():
+            assert info.liquidityGross > 0, "Empty limit tick"
+            assert 0 < info.oneMinusPercSwap <= 1, "Limit tick crossed and not burnt"
+
+
+## @notice Runs a backtest.
+## @param pool The ChainflipPool the operations are applied to
+## @param operations Iterable of (block, name, args), ordered by block
+## @param output Binary file object the metrics are written to (see MetricsWriter)
+## @param validation VALIDATION_NONE, VALIDATION_BLOCK or VALIDATION_OPERATION
+## @param chunkSize Number of operations read before writing the metrics of the completed blocks
+## @return blocks Number of blocks
+## @return operations Number of operations applied, including the ones that reverted
+def runBacktest(pool, operations, output, validation=VALIDATION_NONE, chunkSize=10000):
+    assert validation in [VALIDATION_NONE, VALIDATION_BLOCK, VALIDATION_OPERATION]
+    writer = MetricsWriter(output)
+    trace = SwapTrace.SwapTrace()
+    # Metrics of the current block
+    row = None
+    totals = dict(blocks=0, operations=0)
+
+    def endBlock(rows):
+        if row == None:
+            return
+        if validation != VALIDATION_NONE:
+            validatePool(pool)
+        row["tick"] = pool.slot0.tick
+        row["sqrtPriceX96"] = pool.slot0.sqrtPriceX96
+        row["liquidity"] = pool.liquidity
+        rows.append(row)
+        totals["blocks"] += 1
+
+    operations = iter(operations)
+    while True:
+        chunk = list(itertools.islice(operations, chunkSize))
+        if len(chunk) == 0:
+            break
+        rows = []
+        for block, name, args in chunk:
+            if row == None or block != row["block"]:
+                endBlock(rows)
+                row = dict.fromkeys(COLUMNS, 0)
+                row["block"] = block
+            row["operations"] += 1
+
+            try:
+                if name == "swap":
+                    trace.length = 0
+                    limitOrders = len(pool.limitOrders)
+                    pool.atomicCall("swapWithTrace", *args, trace)
+                    # Settling a crossed limit tick burns and removes all its positions
+                    row["settledPositions"] += limitOrders - len(pool.limitOrders)
+                    zeroForOne = args[1]
+                    for index in range(len(trace)):
+                        stepType = trace.stepType[index]
+                        if stepType == SwapTrace.STEP_SETTLEMENT:
+                            continue
+                        row["fees0" if zeroForOne else "fees1"] += trace.feeAmount[
+                            index
+                        ]
+                        if stepType == SwapTrace.STEP_LIMIT:
+                            # Token1 limit orders are filled when swapping token0 for token1
+                            row[
+                                "limitFillVolume1" if zeroForOne else "limitFillVolume0"
+                            ] += trace.amountOut[index]
+                            # Crossed limit ticks are settled at the end of the swap
+                            row["settledTicks"] += trace.crossed[index]
+                else:
+                    pool.atomicCall(name, *args)
+            except Exception:
+                row["reverted"] += 1
+
+            if validation == VALIDATION_OPERATION:
+                validatePool(pool)
+        totals["operations"] += len(chunk)
+        writer.writeRows(rows)
+    rows = []
+    endBlock(rows)
+    writer.writeRows(rows)
+    return totals["blocks"], totals["operations"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Backtest a pool over an operations file"
+    )
+    parser.add_argument(
+        "operations", help="path to the operations file (.jsonl or .csv)"
+    )
+    parser.add_argument("metrics", help="path of the metrics file written")
+    parser.add_argument("--token0", default="token0")
+    parser.add_argument("--token1", default="token1")
+    parser.add_argument("--fee", type=int, default=3000)
+    parser.add_argument("--tickSpacing", type=int, default=60)
+    parser.add_argument(
+        "--validation",
+        choices=[VALIDATION_NONE, VALIDATION_BLOCK, VALIDATION_OPERATION],
+        default=VALIDATION_NONE,
+    )
+    parser.add_argument("--chunkSize", type=int, default=10000)
+    arguments = parser.parse_args()
+
+    # Accounts are created on demand and balances are not checked
+    pool = ChainflipPool(
+        arguments.token0,
+        arguments.token1,
+        arguments.fee,
+        arguments.tickSpacing,
+        ReplayLedger([arguments.token0, arguments.token1]),
+    )
+    format = "csv" if arguments.operations.endswith(".csv") else "jsonl"
+
+    start = time.perf_counter()
+    with open(arguments.operations, newline="") as file, open(
+        arguments.metrics, "wb"
+    ) as output:
+        (blocks, operations) = runBacktest(
+            pool,
+            readOperations(file, format),
+            output,
+            arguments.validation,
+            arguments.chunkSize,
+        )
+    elapsed = time.perf_counter() - start
+
+    print("blocks:     ", blocks)
+    print("operations: ", operations)
+    print("ops/sec:    ", round(operations / elapsed) if elapsed > 0 else operations)
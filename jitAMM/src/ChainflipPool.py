@@ -7,9 +7,24 @@ from .libraries import (
     PositionLimit,
     LimitOrderMath,
     LimitOrderSwapMath,
+    LiquidityCurve,
+    CostMeter,
+    PoolJournal,
+    PoolSnapshot,
+    StateDigest,
+    SwapTrace,
 )
 
 from dataclasses import dataclass
+import copy
+import dataclasses
+import functools
+import hashlib
+import inspect
+import itertools
+import os
+import tempfile
+import time
 
 
 @dataclass
@@ -22,6 +37,143 @@ class ModifyLimitPositionParams:
     liquidityDelta: int
 
 
+@dataclass
+class BestLimitTick:
+    ## the best live limit tick (oneMinusPercSwap > 0) on one side of the book
+    tick: int
+    ## amount of the tick's liquidity token still available to be swapped
+    liquidityLeft: int
+
+
+## Tables of ChainflipPool.exportColumns => columns (name, NumPy dtype). Amounts, liquidities and fee growths don't
+## fit in NumPy integer types so they are object columns of Python ints, and oneMinusPercSwap values are Decimals.
+EXPORT_COLUMNS = {
+    "ticks": [
+        ("tick", "int32"),
+        ("liquidityGross", object),
+        ("liquidityNet", object),
+        ("feeGrowthOutside0X128", object),
+        ("feeGrowthOutside1X128", object),
+    ],
+    "positions": [
+        ("owner", object),
+        ("tickLower", "int32"),
+        ("tickUpper", "int32"),
+        ("liquidity", object),
+        ("feeGrowthInside0LastX128", object),
+        ("feeGrowthInside1LastX128", object),
+        ("tokensOwed0", object),
+        ("tokensOwed1", object),
+    ],
+    "limitTicks0": [
+        ("tick", "int32"),
+        ("liquidityGross", object),
+        ("oneMinusPercSwap", object),
+        ("feeGrowthInsideX128", object),
+        ("lastModified", "int64"),
+    ],
+    "limitTicks1": [
+        ("tick", "int32"),
+        ("liquidityGross", object),
+        ("oneMinusPercSwap", object),
+        ("feeGrowthInsideX128", object),
+        ("lastModified", "int64"),
+    ],
+    "limitOrders": [
+        ("key", object),
+        ("owner", object),
+        ("tick", "int32"),
+        ("isToken0", "bool"),
+        ("liquidity", object),
+        ("oneMinusPercSwapMint", object),
+        ("feeGrowthInsideLastX128", object),
+        ("tokensOwed0", object),
+        ("tokensOwed1", object),
+    ],
+}
+
+
+## Pool attributes that are not state entries (see ChainflipPool.digestEntries), saved by ChainflipPool.atomicCall
+ATOMIC_GLOBALS = [
+    "slot0",
+    "liquidity",
+    "feeGrowthGlobal0X128",
+    "feeGrowthGlobal1X128",
+    "protocolFees",
+    "bestLimitTick0",
+    "bestLimitTick1",
+]
+
+
+## @dev Ledger wrapper recording the token transfers of a call, so they can be undone if an atomic call reverts and
+## the journal can record which transfer the ledger rejected. Transfers that fail are not recorded. Everything else
+## is delegated to the wrapped ledger.
+class TransferLog:
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.transfers = []
+        # Index of the transfer rejected by the ledger, None if none was
+        self.rejected = None
+
+    def __getattr__(self, name):
+        # Copies (e.g. of a pool in the middle of a call) are created without attributes
+        if name == "ledger":
+            raise AttributeError(name)
+        return getattr(self.ledger, name)
+
+    def transferToken(self, sender, recipient, token, amount):
+        try:
+            self.ledger.transferToken(sender, recipient, token, amount)
+        except Exception:
+            self.rejected = len(self.transfers)
+            raise
+        self.transfers.append((sender, recipient, token, amount))
+
+    ## @dev Moves the transferred amounts back, skipping the ledger checks since it only restores balances.
+    def undoTransfers(self):
+        for sender, recipient, token, amount in reversed(self.transfers):
+            if type(recipient) == str:
+                recipient = self.ledger.getAccountWithAddress(recipient)
+            if type(sender) == str:
+                sender = self.ledger.getAccountWithAddress(sender)
+            recipient.balances[token] -= amount
+            sender.balances[token] += amount
+        self.transfers.clear()
+
+
+## @dev Decorator for the state-changing pool functions. If the pool has a journal, top-level calls are written
+## to it once executed, including calls that revert. Nested calls (e.g. collectLimitOrder within burnLimitOrder)
+## are not written since they are replayed by their caller. Arguments passed by keyword are written positionally,
+## as bound to the function's signature. Reverted calls keep the changes made before reverting, so if the ledger
+## rejected a transfer the record also holds its index, for the replay to reject it too.
+def journaled(function):
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        if self.journal == None or self.journalDepth > 0:
+            return function(self, *args, **kwargs)
+
+        args = signature.bind(self, *args, **kwargs).args[1:]
+        self.journalDepth += 1
+        ledger = self.ledger
+        self.ledger = TransferLog(ledger)
+        try:
+            result = function(self, *args)
+        except Exception:
+            self.journal.writeOperation(
+                function.__name__, args, True, self.ledger.rejected
+            )
+            raise
+        finally:
+            self.ledger = ledger
+            self.journalDepth -= 1
+        self.journal.writeOperation(function.__name__, args, False)
+        return result
+
+    return wrapper
+
+
 class ChainflipPool(UniswapPool):
     def __init__(self, token0, token1, fee, tickSpacing, ledger):
         checkInputTypes(string=(token0, token1), uint24=(fee), int24=(tickSpacing))
@@ -37,9 +189,504 @@ class ChainflipPool(UniswapPool):
         self.ticksLimitTokens0 = dict()
         self.ticksLimitTokens1 = dict()
 
+        # Top of book cache - best live limit tick of ticksLimitTokens0 and ticksLimitTokens1. Token0 limit
+        # orders are best at the lowest tick while token1 limit orders are best at the highest tick.
+        self.bestLimitTick0 = None
+        self.bestLimitTick1 = None
+
+        # Pool state version. Bumped by every state-changing call so caches built from the pool state can
+        # be invalidated in O(1).
+        self.stateVersion = 0
+        # Range ticks => pool state version of their last modification. TickInfoLimit carries its own stamp.
+        # Stamps are dropped when a tick is cleared, so a removed tick (range or limit) is one that is no
+        # longer in its mapping.
+        self.ticksLastModified = dict()
+        # Liquidity curves built lazily for quoting, keyed by swap direction => (stateVersion, curve)
+        self.liquidityCurves = dict()
+
+        # Owners of the positions, needed to identify them independently of the (salted) dict key hashes.
+        # Range positions: hash((owner, tickLower, tickUpper)) => (owner, tickLower, tickUpper)
+        # Limit positions: hash((owner, tick, isToken0)) => (owner, tick, isToken0)
+        self.positionOwners = dict()
+        self.limitOrderOwners = dict()
+
+        # Incremental digest of the pool state (see digest) and keys of the state entries changed since it was
+        # last refreshed. Entries are only hashed when the digest is requested.
+        self.stateDigest = StateDigest.StateDigest()
+        self.changedEntries = set()
+        # State version of the last snapshot saved or loaded, which delta snapshots apply on, and keys of the
+        # state entries changed since then. Only tracked once there is a snapshot.
+        self.snapshotVersion = None
+        self.deltaEntries = set()
+
+        # Whether limit ticks swapped below EPOCH_THRESHOLD roll into a new epoch (see _rollLimitTickEpoch). Off by
+        # default, as in the reference pool (see Equivalence), since checkpoints round the position amounts. It
+        # changes the swap transitions, so it is saved in snapshots and journals and must be set before starting
+        # a journal.
+        self.precisionEpochs = False
+
+        # SwapTrace the steps of the swap are recorded to, set by swapWithTrace
+        self.swapTrace = None
+        # CostMeter counting the operations of the pool calls, set while it is attached (see meteredCall)
+        self.costMeter = None
+
+        # State entry key => copies of the entry before the current atomic call changed it, None outside of atomic
+        # calls (see atomicCall)
+        self.undoLog = None
+
+        # Optional PoolJournal.JournalWriter where the state-changing calls are written
+        self.journal = None
+        self.journalDepth = 0
+
         # Pass all paramaters to UniswapPool's constructor
         super().__init__(token0, token1, fee, tickSpacing, ledger)
 
+    ## @dev Overriding UniswapPool's state-changing functions to bump the pool state version and to journal them.
+    @journaled
+    def initialize(self, sqrtPriceX96):
+        self.stateVersion += 1
+        return super().initialize(sqrtPriceX96)
+
+    @journaled
+    def mint(self, recipient, tickLower, tickUpper, amount):
+        self.stateVersion += 1
+        return super().mint(recipient, tickLower, tickUpper, amount)
+
+    @journaled
+    def collect(
+        self, recipient, tickLower, tickUpper, amount0Requested, amount1Requested
+    ):
+        self.stateVersion += 1
+        self._entryChanged(("position", tickLower, tickUpper, recipient))
+        key = hash((recipient, tickLower, tickUpper))
+        try:
+            return super().collect(
+                recipient, tickLower, tickUpper, amount0Requested, amount1Requested
+            )
+        finally:
+            # Collecting from a non-existing position creates it before reverting
+            if key in self.positions:
+                self.positionOwners[key] = (recipient, tickLower, tickUpper)
+
+    @journaled
+    def burn(self, recipient, tickLower, tickUpper, amount):
+        self.stateVersion += 1
+        return super().burn(recipient, tickLower, tickUpper, amount)
+
+    @journaled
+    def setFeeProtocol(self, feeProtocol0, feeProtocol1):
+        self.stateVersion += 1
+        return super().setFeeProtocol(feeProtocol0, feeProtocol1)
+
+    @journaled
+    def collectProtocol(self, recipient, amount0Requested, amount1Requested):
+        self.stateVersion += 1
+        return super().collectProtocol(recipient, amount0Requested, amount1Requested)
+
+    ## @dev Overriding UniswapPool's _updatePosition to register the position owner and stamp the range ticks modified.
+    def _updatePosition(self, owner, tickLower, tickUpper, liquidityDelta, tick):
+        self._entryChanged(("position", tickLower, tickUpper, owner))
+        self._entryChanged(("tick", tickLower))
+        self._entryChanged(("tick", tickUpper))
+        key = hash((owner, tickLower, tickUpper))
+        try:
+            position = super()._updatePosition(
+                owner, tickLower, tickUpper, liquidityDelta, tick
+            )
+        finally:
+            # The position is created before the ticks are updated, so it is there even if the update reverts
+            if key in self.positions:
+                self.positionOwners[key] = (owner, tickLower, tickUpper)
+        if liquidityDelta != 0:
+            for rangeTick in [tickLower, tickUpper]:
+                # Stamps of cleared ticks are dropped, as the stamps of cleared limit ticks
+                if self.ticks.__contains__(rangeTick):
+                    self.ticksLastModified[rangeTick] = self.stateVersion
+                else:
+                    self.ticksLastModified.pop(rangeTick, None)
+        return position
+
+    ## @notice Starts writing all the state-changing calls to a journal, so the pool can be rebuilt by replaying it.
+    ## @dev The journal must be started before any state-changing call.
+    ## @param journal The PoolJournal.JournalWriter to write to
+    def startJournal(self, journal):
+        assert self.stateVersion == 0, "Pool already modified"
+        self.journal = journal
+        self.journal.writePool(
+            self.token0, self.token1, self.fee, self.tickSpacing, self.precisionEpochs
+        )
+
+    ## @notice Returns a hash of the pool state, independent of the process and of how the state was reached.
+    ## @dev Covers the range and limit order books, the positions and the pool balances. Caches, versions and
+    ## stamps are not part of the state.
+    ## @return stateHash The sha256 hex digest of the pool state
+    def stateHash(self):
+        stateHash = hashlib.sha256()
+
+        def update(*values):
+            stateHash.update(repr(values).encode())
+
+        update(self.token0, self.token1, self.fee, self.tickSpacing)
+        update(*dataclasses.astuple(self.slot0))
+        update(
+            self.liquidity,
+            self.feeGrowthGlobal0X128,
+            self.feeGrowthGlobal1X128,
+            *dataclasses.astuple(self.protocolFees),
+        )
+        update(self.balances[self.token0], self.balances[self.token1])
+
+        for tick in sorted(self.ticks):
+            update(tick, *dataclasses.astuple(self.ticks[tick]))
+        for owner in sorted(self.positionOwners.items(), key=lambda item: item[1]):
+            update(*owner[1], *dataclasses.astuple(self.positions[owner[0]]))
+
+        for ticksLimitMap in [self.ticksLimitTokens0, self.ticksLimitTokens1]:
+            for tick in sorted(ticksLimitMap):
+                info = ticksLimitMap[tick]
+                update(
+                    tick,
+                    info.liquidityGross,
+                    info.oneMinusPercSwap,
+                    info.feeGrowthInsideX128,
+                    *info.ownerPositions,
+                )
+        for owner in sorted(self.limitOrderOwners.items(), key=lambda item: item[1]):
+            update(*owner[1], *dataclasses.astuple(self.limitOrders[owner[0]]))
+
+        return stateHash.hexdigest()
+
+    ## @notice Returns a digest of the pool state maintained incrementally.
+    ## @dev Unlike stateHash, only the entries changed since the last call are hashed (see StateDigest). The
+    ## digest is deterministic across processes and independent of how the state was reached, but it is not
+    ## equal to stateHash.
+    ## @return digest The digest as a 64 character hex string
+    def digest(self):
+        self._refreshDigest()
+        globalsHash = StateDigest.entryHash(("pool", 0), self._stateEntry(("pool", 0)))
+        return "%064x" % ((self.stateDigest.root + globalsHash) % StateDigest.MODULUS)
+
+    ## @notice Returns the digest of every bucket of StateDigest.BUCKET_TICKS ticks, so that replicas whose
+    ## digests differ can find the buckets where they diverge.
+    ## @return bucketDigests Dictionary bucket => digest of the ticks and positions in that bucket
+    def digestBuckets(self):
+        self._refreshDigest()
+        return dict(self.stateDigest.bucketDigests)
+
+    ## @notice Returns the hash of each state entry in a bucket.
+    ## @dev Entries are keyed by ("tick", tick), ("position", tickLower, tickUpper, owner), ("limitTick", tick,
+    ## isToken0) and ("limitOrder", tick, isToken0, owner).
+    ## @param bucket The bucket, as returned by digestBuckets
+    ## @return entries Dictionary entry key => entry hash
+    def digestEntries(self, bucket):
+        self._refreshDigest()
+        return dict(self.stateDigest.buckets.get(bucket, dict()))
+
+    ## @notice Returns the digest of the ticks and positions in the buckets between two ticks, both included.
+    def rangeDigest(self, tickLower, tickUpper):
+        checkInputTypes(int24=(tickLower, tickUpper))
+        self._refreshDigest()
+        return self.stateDigest.rangeDigest(tickLower, tickUpper)
+
+    ## @dev Records that a state entry (see digestEntries) is about to change.
+    def _entryChanged(self, key):
+        self.changedEntries.add(key)
+        if self.snapshotVersion != None:
+            self.deltaEntries.add(key)
+        if self.undoLog != None and key not in self.undoLog:
+            self.undoLog[key] = self._undoEntry(key)
+
+    ## @dev Returns copies of a state entry and of the bookkeeping kept with it, as (mapping, key, value) with value
+    ## None if the key is not in the mapping, so the entry can be restored if the atomic call reverts.
+    def _undoEntry(self, key):
+        kind = key[0]
+        if kind == "tick":
+            tick = key[1]
+            info = self.ticks.get(tick)
+            return [
+                (self.ticks, tick, None if info == None else dataclasses.replace(info)),
+                (self.ticksLastModified, tick, self.ticksLastModified.get(tick)),
+            ]
+        elif kind == "position":
+            (_, tickLower, tickUpper, owner) = key
+            positionKey = hash((owner, tickLower, tickUpper))
+            position = self.positions.get(positionKey)
+            return [
+                (
+                    self.positions,
+                    positionKey,
+                    None if position == None else dataclasses.replace(position),
+                ),
+                (
+                    self.positionOwners,
+                    positionKey,
+                    self.positionOwners.get(positionKey),
+                ),
+            ]
+        elif kind == "limitTick":
+            (_, tick, isToken0) = key
+            ticksLimitMap = (
+                self.ticksLimitTokens0 if isToken0 else self.ticksLimitTokens1
+            )
+            info = ticksLimitMap.get(tick)
+            if info != None:
+                info = dataclasses.replace(
+                    info, ownerPositions=list(info.ownerPositions)
+                )
+            return [(ticksLimitMap, tick, info)]
+        else:
+            (_, tick, isToken0, owner) = key
+            positionKey = getHashLimit(owner, tick, isToken0)
+            position = self.limitOrders.get(positionKey)
+            return [
+                (
+                    self.limitOrders,
+                    positionKey,
+                    None if position == None else dataclasses.replace(position),
+                ),
+                (
+                    self.limitOrderOwners,
+                    positionKey,
+                    self.limitOrderOwners.get(positionKey),
+                ),
+            ]
+
+    def _refreshDigest(self):
+        for key in self.changedEntries:
+            self.stateDigest.update(key, self._stateEntry(key))
+        self.changedEntries.clear()
+
+    ## @dev Returns the values of a state entry, or None if the entry doesn't exist.
+    def _stateEntry(self, key):
+        kind = key[0]
+        if kind == "pool":
+            return (
+                self.token0,
+                self.token1,
+                self.fee,
+                self.tickSpacing,
+                dataclasses.astuple(self.slot0),
+                self.liquidity,
+                self.feeGrowthGlobal0X128,
+                self.feeGrowthGlobal1X128,
+                dataclasses.astuple(self.protocolFees),
+                self.balances[self.token0],
+                self.balances[self.token1],
+            )
+        elif kind == "tick":
+            info = self.ticks.get(key[1])
+            return None if info == None else dataclasses.astuple(info)
+        elif kind == "position":
+            (_, tickLower, tickUpper, owner) = key
+            position = self.positions.get(hash((owner, tickLower, tickUpper)))
+            return None if position == None else dataclasses.astuple(position)
+        elif kind == "limitTick":
+            (_, tick, isToken0) = key
+            ticksLimitMap = (
+                self.ticksLimitTokens0 if isToken0 else self.ticksLimitTokens1
+            )
+            info = ticksLimitMap.get(tick)
+            if info == None:
+                return None
+            return (
+                info.liquidityGross,
+                info.oneMinusPercSwap,
+                info.feeGrowthInsideX128,
+                *info.ownerPositions,
+            )
+        else:
+            (_, tick, isToken0, owner) = key
+            position = self.limitOrders.get(getHashLimit(owner, tick, isToken0))
+            return None if position == None else dataclasses.astuple(position)
+
+    ## @dev Returns the keys of all the state entries.
+    def _stateEntries(self):
+        for tick in self.ticks:
+            yield ("tick", tick)
+        for owner, tickLower, tickUpper in self.positionOwners.values():
+            yield ("position", tickLower, tickUpper, owner)
+        for isToken0, ticksLimitMap in [
+            (True, self.ticksLimitTokens0),
+            (False, self.ticksLimitTokens1),
+        ]:
+            for tick in ticksLimitMap:
+                yield ("limitTick", tick, isToken0)
+        for owner, tick, isToken0 in self.limitOrderOwners.values():
+            yield ("limitOrder", tick, isToken0, owner)
+
+    ## @notice Exports the pool state as columns, e.g. to load it into dataframes.
+    ## @dev Each table is built in a single pass over its mapping, reading the fields of the ticks and positions
+    ## without copying them. NumPy is imported on first use so that importing the pool doesn't load it.
+    ## @param tables Names of the tables to export (see EXPORT_COLUMNS), all of them if None
+    ## @return columns Dictionary table name => dictionary column name => array, one row per tick or position
+    def exportColumns(self, tables=None):
+        return {
+            table: self._columns(table, list(self._exportRows(table)))
+            for table in (EXPORT_COLUMNS if tables == None else tables)
+        }
+
+    ## @notice Streaming variant of exportColumns, yielding the rows of a table in chunks so that the memory used
+    ## by the export is bounded by the chunk size.
+    ## @dev The pool must not be modified while the chunks are consumed.
+    ## @param table Name of the table (see EXPORT_COLUMNS)
+    ## @param chunkSize Maximum number of rows of a chunk
+    ## @return chunks Generator of dictionaries column name => array
+    def exportColumnChunks(self, table, chunkSize):
+        assert chunkSize > 0, "Chunk size must be positive"
+        rows = self._exportRows(table)
+        while True:
+            chunk = list(itertools.islice(rows, chunkSize))
+            if len(chunk) == 0:
+                return
+            yield self._columns(table, chunk)
+
+    ## @dev Returns the rows of an export table as tuples of values, in the order of EXPORT_COLUMNS.
+    def _exportRows(self, table):
+        assert table in EXPORT_COLUMNS, "Unknown table"
+        if table == "ticks":
+            for tick, info in self.ticks.items():
+                yield (
+                    tick,
+                    info.liquidityGross,
+                    info.liquidityNet,
+                    info.feeGrowthOutside0X128,
+                    info.feeGrowthOutside1X128,
+                )
+        elif table == "positions":
+            for key, (owner, tickLower, tickUpper) in self.positionOwners.items():
+                position = self.positions.get(key)
+                if position != None:
+                    yield (
+                        owner,
+                        tickLower,
+                        tickUpper,
+                        position.liquidity,
+                        position.feeGrowthInside0LastX128,
+                        position.feeGrowthInside1LastX128,
+                        position.tokensOwed0,
+                        position.tokensOwed1,
+                    )
+        elif table == "limitOrders":
+            for key, (owner, tick, isToken0) in self.limitOrderOwners.items():
+                position = self.limitOrders.get(key)
+                if position != None:
+                    yield (
+                        key,
+                        owner,
+                        tick,
+                        isToken0,
+                        position.liquidity,
+                        position.oneMinusPercSwapMint,
+                        position.feeGrowthInsideLastX128,
+                        position.tokensOwed0,
+                        position.tokensOwed1,
+                    )
+        else:
+            ticksLimitMap = (
+                self.ticksLimitTokens0
+                if table == "limitTicks0"
+                else self.ticksLimitTokens1
+            )
+            for tick, info in ticksLimitMap.items():
+                yield (
+                    tick,
+                    info.liquidityGross,
+                    info.oneMinusPercSwap,
+                    info.feeGrowthInsideX128,
+                    info.lastModified,
+                )
+
+    ## @dev Transposes the rows of an export table into NumPy arrays.
+    def _columns(self, table, rows):
+        import numpy as np
+
+        columns = EXPORT_COLUMNS[table]
+        values = zip(*rows) if len(rows) > 0 else [()] * len(columns)
+        return {
+            column: np.array(columnValues, dtype=dtype)
+            for (column, dtype), columnValues in zip(columns, values)
+        }
+
+    ## @notice Saves the pool state to a binary snapshot (see PoolSnapshot).
+    ## @dev The snapshot is published atomically: it is written to a temporary file in the same directory which
+    ## then replaces the destination. Readers (e.g. PoolView) see either the old or the new snapshot, and
+    ## existing memory maps of the old snapshot remain valid.
+    ## @param path The path of the snapshot file
+    def save(self, path):
+        publishFile(path, lambda file: PoolSnapshot.write(file, self))
+        self.snapshotVersion = self.stateVersion
+        self.deltaEntries.clear()
+
+    ## @notice Saves a delta snapshot with the changes since the last snapshot or delta snapshot saved (or the
+    ## snapshot the pool was loaded from), which becomes the base of the next delta.
+    ## @dev Only the pool record and the entries in deltaEntries are written, published atomically as in save.
+    ## @param path The path of the delta snapshot file
+    def saveDelta(self, path):
+        assert self.snapshotVersion != None, "No base snapshot"
+        publishFile(
+            path,
+            lambda file: PoolSnapshot.writeDelta(
+                file, self, self.snapshotVersion, self.deltaEntries
+            ),
+        )
+        self.snapshotVersion = self.stateVersion
+        self.deltaEntries.clear()
+
+    ## @notice Loads a pool from a binary snapshot.
+    ## @dev The snapshot is decoded in bulk, building the pool mappings and owner registries in a single pass.
+    ## The top of book cache is then rebuilt. Tick stamps are not part of the snapshot.
+    ## @param path The path of the snapshot file
+    ## @param ledger The ledger the loaded pool will transfer tokens with
+    ## @param deltaPaths Paths of the delta snapshots to apply, in the order they were saved
+    ## @return pool The loaded pool
+    def load(path, ledger, deltaPaths=()):
+        with open(path, "rb") as file:
+            snapshot = PoolSnapshot.read(file)
+        for deltaPath in deltaPaths:
+            with open(deltaPath, "rb") as file:
+                PoolSnapshot.applyDelta(snapshot, PoolSnapshot.readDelta(file))
+        return ChainflipPool.fromSnapshot(snapshot, ledger)
+
+    ## @notice Compacts a snapshot and its chain of delta snapshots into a new full snapshot.
+    ## @param path The path of the base snapshot file
+    ## @param deltaPaths Paths of the delta snapshots, in the order they were saved
+    ## @param compactedPath The path of the compacted snapshot, which can be the base path
+    def compact(path, deltaPaths, compactedPath):
+        ChainflipPool.load(path, None, deltaPaths).save(compactedPath)
+
+    ## @dev Creates a pool from a decoded PoolSnapshot.
+    def fromSnapshot(snapshot, ledger):
+        pool = ChainflipPool(
+            snapshot.token0,
+            snapshot.token1,
+            snapshot.fee,
+            snapshot.tickSpacing,
+            ledger,
+        )
+        pool.stateVersion = snapshot.stateVersion
+        pool.slot0 = snapshot.slot0
+        pool.liquidity = snapshot.liquidity
+        pool.feeGrowthGlobal0X128 = snapshot.feeGrowthGlobal0X128
+        pool.feeGrowthGlobal1X128 = snapshot.feeGrowthGlobal1X128
+        pool.protocolFees = snapshot.protocolFees
+        pool.balances[pool.token0] = snapshot.balance0
+        pool.balances[pool.token1] = snapshot.balance1
+        pool.precisionEpochs = snapshot.precisionEpochs
+
+        pool.ticks = snapshot.ticks
+        pool.positions = snapshot.positions
+        pool.positionOwners = snapshot.positionOwners
+        pool.ticksLimitTokens0 = snapshot.ticksLimitTokens0
+        pool.ticksLimitTokens1 = snapshot.ticksLimitTokens1
+        pool.limitOrders = snapshot.limitOrders
+        pool.limitOrderOwners = snapshot.limitOrderOwners
+
+        pool.bestLimitTick0 = findBestLimitTick(pool.ticksLimitTokens0, True)
+        pool.bestLimitTick1 = findBestLimitTick(pool.ticksLimitTokens1, False)
+        pool.changedEntries = set(pool._stateEntries())
+        pool.snapshotVersion = pool.stateVersion
+        return pool
+
     ### @dev Checks for valid limit tick inputs.
     def checkTick(tick):
         checkInputTypes(int24=(tick))
@@ -58,6 +705,7 @@ class ChainflipPool(UniswapPool):
     ## that will be transferred from the user to the pool.
     ## @return amount The amount of token0 that was paid to mint the given amount of liquidity. The absolute
     ## value should match the function's call amount.
+    @journaled
     def mintLimitOrder(self, token, recipient, tick, amount):
         checkInputTypes(
             string=token,
@@ -65,6 +713,9 @@ class ChainflipPool(UniswapPool):
             int24=(tick),
             uint128=(amount),
         )
+
+        self.stateVersion += 1
+
         assert amount > 0
         assert (
             token == self.token0 or token == self.token1
@@ -134,6 +785,10 @@ class ChainflipPool(UniswapPool):
             int24=(tick),
             int128=(liquidityDelta),
         )
+        # Marked first so calls reverting halfway are also covered
+        self._entryChanged(("limitTick", tick, token == self.token0))
+        self._entryChanged(("limitOrder", tick, token == self.token0, owner))
+
         # This will create a position if it doesn't exist
         position, created = PositionLimit.get(
             self.limitOrders, owner, tick, token == self.token0
@@ -141,6 +796,11 @@ class ChainflipPool(UniswapPool):
         # We could return a bool to assert if position has just been created
         if created:
             assert liquidityDelta > 0
+            self.limitOrderOwners[getHashLimit(owner, tick, token == self.token0)] = (
+                owner,
+                tick,
+                token == self.token0,
+            )
 
         if token == self.token0:
             ticksLimitMap = self.ticksLimitTokens0
@@ -183,8 +843,69 @@ class ChainflipPool(UniswapPool):
             elif position.liquidity == 0:
                 # Tick should contain the owner
                 ticksLimitMap[tick].ownerPositions.remove(owner)
+
+        if liquidityDelta != 0 and ticksLimitMap.__contains__(tick):
+            ticksLimitMap[tick].lastModified = self.stateVersion
+
+        self._updateBestLimitTick(token == self.token0, tick)
+
         return position, liquidityLeftDelta, liquiditySwappedDelta
 
+    ## @notice Returns the top of the book: the best live limit tick on each side and the range order price.
+    ## @dev Reads are O(1) since the best limit ticks are cached and updated on every limit order modification.
+    ## @return bestLimitTick0 Best live token0 limit tick and its liquidityLeft. None if there is none.
+    ## @return bestLimitTick1 Best live token1 limit tick and its liquidityLeft. None if there is none.
+    ## @return sqrtPriceX96 The current range order pool sqrt price
+    def topOfBook(self):
+        return self.bestLimitTick0, self.bestLimitTick1, self.slot0.sqrtPriceX96
+
+    ## @dev Updates the top of book cache after a limit tick has been minted, burnt, partially swapped or crossed.
+    ## The book is only rescanned when the cached best tick is no longer live.
+    ## @param isToken0 Whether the modified tick is in ticksLimitTokens0 or ticksLimitTokens1
+    ## @param tick The limit tick that has been modified
+    def _updateBestLimitTick(self, isToken0, tick):
+        if isToken0:
+            ticksLimitMap = self.ticksLimitTokens0
+            bestLimitTick = self.bestLimitTick0
+        else:
+            ticksLimitMap = self.ticksLimitTokens1
+            bestLimitTick = self.bestLimitTick1
+
+        if (
+            ticksLimitMap.__contains__(tick)
+            and ticksLimitMap[tick].oneMinusPercSwap > 0
+        ):
+            if (
+                bestLimitTick == None
+                or bestLimitTick.tick == tick
+                or (
+                    (tick < bestLimitTick.tick)
+                    if isToken0
+                    else (tick > bestLimitTick.tick)
+                )
+            ):
+                bestLimitTick = BestLimitTick(
+                    tick, TickLimit.getLiquidityLeft(ticksLimitMap[tick])
+                )
+        elif bestLimitTick != None and bestLimitTick.tick == tick:
+            bestLimitTick = findBestLimitTick(ticksLimitMap, isToken0)
+
+        if isToken0:
+            self.bestLimitTick0 = bestLimitTick
+        else:
+            self.bestLimitTick1 = bestLimitTick
+
+    ## @dev Same as nextLimitTick but reading the top of book cache instead of scanning the limit tick mapping.
+    ## @param zeroForOne The direction of the swap
+    ## @param currentTick Current tick of the pool's state.
+    def _nextLimitTick(self, zeroForOne, currentTick):
+        bestLimitTick = self.bestLimitTick1 if zeroForOne else self.bestLimitTick0
+        if bestLimitTick == None:
+            return None, False
+        if zeroForOne:
+            return bestLimitTick.tick, bestLimitTick.tick > currentTick
+        return bestLimitTick.tick, bestLimitTick.tick <= currentTick
+
     ## @notice Burn liquidity from the sender and account tokens owed for the liquidity to the position
     ## @dev This can only be run if the tick has only been partially crossed (or not used). If fully crossed,
     ## the position will have been burnt automatically.
@@ -198,6 +919,7 @@ class ChainflipPool(UniswapPool):
     ## @return amountBurnt1 The amount of token1 sent to the recipient due to the position's burn.
     ## @dev If position is fully burnt, all the tokens owed will be collected and added to the
     ## returned values amountBurnt0 and amountBurnt1.
+    @journaled
     def burnLimitOrder(self, token, recipient, tick, amount):
         checkInputTypes(
             string=token,
@@ -206,6 +928,8 @@ class ChainflipPool(UniswapPool):
             uint128=(amount),
         )
 
+        self.stateVersion += 1
+
         # Add check if the position exists - when poking an uninitialized position it can be that
         # getFeeGrowthInside finds a non-initialized tick before Position.update reverts.
         Position.assertLimitPositionExists(
@@ -269,6 +993,7 @@ class ChainflipPool(UniswapPool):
     ## @param amount1Requested How much token1 should be withdrawn from the fees owed
     ## @return amountPos0 The amount of fees collected in token0
     ## @return amountPos1 The amount of fees collected in token1
+    @journaled
     def collectLimitOrder(
         self,
         recipient,
@@ -284,12 +1009,16 @@ class ChainflipPool(UniswapPool):
             uint128=(amount0Requested, amount1Requested),
         )
 
+        self.stateVersion += 1
+
         # Add this check to prevent creating a new position if the position doesn't exist or it's empty
         # even thought we would remove anyway at the end, but just for clarity.
         key = Position.assertLimitPositionExists(
             self.limitOrders, recipient, tick, token == self.token0
         )
 
+        self._entryChanged(("limitOrder", tick, token == self.token0, recipient))
+
         ## we don't need to checkTicks here, because invalid positions will never have non-zero tokensOwed{0,1}
         ## Hardcoded recipient == msg.sender.
         position, _ = PositionLimit.get(
@@ -323,11 +1052,65 @@ class ChainflipPool(UniswapPool):
         if position.liquidity == 0:
             # We should get the hash when getLimit is calculated before
             del self.limitOrders[key]
+            del self.limitOrderOwners[key]
 
         # For debugging doing it like this, but we probably need to return both (or merge them)
         # return (recipient, tick, amount0, amount1, amountPos0, amountPos1)
         return (recipient, tick, amountPos0, amountPos1)
 
+    ## @notice Returns what limit positions are owed without modifying the pool state, instead of poking them
+    ## with a burn of 0.
+    ## @dev Besides the tokensOwed already credited, includes the fees accrued and the amount swapped since the
+    ## positions were last updated, as a burn of the whole position would credit them. Positions are grouped by
+    ## tick so that the tick's price and the oneMinusPercSwap ratios are computed once per tick.
+    ## @param owner The owner of the positions, all of them are returned if keys is None
+    ## @param keys The keys of the positions (see getHashLimit)
+    ## @return owed Dictionary key => (tokensOwed0, tokensOwed1, liquidityLeft), in the order of the keys,
+    ## liquidityLeft being the liquidity of the position not swapped yet, in the position's token
+    def limitPositionsOwed(self, owner=None, keys=None):
+        if keys == None:
+            keys = [
+                key
+                for key, (positionOwner, _, _) in self.limitOrderOwners.items()
+                if positionOwner == owner
+            ]
+
+        owed = dict.fromkeys(keys)
+        positionsByTick = dict()
+        for key in keys:
+            assert key in self.limitOrderOwners, "Position doesn't exist"
+            (_, tick, isToken0) = self.limitOrderOwners[key]
+            positionsByTick.setdefault((tick, isToken0), []).append(key)
+
+        for (tick, isToken0), tickKeys in positionsByTick.items():
+            ticksLimitMap = (
+                self.ticksLimitTokens0 if isToken0 else self.ticksLimitTokens1
+            )
+            priceX96 = LimitOrderTickMath.getPriceAtTick(tick)
+            # oneMinusPercSwapMint => (percSwapped, percSwappedRoundUp)
+            percsSwapped = dict()
+            for key in tickKeys:
+                position = self.limitOrders[key]
+                # Burnt positions waiting to be collected, their tick might have been cleared
+                if position.liquidity == 0:
+                    owed[key] = (position.tokensOwed0, position.tokensOwed1, 0)
+                    continue
+                info = ticksLimitMap[tick]
+                if position.oneMinusPercSwapMint not in percsSwapped:
+                    percsSwapped[
+                        position.oneMinusPercSwapMint
+                    ] = PositionLimit.getPercSwapped(
+                        position.oneMinusPercSwapMint, info.oneMinusPercSwap
+                    )
+                owed[key] = PositionLimit.getOwed(
+                    position,
+                    *percsSwapped[position.oneMinusPercSwapMint],
+                    isToken0,
+                    priceX96,
+                    info.feeGrowthInsideX128,
+                )
+        return owed
+
     ## @notice Swap token0 for token1, or token1 for token0
     ## @dev Overriding completely the UniswapPool's swap function to accomodate for Limit Orders during the swap flow.
     ## @dev Limit Orders have the ability to provide better prices than range orders. Therefore, the swap flow first
@@ -340,6 +1123,7 @@ class ChainflipPool(UniswapPool):
     ## value after the swap. If one for zero, the price cannot be greater than this value after the swap
     ## @return amount0 The delta of the balance of token0 of the pool, exact when negative, minimum when positive
     ## @return amount1 The delta of the balance of token1 of the pool, exact when negative, minimum when positive
+    @journaled
     def swap(self, recipient, zeroForOne, amountSpecified, sqrtPriceLimitX96):
         checkInputTypes(
             accounts=(recipient),
@@ -347,6 +1131,9 @@ class ChainflipPool(UniswapPool):
             int256=(amountSpecified),
             uint160=(sqrtPriceLimitX96),
         )
+
+        self.stateVersion += 1
+
         assert amountSpecified != 0, "AS"
 
         slot0Start = self.slot0
@@ -377,6 +1164,8 @@ class ChainflipPool(UniswapPool):
 
         exactInput = amountSpecified > 0
 
+        trace = self.swapTrace
+
         state = SwapState(
             amountSpecified,
             0,
@@ -388,12 +1177,18 @@ class ChainflipPool(UniswapPool):
             [],
         )
 
+        # Limit tick partially swapped, which completes the swap
+        tickPartiallySwapped = None
+
         while (
             state.amountSpecifiedRemaining != 0
             and state.sqrtPriceX96 != sqrtPriceLimitX96
         ):
             # First limit orders are checked since they can offer a better price for the user.
 
+            if trace != None:
+                stepStart = time.perf_counter_ns()
+
             ######################################################
             #################### LIMIT ORDERS ####################
             ######################################################
@@ -403,13 +1198,14 @@ class ChainflipPool(UniswapPool):
             stepLimit.sqrtPriceStartX96 = state.sqrtPriceX96
 
             # Find the next linear order tick. initialized == False if not found and returning the next best
-            (stepLimit.tickNext, stepLimit.initialized) = nextLimitTick(
-                ticksLimitMap, not zeroForOne, state.tick
+            (stepLimit.tickNext, stepLimit.initialized) = self._nextLimitTick(
+                zeroForOne, state.tick
             )
             # If !initialized then there are no more linear ticks with liquidityLeft > 0 that we can swap for now
             if stepLimit.initialized:
 
                 tickLimitInfo = ticksLimitMap[stepLimit.tickNext]
+                self._entryChanged(("limitTick", stepLimit.tickNext, not zeroForOne))
 
                 # Health check
                 assert tickLimitInfo.oneMinusPercSwap > 0
@@ -435,6 +1231,8 @@ class ChainflipPool(UniswapPool):
 
                 # Update oneMinusPercSwap with the value calculated
                 tickLimitInfo.oneMinusPercSwap = resultingOneMinusPercSwap
+                tickLimitInfo.lastModified = self.stateVersion
+                self._updateBestLimitTick(not zeroForOne, stepLimit.tickNext)
 
                 if exactInput:
                     state.amountSpecifiedRemaining -= (
@@ -472,6 +1270,17 @@ class ChainflipPool(UniswapPool):
                     tickLimitInfo.feeGrowthInsideX128
                 )
 
+                if trace != None:
+                    trace.record(
+                        SwapTrace.STEP_LIMIT,
+                        stepLimit.tickNext,
+                        stepLimit.amountIn,
+                        stepLimit.amountOut,
+                        stepLimit.feeAmount,
+                        tickCrossed,
+                        time.perf_counter_ns() - stepStart,
+                    )
+
                 if tickCrossed:
                     # Health check
                     assert tickLimitInfo.oneMinusPercSwap == 0
@@ -488,6 +1297,7 @@ class ChainflipPool(UniswapPool):
                 else:
                     # Health check - swap should be completed
                     assert state.amountSpecifiedRemaining == 0
+                    tickPartiallySwapped = stepLimit.tickNext
                     # Prevent from altering anything in the range order pool
                     break
 
@@ -574,6 +1384,8 @@ class ChainflipPool(UniswapPool):
             if state.sqrtPriceX96 == step.sqrtPriceNextX96:
                 ## if the tick is initialized, run the tick transition
                 if step.initialized:
+                    self._entryChanged(("tick", step.tickNext))
+                    self.ticksLastModified[step.tickNext] = self.stateVersion
                     liquidityNet = Tick.cross(
                         self.ticks,
                         step.tickNext,
@@ -598,6 +1410,17 @@ class ChainflipPool(UniswapPool):
                 ## recompute unless we're on a lower tick boundary (i.e. already transitioned ticks), and haven't moved
                 state.tick = TickMath.getTickAtSqrtRatio(state.sqrtPriceX96)
 
+            if trace != None:
+                trace.record(
+                    SwapTrace.STEP_RANGE,
+                    step.tickNext,
+                    step.amountIn,
+                    step.amountOut,
+                    step.feeAmount,
+                    state.sqrtPriceX96 == step.sqrtPriceNextX96 and step.initialized,
+                    time.perf_counter_ns() - stepStart,
+                )
+
         ## End of swap loop
         # Set final tick as the range tick
         if state.tick != slot0Start.tick:
@@ -631,6 +1454,9 @@ class ChainflipPool(UniswapPool):
             )
         )
 
+        if trace != None:
+            stepStart = time.perf_counter_ns()
+
         ## do the transfers and collect payment
         if zeroForOne:
             if amount1 < 0:
@@ -652,6 +1478,28 @@ class ChainflipPool(UniswapPool):
                 ticksLimitMap, tick, self.token1 if zeroForOne else self.token0
             )
 
+        if (
+            self.precisionEpochs
+            and tickPartiallySwapped != None
+            and ticksLimitMap[tickPartiallySwapped].oneMinusPercSwap < EPOCH_THRESHOLD
+        ):
+            self._rollLimitTickEpoch(
+                ticksLimitMap,
+                tickPartiallySwapped,
+                self.token1 if zeroForOne else self.token0,
+            )
+
+        if trace != None:
+            trace.record(
+                SwapTrace.STEP_SETTLEMENT,
+                state.tick,
+                abs(amount0 if zeroForOne else amount1),
+                abs(amount1 if zeroForOne else amount0),
+                0,
+                len(state.ticksCrossed) > 0,
+                time.perf_counter_ns() - stepStart,
+            )
+
         return (
             recipient,
             amount0,
@@ -661,6 +1509,74 @@ class ChainflipPool(UniswapPool):
             state.tick,
         )
 
+    ## @notice Same as swap, recording every step of the swap to a SwapTrace.
+    ## @dev Tracing is opt-in: swap only checks whether a trace is set.
+    ## @param trace SwapTrace to record to. A new one is created if None.
+    ## @return result The values returned by swap
+    ## @return trace The SwapTrace
+    def swapWithTrace(
+        self, recipient, zeroForOne, amountSpecified, sqrtPriceLimitX96, trace=None
+    ):
+        if trace == None:
+            trace = SwapTrace.SwapTrace()
+        self.swapTrace = trace
+        try:
+            result = self.swap(
+                recipient, zeroForOne, amountSpecified, sqrtPriceLimitX96
+            )
+        finally:
+            self.swapTrace = None
+        return result, trace
+
+    ## @notice Calls a pool function counting the primitive operations it performs (see CostMeter).
+    ## @dev To also get the counts of calls that revert, attach a CostMeter to the pool instead.
+    ## @param function Name of the pool function, e.g. "swap"
+    ## @return result The values returned by the function
+    ## @return counts Dictionary counter => count (see CostMeter.COUNTERS)
+    def meteredCall(self, function, *args):
+        meter = CostMeter.CostMeter()
+        with meter.attach(self):
+            result = getattr(self, function)(*args)
+        return result, meter.counts
+
+    ## @notice Calls a state-changing pool function atomically: if it reverts, the pool state is restored to what it
+    ## was before the call and the exception is raised.
+    ## @dev Pool calls are not atomic, a call that reverts keeps the changes made before reverting. Instead of copying
+    ## the pool, the state entries are saved the first time they are marked as changed (see _entryChanged), together
+    ## with the pool globals (ATOMIC_GLOBALS) and the token transfers, so the cost is proportional to what the call
+    ## touches. The state version is bumped on revert so that caches built during the call are dropped. A journal
+    ## still records the call as reverted, and PoolReplay.replay skips it with atomic=True. Nested calls are part of
+    ## the outer atomic call.
+    ## @param function Name of the pool function, e.g. "swap"
+    ## @return result The values returned by the function
+    def atomicCall(self, function, *args):
+        if self.undoLog != None:
+            return getattr(self, function)(*args)
+
+        globalValues = [
+            (name, copy.copy(getattr(self, name))) for name in ATOMIC_GLOBALS
+        ]
+        ledger = self.ledger
+        self.ledger = TransferLog(ledger)
+        self.undoLog = dict()
+        try:
+            return getattr(self, function)(*args)
+        except Exception:
+            for entries in self.undoLog.values():
+                for mapping, key, value in entries:
+                    if value == None:
+                        mapping.pop(key, None)
+                    else:
+                        mapping[key] = value
+            for name, value in globalValues:
+                setattr(self, name, value)
+            self.ledger.undoTransfers()
+            self.stateVersion += 1
+            raise
+        finally:
+            self.ledger = ledger
+            self.undoLog = None
+
     ## @notice Burns a tick and all their underlying positions. This is called at the end of a swap
     ## to burn and collect all the crossed ticks and positions.
     ## @dev This could be done in a more efficient way by creating a function that burns
@@ -672,7 +1588,10 @@ class ChainflipPool(UniswapPool):
     def burnCrossedTicksAndPositions(self, tickLimitInfo, tick, token):
         checkInputTypes(string=(token), int24=(tick))
         assert tickLimitInfo[tick].oneMinusPercSwap == 0
-        for owner in tickLimitInfo[tick].ownerPositions:
+        # Iterate over a copy since burning the positions removes the owners from ownerPositions
+        for owner in list(tickLimitInfo[tick].ownerPositions):
+            if self.costMeter != None:
+                self.costMeter.count("settlementIterations")
             position, created = PositionLimit.get(
                 self.limitOrders, owner, tick, token == self.token0
             )
@@ -691,6 +1610,147 @@ class ChainflipPool(UniswapPool):
         # Check that the tick has been cleared
         assert not tickLimitInfo.__contains__(tick)
 
+    ## @notice Rolls a limit tick into a new epoch: every position is checkpointed (see PositionLimit.checkpoint) and
+    ## the tick restarts with oneMinusPercSwap at 1 and the liquidity left of its positions.
+    ## @dev Called at the end of a swap that leaves the tick with a oneMinusPercSwap below EPOCH_THRESHOLD when
+    ## precisionEpochs is set, so that the precision of the position amounts and the cost of the fills stay bounded
+    ## on long-lived ticks. No tokens are transferred: the checkpointed amounts are collected as usual. Positions left without liquidity are
+    ## removed from the tick, and so is the tick if all of them are.
+    ## @param tickLimitInfo Reference to the limit tick mapping of the tick
+    ## @param tick The tick to roll
+    ## @param token Tick's token
+    def _rollLimitTickEpoch(self, tickLimitInfo, tick, token):
+        checkInputTypes(string=(token), int24=(tick))
+        isToken0 = token == self.token0
+        info = tickLimitInfo[tick]
+        priceX96 = LimitOrderTickMath.getPriceAtTick(tick)
+        self._entryChanged(("limitTick", tick, isToken0))
+
+        liquidityGross = 0
+        for owner in list(info.ownerPositions):
+            if self.costMeter != None:
+                self.costMeter.count("settlementIterations")
+            self._entryChanged(("limitOrder", tick, isToken0, owner))
+            position, created = PositionLimit.get(
+                self.limitOrders, owner, tick, isToken0
+            )
+            # Health check
+            assert not created
+            liquidity = PositionLimit.checkpoint(
+                position,
+                info.oneMinusPercSwap,
+                isToken0,
+                priceX96,
+                info.feeGrowthInsideX128,
+            )
+            if liquidity == 0:
+                # Position will be removed after tokens have been collected, as when burnt
+                info.ownerPositions.remove(owner)
+            liquidityGross += liquidity
+
+        if liquidityGross == 0:
+            Tick.clear(tickLimitInfo, tick)
+        else:
+            info.liquidityGross = liquidityGross
+            info.oneMinusPercSwap = Decimal("1")
+            info.lastModified = self.stateVersion
+        self._updateBestLimitTick(isToken0, tick)
+
+    ## @notice Returns the liquidity curve of a swap in the given direction, swapping up to the price limit.
+    ## @dev The curve is cached and lazily rebuilt when the pool state version has changed.
+    ## @param zeroForOne The direction of the swap
+    ## @return curve The liquidity curve
+    def getLiquidityCurve(self, zeroForOne):
+        checkInputTypes(bool=(zeroForOne))
+
+        if self.liquidityCurves.__contains__(zeroForOne):
+            (stateVersion, curve) = self.liquidityCurves[zeroForOne]
+            if stateVersion == self.stateVersion:
+                return curve
+
+        curve = LiquidityCurve.build(
+            *self._liquidityCurveArgs(
+                zeroForOne,
+                TickMath.MIN_SQRT_RATIO + 1
+                if zeroForOne
+                else TickMath.MAX_SQRT_RATIO - 1,
+            )
+        )
+        self.liquidityCurves[zeroForOne] = (self.stateVersion, curve)
+        return curve
+
+    ## @dev Returns the arguments of LiquidityCurve.build and LiquidityCurve.walk for a swap in the given
+    ## direction from the current pool state.
+    ## @param zeroForOne The direction of the swap
+    ## @param sqrtPriceLimitX96 The Q64.96 sqrt price limit of the swap
+    def _liquidityCurveArgs(self, zeroForOne, sqrtPriceLimitX96):
+        ticksLimitMap = self.ticksLimitTokens1 if zeroForOne else self.ticksLimitTokens0
+        limitTicks = sorted(ticksLimitMap.keys())
+        rangeTicks = sorted(self.ticks.keys())
+
+        return (
+            zeroForOne,
+            self.slot0.sqrtPriceX96,
+            self.slot0.tick,
+            self.liquidity,
+            self.fee,
+            limitTicks,
+            [ticksLimitMap[tick] for tick in limitTicks],
+            rangeTicks,
+            [self.ticks[tick] for tick in rangeTicks],
+            sqrtPriceLimitX96,
+        )
+
+    ## @notice Quotes a swap without modifying the pool state. Results match the ones of the swap function
+    ## swapping with no price limit (MIN_SQRT_RATIO + 1 or MAX_SQRT_RATIO - 1).
+    ## @dev Quotes are a binary search over the cached liquidity curve plus a single swap step.
+    ## @param zeroForOne The direction of the swap, true for token0 to token1, false for token1 to token0
+    ## @param amountSpecified The amount of the swap, exact input (positive), or exact output (negative)
+    ## @return amount0 The delta of the balance of token0 of the pool, exact when negative, minimum when positive
+    ## @return amount1 The delta of the balance of token1 of the pool, exact when negative, minimum when positive
+    ## @return sqrtPriceX96 The range order pool sqrt price after the swap
+    ## @return liquidity The range order pool liquidity after the swap
+    ## @return tick The range order pool tick after the swap
+    def quote(self, zeroForOne, amountSpecified):
+        checkInputTypes(bool=(zeroForOne), int256=(amountSpecified))
+        return LiquidityCurve.quote(self.getLiquidityCurve(zeroForOne), amountSpecified)
+
+    ## @notice Quotes a list of swaps in the same direction without modifying the pool state, e.g. to show
+    ## the price impact of several trade sizes. Each result matches the one of a standalone quote.
+    ## @dev The amounts are sorted and the liquidity curve is walked once for all of them.
+    ## @param zeroForOne The direction of the swaps
+    ## @param amounts The amounts of the swaps, exact input (positive), or exact output (negative)
+    ## @return quotes For each amount, in the same order, the same tuple as quote or None if the swap
+    ## would revert.
+    def quoteLadder(self, zeroForOne, amounts):
+        checkInputTypes(bool=(zeroForOne))
+        return LiquidityCurve.quoteLadder(self.getLiquidityCurve(zeroForOne), amounts)
+
+    ## @notice Computes the amounts needed to move the price to the target price without modifying the pool
+    ## state. Results match the ones of a swap with an unbounded amount and sqrtPriceTargetX96 as the price limit.
+    ## @dev The direction of the swap is given by the target price relative to the current price. Nothing is
+    ## needed to reach the current price. Targets must be strictly between MIN_SQRT_RATIO and MAX_SQRT_RATIO, as
+    ## swap price limits.
+    ## @param sqrtPriceTargetX96 The Q64.96 sqrt price to reach
+    ## @return amountIn The amount to swap in, including fees
+    ## @return amountOut The amount swapped out
+    ## @return limitTicksConsumed The limit order ticks fully consumed on the way, in the order they are swapped
+    def amountToReachPrice(self, sqrtPriceTargetX96):
+        checkInputTypes(uint160=(sqrtPriceTargetX96))
+        assert (
+            TickMath.MIN_SQRT_RATIO < sqrtPriceTargetX96 < TickMath.MAX_SQRT_RATIO
+        ), "Target price out of range"
+
+        if sqrtPriceTargetX96 == self.slot0.sqrtPriceX96:
+            return 0, 0, []
+
+        zeroForOne = sqrtPriceTargetX96 < self.slot0.sqrtPriceX96
+        return LiquidityCurve.walkTotals(
+            LiquidityCurve.walk(
+                *self._liquidityCurveArgs(zeroForOne, sqrtPriceTargetX96)
+            )
+        )
+
 
 ## @notice Get the next limit tick containing limit orders with liquidity (oneMinusPercSwap > 0).
 ## @dev We are fetching for the next tick in every swap loop. Since the ticks don't get burnt until the end
@@ -729,3 +1789,38 @@ def nextLimitTick(tickMapping, lte, currentTick):
     # If no tick with LO is found, then we're done - no LO will be used. However, we return the next best tick so
     # the range orders know which is the next tick at which we should be using LOs.
     return nextTick, False
+
+
+## @notice Writes a file atomically: it is written to a temporary file in the same directory which then replaces
+## the destination, so readers see either the old or the new file.
+## @param path The path of the file
+## @param write Function writing the contents to a binary file object
+def publishFile(path, write):
+    directory = os.path.dirname(os.path.abspath(path))
+    (fd, temporaryPath) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporaryPath, path)
+    except BaseException:
+        os.remove(temporaryPath)
+        raise
+
+
+## @notice Scans a limit tick mapping for the best tick containing limit orders with liquidity (oneMinusPercSwap > 0).
+## @dev Used to rebuild the top of book cache when the cached best tick is no longer live.
+## @param tickMapping Mapping of the limit ticks of one side of the book.
+## @param isToken0 Whether the mapping contains token0 or token1 limit orders
+## @return bestLimitTick Best live tick and its liquidityLeft. None if there are no live ticks.
+def findBestLimitTick(tickMapping, isToken0):
+    checkInputTypes(bool=(isToken0))
+
+    liveTicks = [k for k, v in tickMapping.items() if v.oneMinusPercSwap > 0]
+
+    if len(liveTicks) == 0:
+        return None
+
+    tick = min(liveTicks) if isToken0 else max(liveTicks)
+    return BestLimitTick(tick, TickLimit.getLiquidityLeft(tickMapping[tick]))
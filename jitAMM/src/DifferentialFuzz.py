@@ -0,0 +1,570 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from dataclasses import field
+
+from uniswapV3Python.src.UniswapPool import UniswapPool
+from uniswapV3Python.src.libraries import TickMath
+from uniswapV3Python.src.libraries.Shared import *
+from .ChainflipPool import ChainflipPool
+from .OrderFlow import logUniform, gaussianOffset
+from .PoolReplay import ReplayLedger
+from .libraries.SharedLimitOrder import getMinTickLO, getMaxTickLO
+
+### @title DifferentialFuzz
+### @notice Differential fuzzing of ChainflipPool against the reference UniswapPool. Random pools and operation
+### sequences (range mints, burns, collects, swaps in both directions, exact input and exact output, protocol fees)
+### are run on both pools and every result, revert, price, liquidity, fee growth and balance is compared, plus the
+### range ticks and positions at the end of the sequence.
+### @dev Limit orders are minted, burnt and collected on the ChainflipPool only, and always placed so they are never
+### better than the range orders: swaps are bounded by price limits within a band of ticks, and limit orders are
+### only placed outside of it (token1 orders below and token0 orders above). The swaps still look the book up on
+### every step, but must match the reference pool exactly.
+### Cases are plain JSON, so they can be saved, shared and replayed. Workers run in separate processes and share a
+### corpus directory: cases producing new features (operation outcomes and swap shapes) are written to its queue,
+### which every worker reloads periodically and mutates. Failing cases are shrunk and written to its failures.
+### A case runs on fresh pools with ledger validation switched off (see PoolReplay.ReplayLedger) and nothing is
+### deep-copied, which is what makes it much faster than the hypothesis tests.
+
+TOKENS = ["token0", "token1"]
+MAX_UINT128 = 2**128 - 1
+
+## Operations run on the ChainflipPool only
+LIMIT_OPERATIONS = ["mintLimitOrder", "burnLimitOrder", "collectLimitOrder"]
+
+## Operation name => positions of the amount arguments, which shrinking simplifies
+AMOUNT_ARGS = dict(
+    mint=[3],
+    burn=[3],
+    collect=[3, 4],
+    swap=[2],
+    collectProtocol=[1, 2],
+    mintLimitOrder=[3],
+    burnLimitOrder=[3],
+    collectLimitOrder=[3, 4],
+)
+
+## Cases run between two reloads of the shared corpus
+SYNC_INTERVAL = 100
+
+
+@dataclass
+class FuzzConfig:
+    fees: tuple = (500, 3000, 10000)
+    tickSpacings: tuple = (1, 10, 60, 200)
+    ## Number of operations of a generated case
+    operations: tuple = (1, 40)
+    owners: int = 4
+    ## Relative frequency of each kind of operation
+    weights: dict = field(
+        default_factory=lambda: dict(
+            mint=20,
+            burn=10,
+            collect=5,
+            swap=50,
+            setFeeProtocol=3,
+            collectProtocol=2,
+            limitOrder=10,
+        )
+    )
+    liquidityAmounts: tuple = (1, 10**24)
+    swapAmounts: tuple = (1, 10**24)
+    exactOutputFraction: float = 0.3
+    ## Scale of the distance of the initial tick, the range orders and the swap price limits to tick 0
+    tickSpread: float = 5000
+    ## Width of the limit order band in tick spacings, at both ends of the limit order tick range
+    limitBand: int = 20
+    ## Fraction of the cases mutated from the corpus instead of generated
+    mutationRate: float = 0.5
+
+
+## @notice Ticks the swaps are bounded to. Limit orders are only placed outside of these.
+def swapBand(tickSpacing, config):
+    band = config.limitBand * tickSpacing
+    return getMinTickLO(tickSpacing) + band, getMaxTickLO(tickSpacing) - band
+
+
+def _generateOperations(rng, case, count, config):
+    (tickSpacing, initialTick) = (case["tickSpacing"], case["tick"])
+    (bandLower, bandUpper) = swapBand(tickSpacing, config)
+    (minTick, maxTick) = (
+        math.ceil(TickMath.MIN_TICK / tickSpacing) * tickSpacing,
+        math.floor(TickMath.MAX_TICK / tickSpacing) * tickSpacing,
+    )
+    kinds = [kind for kind in config.weights if config.weights[kind] > 0]
+    weights = [config.weights[kind] for kind in kinds]
+    # Positions minted so far, which burns and collects are picked from: (owner, tickLower, tickUpper) and
+    # (token, owner, tick, amount)
+    ranges = [args[:3] for name, args in case["operations"] if name == "mint"]
+    limits = [args for name, args in case["operations"] if name == "mintLimitOrder"]
+
+    def owner():
+        return "lp" + str(rng.randrange(config.owners))
+
+    def spacedTick(tick, lower, upper):
+        return max(lower, min(upper, tick // tickSpacing * tickSpacing))
+
+    operations = []
+    while len(operations) < count:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "mint":
+            if rng.random() < 0.05:
+                (tickLower, tickUpper) = (minTick, maxTick)
+            else:
+                center = initialTick + gaussianOffset(rng, config.tickSpread)
+                width = logUniform(rng, 1, 1000) * tickSpacing
+                tickLower = spacedTick(center - width // 2, minTick, maxTick)
+                tickUpper = spacedTick(center + width // 2, minTick, maxTick)
+                if tickLower == tickUpper:
+                    tickUpper += tickSpacing
+            amount = logUniform(rng, *config.liquidityAmounts)
+            ranges.append([owner(), tickLower, tickUpper])
+            operations.append(["mint", [*ranges[-1], amount]])
+        elif kind in ["burn", "collect"]:
+            if len(ranges) == 0:
+                continue
+            position = rng.choice(ranges)
+            if kind == "burn":
+                amount = logUniform(rng, *config.liquidityAmounts)
+                operations.append(["burn", [*position, amount]])
+            else:
+                amounts = [
+                    MAX_UINT128 if rng.random() < 0.5 else logUniform(rng, 1, 10**24)
+                    for _ in range(2)
+                ]
+                operations.append(["collect", [*position, *amounts]])
+        elif kind == "swap":
+            zeroForOne = rng.random() < 0.5
+            amount = logUniform(rng, *config.swapAmounts)
+            if rng.random() < config.exactOutputFraction:
+                amount = -amount
+            if rng.random() < 0.1:
+                limitTick = bandLower if zeroForOne else bandUpper
+            else:
+                limitTick = max(
+                    bandLower,
+                    min(
+                        bandUpper, initialTick + gaussianOffset(rng, config.tickSpread)
+                    ),
+                )
+            operations.append(
+                [
+                    "swap",
+                    [
+                        "trader",
+                        zeroForOne,
+                        amount,
+                        TickMath.getSqrtRatioAtTick(limitTick),
+                    ],
+                ]
+            )
+        elif kind == "setFeeProtocol":
+            operations.append(
+                [
+                    "setFeeProtocol",
+                    [rng.choice([0, 4, 5, 10]), rng.choice([0, 4, 5, 10])],
+                ]
+            )
+        elif kind == "collectProtocol":
+            operations.append(
+                [
+                    "collectProtocol",
+                    ["protocol", MAX_UINT128, logUniform(rng, 1, 10**24)],
+                ]
+            )
+        elif len(limits) > 0 and rng.random() < 0.5:
+            (token, limitOwner, tick, minted) = rng.choice(limits)
+            if rng.random() < 0.5:
+                # Burning more than minted reverts and ends the comparison (see runCase)
+                amount = rng.randint(1, minted)
+                operations.append(["burnLimitOrder", [token, limitOwner, tick, amount]])
+            else:
+                operations.append(
+                    [
+                        "collectLimitOrder",
+                        [limitOwner, token, tick, MAX_UINT128, MAX_UINT128],
+                    ]
+                )
+        else:
+            # Token1 limit orders are filled by swaps going down, so they go below the band, and token0 ones above
+            offset = rng.randrange(config.limitBand) * tickSpacing
+            if rng.random() < 0.5:
+                (token, tick) = (TOKENS[1], getMinTickLO(tickSpacing) + offset)
+            else:
+                (token, tick) = (TOKENS[0], getMaxTickLO(tickSpacing) - offset)
+            amount = logUniform(rng, *config.liquidityAmounts)
+            limits.append([token, owner(), tick, amount])
+            operations.append(["mintLimitOrder", list(limits[-1])])
+    return operations
+
+
+## @notice Generates a random case.
+## @param rng random.Random
+## @param config FuzzConfig
+## @return case Dictionary with the pool parameters (fee, tickSpacing, initial tick) and the operations
+def generateCase(rng, config):
+    tickSpacing = rng.choice(config.tickSpacings)
+    (bandLower, bandUpper) = swapBand(tickSpacing, config)
+    if rng.random() < 0.8:
+        tick = gaussianOffset(rng, config.tickSpread)
+    else:
+        tick = rng.randint(bandLower, bandUpper)
+    case = dict(
+        fee=rng.choice(config.fees),
+        tickSpacing=tickSpacing,
+        tick=max(bandLower, min(bandUpper, tick)),
+        operations=[],
+    )
+    case["operations"] = _generateOperations(
+        rng, case, rng.randint(*config.operations), config
+    )
+    return case
+
+
+## @notice Mutates a case: removes, duplicates, reorders or rescales operations, or appends new ones.
+## @return case A new case with the same pool parameters
+def mutateCase(rng, case, config):
+    operations = [[name, list(args)] for name, args in case["operations"]]
+    mutated = dict(case, operations=operations)
+    for _ in range(rng.randint(1, 4)):
+        mutation = rng.randrange(5)
+        if mutation == 0 and len(operations) > 1:
+            del operations[rng.randrange(len(operations))]
+        elif mutation == 1 and len(operations) > 0:
+            index = rng.randrange(len(operations))
+            operations.insert(index, [operations[index][0], list(operations[index][1])])
+        elif mutation == 2 and len(operations) > 1:
+            (i, j) = (rng.randrange(len(operations)), rng.randrange(len(operations)))
+            (operations[i], operations[j]) = (operations[j], operations[i])
+        elif mutation == 3 and len(operations) > 0:
+            (name, args) = rng.choice(operations)
+            if name in AMOUNT_ARGS:
+                position = rng.choice(AMOUNT_ARGS[name])
+                sign = -1 if args[position] < 0 else 1
+                args[position] = sign * max(
+                    1, int(abs(args[position]) * rng.choice([0.5, 0.9, 1.1, 2, 10]))
+                )
+        else:
+            operations.extend(
+                _generateOperations(rng, mutated, rng.randint(1, 8), config)
+            )
+    return mutated
+
+
+def _features(name, args, outcome, tickBefore, tickAfter, tickSpacing):
+    if name == "swap" and outcome == "ok":
+        ticksMoved = abs(tickAfter - tickBefore) // tickSpacing
+        return (name, args[1], args[2] > 0, ticksMoved.bit_length())
+    return (name, outcome)
+
+
+def _state(pool, limitOrders):
+    liquidityLimit = [0, 0]
+    if limitOrders:
+        # Limit orders are never swapped, their liquidity and the amounts burnt but not collected are still in the
+        # pool balances
+        liquidityLimit = [
+            sum(info.liquidityGross for info in pool.ticksLimitTokens0.values())
+            + sum(position.tokensOwed0 for position in pool.limitOrders.values()),
+            sum(info.liquidityGross for info in pool.ticksLimitTokens1.values())
+            + sum(position.tokensOwed1 for position in pool.limitOrders.values()),
+        ]
+    return dict(
+        sqrtPriceX96=pool.slot0.sqrtPriceX96,
+        tick=pool.slot0.tick,
+        feeProtocol=pool.slot0.feeProtocol,
+        liquidity=pool.liquidity,
+        feeGrowthGlobal0X128=pool.feeGrowthGlobal0X128,
+        feeGrowthGlobal1X128=pool.feeGrowthGlobal1X128,
+        protocolFees0=pool.protocolFees.token0,
+        protocolFees1=pool.protocolFees.token1,
+        balance0=pool.balances[pool.token0] - liquidityLimit[0],
+        balance1=pool.balances[pool.token1] - liquidityLimit[1],
+    )
+
+
+def _call(pool, name, args):
+    try:
+        return "ok", getattr(pool, name)(*args)
+    except Exception as exception:
+        return type(exception).__name__ + ": " + str(exception), None
+
+
+## @notice Runs a case on a ChainflipPool and on the reference UniswapPool and compares them.
+## @param case The case (see generateCase)
+## @param poolClass Class of the pool tested against the reference
+## @return mismatch None if the pools match, otherwise a dictionary with the index and name of the operation they
+## diverged at (-1 for the final state checks), the field and both values
+## @return features Set of the features of the case, for the corpus
+def runCase(case, poolClass=ChainflipPool):
+    pool = poolClass(
+        TOKENS[0], TOKENS[1], case["fee"], case["tickSpacing"], ReplayLedger(TOKENS)
+    )
+    reference = UniswapPool(
+        TOKENS[0], TOKENS[1], case["fee"], case["tickSpacing"], ReplayLedger(TOKENS)
+    )
+    sqrtPriceX96 = TickMath.getSqrtRatioAtTick(case["tick"])
+    pool.initialize(sqrtPriceX96)
+    reference.initialize(sqrtPriceX96)
+    features = set()
+
+    def mismatch(index, name, field, value, referenceValue):
+        return (
+            dict(
+                index=index,
+                operation=name,
+                field=field,
+                chainflip=repr(value),
+                reference=repr(referenceValue),
+            ),
+            features,
+        )
+
+    for index, (name, args) in enumerate(case["operations"]):
+        tickBefore = pool.slot0.tick
+        (outcome, result) = _call(pool, name, args)
+        features.add(
+            _features(
+                name, args, outcome, tickBefore, pool.slot0.tick, case["tickSpacing"]
+            )
+        )
+        if name in LIMIT_OPERATIONS:
+            if outcome != "ok":
+                # Reverted calls are not rolled back, the limit order book is left with changes the reference pool
+                # has no counterpart for, so the rest of the case can't be compared
+                return None, features
+            continue
+        (referenceOutcome, referenceResult) = _call(reference, name, args)
+        if outcome != referenceOutcome:
+            return mismatch(index, name, "outcome", outcome, referenceOutcome)
+        if result != referenceResult:
+            return mismatch(index, name, "result", result, referenceResult)
+        (state, referenceState) = (_state(pool, True), _state(reference, False))
+        for key in state:
+            if state[key] != referenceState[key]:
+                return mismatch(index, name, key, state[key], referenceState[key])
+
+    if pool.ticks != reference.ticks:
+        return mismatch(-1, None, "ticks", pool.ticks, reference.ticks)
+    if pool.positions != reference.positions:
+        return mismatch(-1, None, "positions", pool.positions, reference.positions)
+    return None, features
+
+
+def _simplify(value):
+    # Keeps the leading digit only
+    magnitude = 10 ** (len(str(abs(value))) - 1)
+    return (abs(value) // magnitude) * magnitude * (-1 if value < 0 else 1)
+
+
+## @notice Shrinks a failing case: removes as many operations as possible and simplifies the amounts, as long as
+## the case keeps failing on the same field.
+## @return case The shrunk case
+## @return mismatch Its mismatch
+def shrinkCase(case, poolClass=ChainflipPool):
+    (mismatch, _) = runCase(case, poolClass)
+    assert mismatch != None, "Case doesn't fail"
+    field = mismatch["field"]
+
+    def check(operations):
+        candidate = dict(case, operations=operations)
+        (candidateMismatch, _) = runCase(candidate, poolClass)
+        if candidateMismatch != None and candidateMismatch["field"] == field:
+            return candidate, candidateMismatch
+        return None, None
+
+    # Remove chunks of operations, halving the chunk size when none can be removed
+    operations = case["operations"]
+    chunk = max(1, len(operations) // 2)
+    while True:
+        removed = False
+        index = 0
+        while index < len(operations):
+            (candidate, candidateMismatch) = check(
+                operations[:index] + operations[index + chunk :]
+            )
+            if candidate != None:
+                (case, mismatch, operations) = (
+                    candidate,
+                    candidateMismatch,
+                    candidate["operations"],
+                )
+                removed = True
+            else:
+                index += chunk
+        if not removed:
+            if chunk == 1:
+                break
+            chunk //= 2
+
+    # Simplify the amounts
+    for index, (name, args) in enumerate(operations):
+        for position in AMOUNT_ARGS.get(name, []):
+            simplified = _simplify(args[position])
+            if simplified == args[position]:
+                continue
+            candidateOperations = [list(operation) for operation in operations]
+            candidateOperations[index] = [
+                name,
+                args[:position] + [simplified] + args[position + 1 :],
+            ]
+            (candidate, candidateMismatch) = check(candidateOperations)
+            if candidate != None:
+                (case, mismatch, operations) = (
+                    candidate,
+                    candidateMismatch,
+                    candidate["operations"],
+                )
+                args = operations[index][1]
+    return case, mismatch
+
+
+## @notice Writes a case to a directory, named after its hash. Written atomically so other workers never read a
+## partial file.
+## @return path The path of the file
+def saveCase(directory, case, mismatch=None, features=()):
+    encoded = json.dumps(
+        dict(
+            case=case,
+            mismatch=mismatch,
+            features=[list(feature) for feature in sorted(features, key=repr)],
+        )
+    )
+    path = os.path.join(
+        directory, hashlib.sha1(encoded.encode()).hexdigest()[:16] + ".json"
+    )
+    (handle, temporaryPath) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(handle, "w") as file:
+        file.write(encoded)
+    os.replace(temporaryPath, path)
+    return path
+
+
+## @notice Reads a case written by saveCase.
+## @return case The case
+## @return mismatch Its mismatch when it was saved
+## @return features Its features when it was saved
+def loadCase(path):
+    with open(path) as file:
+        record = json.load(file)
+    return (
+        record["case"],
+        record["mismatch"],
+        set(tuple(feature) for feature in record["features"]),
+    )
+
+
+def _corpusDirectories(corpusDirectory):
+    directories = [
+        os.path.join(corpusDirectory, "queue"),
+        os.path.join(corpusDirectory, "failures"),
+    ]
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+    return directories
+
+
+## @notice Fuzzes for a number of cases, sharing the corpus directory with the other workers.
+## @param seed Seed of the worker
+## @param iterations Number of cases to run
+## @param corpusDirectory Directory of the shared corpus, with the queue and failures subdirectories
+## @param config FuzzConfig
+## @param poolClass Class of the pool tested against the reference
+## @return stats Dictionary with the number of cases and operations run, the corpus entries added and the paths
+## of the shrunk failures
+def fuzzWorker(seed, iterations, corpusDirectory, config=None, poolClass=ChainflipPool):
+    if config == None:
+        config = FuzzConfig()
+    rng = random.Random(seed)
+    (queueDirectory, failuresDirectory) = _corpusDirectories(corpusDirectory)
+    corpus = []
+    seen = set()
+    loaded = set()
+    stats = dict(cases=0, operations=0, corpus=0, failures=[])
+
+    for iteration in range(iterations):
+        if iteration % SYNC_INTERVAL == 0:
+            for name in sorted(os.listdir(queueDirectory)):
+                if name.endswith(".json") and name not in loaded:
+                    loaded.add(name)
+                    (case, _, features) = loadCase(os.path.join(queueDirectory, name))
+                    corpus.append(case)
+                    seen |= features
+
+        if len(corpus) > 0 and rng.random() < config.mutationRate:
+            case = mutateCase(rng, rng.choice(corpus), config)
+        else:
+            case = generateCase(rng, config)
+
+        (mismatch, features) = runCase(case, poolClass)
+        stats["cases"] += 1
+        stats["operations"] += len(case["operations"])
+        if mismatch != None:
+            (case, mismatch) = shrinkCase(case, poolClass)
+            stats["failures"].append(saveCase(failuresDirectory, case, mismatch))
+        elif not features <= seen:
+            seen |= features
+            corpus.append(case)
+            loaded.add(os.path.basename(saveCase(queueDirectory, case, None, features)))
+            stats["corpus"] += 1
+    return stats
+
+
+## @notice Runs fuzzWorker in parallel processes.
+## @param seed Seed of the run, each worker gets its own seed derived from it
+## @param iterations Number of cases run by each worker
+## @param workers Number of worker processes
+## @return stats The merged stats of the workers
+def runFuzz(seed, iterations, workers, corpusDirectory, config=None):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                fuzzWorker, seed * 1000003 + index, iterations, corpusDirectory, config
+            )
+            for index in range(workers)
+        ]
+        results = [future.result() for future in futures]
+    stats = dict(cases=0, operations=0, corpus=0, failures=[])
+    for result in results:
+        for key in stats:
+            stats[key] += result[key]
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Differential fuzzing of ChainflipPool against UniswapPool"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=1000, help="cases per worker")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--corpus", default="fuzzCorpus")
+    parser.add_argument(
+        "--replay", nargs="+", default=[], help="rerun saved cases instead of fuzzing"
+    )
+    arguments = parser.parse_args()
+
+    if len(arguments.replay) > 0:
+        for path in arguments.replay:
+            (case, _, _) = loadCase(path)
+            (mismatch, _) = runCase(case)
+            print(path, "ok" if mismatch == None else mismatch)
+    else:
+        start = time.perf_counter()
+        stats = runFuzz(
+            arguments.seed, arguments.iterations, arguments.workers, arguments.corpus
+        )
+        elapsed = time.perf_counter() - start
+        print("cases:      ", stats["cases"])
+        print("operations: ", stats["operations"])
+        print("ops/sec:    ", round(stats["operations"] / elapsed))
+        print("corpus:     ", stats["corpus"], "new entries")
+        print("failures:   ", len(stats["failures"]))
+        for path in stats["failures"]:
+            print("  ", path)
@@ -0,0 +1,260 @@
+import argparse
+import concurrent.futures
+import copy
+import importlib
+import json
+import os
+import sys
+import time
+
+from uniswapV3Python.src.libraries.Shared import *
+from .ChainflipPool import ChainflipPool
+from .OrderFlow import OrderFlowConfig, generateOperations
+from .PoolReplay import ReplayLedger
+from ..reference.ChainflipPool import ChainflipPool as ReferencePool
+
+### @title Equivalence
+### @notice Checks that an optimized pool gives bit-identical results to the reference implementation: the frozen
+### copy of the ChainflipPool logic and of its math libraries in jitAMM/reference.
+### @dev Seeded operation streams (see OrderFlow) run on a reference pool and on a candidate pool side by side.
+### After every operation the outcome (the value returned or the exception raised) and the full state of both pools
+### are compared, as well as the ledger balances of every account. Operations are atomic on both pools, so that a
+### revert leaves them as they were: the candidate through ChainflipPool.atomicCall and the reference, which has no
+### undo log, by restoring a copy. The state is read from the pool attributes,
+### not through the pools' own hashing, so it is compared entry by entry and the first entry that differs is
+### reported. Usable from pytest (assertEquivalent) and as a soak job running streams until a deadline:
+### python -m jitAMM.src.Equivalence --seconds 3600 [--candidate module:Class]
+
+DEFAULT_CANDIDATE = "jitAMM.src.ChainflipPool:ChainflipPool"
+
+## Kinds of state entries (see canonicalState), in the order differences are looked for
+ENTRY_KINDS = [
+    "pool",
+    "topOfBook",
+    "tick",
+    "position",
+    "limitTick",
+    "limitOrder",
+    "account",
+]
+
+
+# Field values of a dataclass instance. Much faster than dataclasses.astuple, which deep-copies them.
+def _values(instance):
+    return tuple(instance.__dict__.values())
+
+
+## @notice Full state of a pool, as a dictionary entry key => values.
+## @dev Entries are ("pool",), ("topOfBook",), ("tick", tick), ("position", owner, tickLower, tickUpper),
+## ("limitTick", isToken0, tick), ("limitOrder", owner, tick, isToken0) and ("account", address). Caches are
+## only included through the values they return (topOfBook).
+def canonicalState(pool):
+    state = dict()
+    state[("pool",)] = (
+        pool.token0,
+        pool.token1,
+        pool.fee,
+        pool.tickSpacing,
+        _values(pool.slot0),
+        pool.liquidity,
+        pool.feeGrowthGlobal0X128,
+        pool.feeGrowthGlobal1X128,
+        _values(pool.protocolFees),
+        pool.balances[pool.token0],
+        pool.balances[pool.token1],
+    )
+    # The reference defines its own BestLimitTick class
+    state[("topOfBook",)] = tuple(
+        None if best == None else _values(best) for best in pool.topOfBook()[:2]
+    )
+    for tick, info in pool.ticks.items():
+        state[("tick", tick)] = _values(info)
+    for key, (owner, tickLower, tickUpper) in pool.positionOwners.items():
+        position = pool.positions.get(key)
+        if position != None:
+            state[("position", owner, tickLower, tickUpper)] = _values(position)
+    for isToken0, ticksLimitMap in [
+        (True, pool.ticksLimitTokens0),
+        (False, pool.ticksLimitTokens1),
+    ]:
+        for tick, info in ticksLimitMap.items():
+            state[("limitTick", isToken0, tick)] = (
+                info.liquidityGross,
+                info.oneMinusPercSwap,
+                info.feeGrowthInsideX128,
+                tuple(info.ownerPositions),
+            )
+    for key, (owner, tick, isToken0) in pool.limitOrderOwners.items():
+        position = pool.limitOrders.get(key)
+        if position != None:
+            state[("limitOrder", owner, tick, isToken0)] = _values(position)
+    for address, account in pool.ledger.accounts.items():
+        state[("account", address)] = tuple(sorted(account.balances.items()))
+    return state
+
+
+## @notice First difference between two states.
+## @return difference None if the states are equal, otherwise (key, referenceValues, candidateValues)
+def stateDifference(referenceState, candidateState):
+    if referenceState == candidateState:
+        return None
+    # Pool entries first and ledger accounts last, which usually diverge as a consequence of the others
+    for key in sorted(
+        set(referenceState) | set(candidateState),
+        key=lambda key: (ENTRY_KINDS.index(key[0]), repr(key)),
+    ):
+        (referenceValues, candidateValues) = (
+            referenceState.get(key),
+            candidateState.get(key),
+        )
+        if referenceValues != candidateValues:
+            return key, referenceValues, candidateValues
+
+
+def _call(pool, name, args):
+    try:
+        return "ok", pool.atomicCall(name, *args)
+    except Exception as exception:
+        return type(exception).__name__ + ": " + str(exception), None
+
+
+# Returns the reference pool after the call too, which is a copy of the pool before the call if it reverted
+def _callReference(reference, name, args):
+    saved = copy.deepcopy(reference)
+    try:
+        return ("ok", getattr(reference, name)(*args)), reference
+    except Exception as exception:
+        return (type(exception).__name__ + ": " + str(exception), None), saved
+
+
+def _createPool(poolClass, config):
+    return poolClass(
+        config.token0,
+        config.token1,
+        config.fee,
+        config.tickSpacing,
+        ReplayLedger([config.token0, config.token1]),
+    )
+
+
+## @notice Runs a stream on a reference and a candidate pool and compares them after every operation.
+## @param seed Seed of the stream (see OrderFlow.generateOperations)
+## @param count Number of operations of the stream
+## @param candidateClass Class of the pool checked against the reference
+## @param config OrderFlowConfig of the stream
+## @return mismatch None if the pools are equivalent, otherwise a dictionary with the seed, the index, name and
+## arguments of the operation after which they diverged, the field that differs and both values
+def checkStream(seed, count, candidateClass=ChainflipPool, config=None):
+    if config == None:
+        config = OrderFlowConfig()
+    reference = _createPool(ReferencePool, config)
+    candidate = _createPool(candidateClass, config)
+
+    for index, (name, args) in enumerate(generateOperations(seed, config, count)):
+        (referenceOutcome, reference) = _callReference(reference, name, args)
+        candidateOutcome = _call(candidate, name, args)
+        difference = None
+        if referenceOutcome != candidateOutcome:
+            difference = ("outcome", referenceOutcome, candidateOutcome)
+        else:
+            difference = stateDifference(
+                canonicalState(reference), canonicalState(candidate)
+            )
+        if difference != None:
+            return dict(
+                seed=seed,
+                index=index,
+                operation=name,
+                args=repr(args),
+                field=repr(difference[0]),
+                reference=repr(difference[1]),
+                candidate=repr(difference[2]),
+            )
+    return None
+
+
+## @notice Asserts that a stream gives the same results on the reference and on a candidate pool, for pytest.
+def assertEquivalent(seed, count, candidateClass=ChainflipPool, config=None):
+    mismatch = checkStream(seed, count, candidateClass, config)
+    assert mismatch == None, "Pools diverged: {}".format(mismatch)
+
+
+## @notice Imports a candidate pool class given as "module:Class".
+def loadCandidate(path):
+    (module, name) = path.split(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _soakWorker(firstSeed, step, deadline, count, candidatePath, config):
+    candidateClass = loadCandidate(candidatePath)
+    stats = dict(streams=0, operations=0, mismatches=[])
+    seed = firstSeed
+    while time.time() < deadline:
+        mismatch = checkStream(seed, count, candidateClass, config)
+        stats["streams"] += 1
+        stats["operations"] += count
+        if mismatch != None:
+            stats["mismatches"].append(mismatch)
+        seed += step
+    return stats
+
+
+## @notice Runs streams with consecutive seeds until a deadline, in parallel processes.
+## @param seconds Duration of the soak
+## @param seed First seed, worker i runs seeds seed + i, seed + i + workers, ...
+## @param count Number of operations of every stream
+## @param workers Number of worker processes
+## @param candidatePath Candidate pool class as "module:Class", importable by the workers
+## @return stats Dictionary with the number of streams and operations run and the mismatches found
+def soak(
+    seconds, seed=0, count=1000, workers=1, candidatePath=DEFAULT_CANDIDATE, config=None
+):
+    deadline = time.time() + seconds
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _soakWorker,
+                seed + index,
+                workers,
+                deadline,
+                count,
+                candidatePath,
+                config,
+            )
+            for index in range(workers)
+        ]
+        results = [future.result() for future in futures]
+    stats = dict(streams=0, operations=0, mismatches=[])
+    for result in results:
+        for key in stats:
+            stats[key] += result[key]
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check a pool implementation against the frozen reference"
+    )
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--count", type=int, default=1000, help="operations per stream")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--candidate", default=DEFAULT_CANDIDATE)
+    parser.add_argument("--output", default="equivalence.json")
+    arguments = parser.parse_args()
+
+    stats = soak(
+        arguments.seconds,
+        arguments.seed,
+        arguments.count,
+        arguments.workers,
+        arguments.candidate,
+    )
+    print("streams:    ", stats["streams"])
+    print("operations: ", stats["operations"])
+    print("mismatches: ", len(stats["mismatches"]))
+    if len(stats["mismatches"]) > 0:
+        with open(arguments.output, "w") as file:
+            json.dump(stats["mismatches"], file, indent=1)
+        print("mismatches written to", arguments.output)
+    sys.exit(1 if len(stats["mismatches"]) > 0 else 0)
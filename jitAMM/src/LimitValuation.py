@@ -0,0 +1,114 @@
+import numpy as np
+
+from uniswapV3Python.src.libraries.Shared import *
+from .libraries import LimitOrderTickMath, PositionLimit
+
+### @title LimitValuation
+### @notice Columnar export of the limit positions of a pool and vectorized valuation of all of them at once, e.g.
+### for risk reports over millions of positions.
+### @dev The valuation reproduces the split of PositionLimit.getOwed (the amounts a burn of the whole position would
+### credit) without any Decimal work per position. The fraction of a position swapped only depends on its tick, side
+### and oneMinusPercSwapMint, so it is computed once per distinct (tick, isToken0, oneMinusPercSwapMint) with the
+### scalar Decimal math and turned into a Q128 fixed point integer. The rest is integer math on NumPy object arrays,
+### since liquidities, fee growths and amounts don't fit in 64 bits.
+### Rounding: the fixed point fractions are rounded so that positions are never overvalued. Compared to the scalar
+### path, amountSwapped and liquidityLeft can be 1 lower, and the amount swapped converted to the other token
+### ceil(priceX96 / 2**96) lower for token0 positions and ceil(2**96 / priceX96) lower for token1 positions. Fees and
+### the tokensOwed already credited are exact.
+
+## @notice Exports the limit positions of a pool as columns, in a single pass over the positions.
+## @param pool The ChainflipPool
+## @return columns Dictionary column name => array (see EXPORT_COLUMNS["limitOrders"]), one row per position
+def exportLimitOrders(pool):
+    return pool.exportColumns(["limitOrders"])["limitOrders"]
+
+
+## @notice Values all the limit positions of a pool at once.
+## @param pool The ChainflipPool
+## @param columns The export of the pool's limit positions (see exportLimitOrders), exported if None
+## @return valuation Dictionary column name => object array, one row per position in the order of the export:
+## liquidityLeft and amountSwapped in the position's token, tokensOwed0 and tokensOwed1 as returned by
+## PositionLimit.getOwed, amount0 and amount1 the tokens held by the position (tokens owed and liquidity left), and
+## value0 and value1 the value of those in token0 and in token1 at the current pool price
+def valueLimitOrders(pool, columns=None):
+    if columns == None:
+        columns = exportLimitOrders(pool)
+    ticks = columns["tick"]
+    isToken0 = columns["isToken0"]
+    liquidity = columns["liquidity"]
+
+    # Distinct (tick, isToken0, oneMinusPercSwapMint) and the one of every position
+    groups = dict()
+    groupIndex = np.empty(len(ticks), dtype=np.int64)
+    for index, groupKey in enumerate(
+        zip(ticks.tolist(), isToken0.tolist(), columns["oneMinusPercSwapMint"])
+    ):
+        groupIndex[index] = groups.setdefault(groupKey, len(groups))
+
+    percSwappedX128 = np.zeros(len(groups), dtype=object)
+    percSwappedRoundUpX128 = np.zeros(len(groups), dtype=object)
+    priceX96 = np.zeros(len(groups), dtype=object)
+    feeGrowthInsideX128 = np.zeros(len(groups), dtype=object)
+    prices = dict()
+    for (tick, groupIsToken0, oneMinusPercSwapMint), group in groups.items():
+        if tick not in prices:
+            prices[tick] = LimitOrderTickMath.getPriceAtTick(tick)
+        priceX96[group] = prices[tick]
+        ticksLimitMap = (
+            pool.ticksLimitTokens0 if groupIsToken0 else pool.ticksLimitTokens1
+        )
+        info = ticksLimitMap.get(tick)
+        # Burnt positions waiting to be collected, their tick might have been cleared
+        if info == None:
+            continue
+        (percSwapped, percSwappedRoundUp) = PositionLimit.getPercSwapped(
+            oneMinusPercSwapMint, info.oneMinusPercSwap
+        )
+        # Exact conversions, the Decimals are ratios of integers
+        (numerator, denominator) = percSwapped.as_integer_ratio()
+        percSwappedX128[group] = (numerator << 128) // denominator
+        (numerator, denominator) = percSwappedRoundUp.as_integer_ratio()
+        percSwappedRoundUpX128[group] = -((-numerator << 128) // denominator)
+        feeGrowthInsideX128[group] = info.feeGrowthInsideX128
+
+    amountSwapped = (liquidity * percSwappedX128[groupIndex]) >> 128
+    liquidityLeft = liquidity + (
+        (-(liquidity * percSwappedRoundUpX128[groupIndex])) >> 128
+    )
+
+    # Same as LimitOrderMath.calculateAmount1LO and calculateAmount0LO rounding down
+    positionPriceX96 = priceX96[groupIndex]
+    amountSwappedConverted = np.where(
+        isToken0,
+        amountSwapped * positionPriceX96 // FixedPoint96_Q96,
+        amountSwapped * FixedPoint96_Q96 // positionPriceX96,
+    )
+    # Uniswap's uint128 overflow of the fees, as in PositionLimit.update
+    fees = (
+        (
+            (feeGrowthInsideX128[groupIndex] - columns["feeGrowthInsideLastX128"])
+            % 2**256
+        )
+        * liquidity
+        >> 128
+    ) & MAX_UINT128
+    tokensOwed0 = columns["tokensOwed0"] + np.where(
+        isToken0, 0, amountSwappedConverted + fees
+    )
+    tokensOwed1 = columns["tokensOwed1"] + np.where(
+        isToken0, amountSwappedConverted + fees, 0
+    )
+
+    amount0 = tokensOwed0 + np.where(isToken0, liquidityLeft, 0)
+    amount1 = tokensOwed1 + np.where(isToken0, 0, liquidityLeft)
+    priceX192 = pool.slot0.sqrtPriceX96**2
+    return {
+        "liquidityLeft": liquidityLeft,
+        "amountSwapped": amountSwapped,
+        "tokensOwed0": tokensOwed0,
+        "tokensOwed1": tokensOwed1,
+        "amount0": amount0,
+        "amount1": amount1,
+        "value0": amount0 + (amount1 << 192) // priceX192,
+        "value1": amount1 + (amount0 * priceX192 >> 192),
+    }
@@ -0,0 +1,270 @@
+import math
+import random
+from dataclasses import field
+
+from uniswapV3Python.src.libraries import TickMath
+from uniswapV3Python.src.libraries.Shared import *
+from .ChainflipPool import ChainflipPool
+from .PoolReplay import ReplayLedger
+from .libraries import PoolJournal
+from .libraries.SharedLimitOrder import getMinTickLO, getMaxTickLO
+
+### @title OrderFlow
+### @notice Seeded synthetic order flow: a reproducible stream of pool operations (range mints and burns, limit
+### order ladders, cancels, collects and swaps in both directions, exact input and exact output) for load tests
+### and backtests.
+### @dev The flow is generated lazily and doesn't depend on the pool it is applied to, so the same flow can be
+### replayed on pools with different parameters. Prices follow a reference tick doing a random walk, which the
+### orders are placed around. The generator only keeps the open positions it may burn, cancel or collect later,
+### capped at maxOpenPositions, so it runs in constant memory however many operations are generated. Operations
+### can still revert in the pool (e.g. cancelling a limit order that has been fully swapped and burnt), they are
+### applied atomically so that a revert leaves the pool unchanged, the same way the pool journal replays them.
+
+MAX_UINT128 = 2**128 - 1
+
+KINDS = ["mint", "burn", "limitLadder", "cancel", "collect", "swap"]
+
+
+## @notice Log-uniform integer between low and high (both included).
+def logUniform(rng, low, high):
+    return min(high, int(math.exp(rng.uniform(math.log(low), math.log(high + 1)))))
+
+
+## @notice Normally distributed tick offset with standard deviation scale.
+def gaussianOffset(rng, scale):
+    return round(rng.gauss(0, scale))
+
+
+@dataclass
+class OrderFlowConfig:
+    token0: str = "token0"
+    token1: str = "token1"
+    fee: int = 3000
+    tickSpacing: int = 60
+    initialTick: int = 0
+    ## Number of liquidity providers and of traders
+    owners: int = 100
+    ## Relative frequency of each kind of operation
+    weights: dict = field(
+        default_factory=lambda: dict(
+            mint=10, burn=5, limitLadder=10, cancel=5, collect=5, swap=65
+        )
+    )
+    ## Function (rng, low, high) => amount, for the liquidity and the swap amounts
+    sizeDistribution: object = logUniform
+    liquidityAmounts: tuple = (10**15, 10**21)
+    swapAmounts: tuple = (10**14, 10**20)
+    ## Fraction of the swaps that are exact output
+    exactOutputFraction: float = 0.3
+    ## Function (rng, scale) => tick offset, for the moves of the reference tick and the placement of the orders
+    priceDistribution: object = gaussianOffset
+    ## Scale of the move of the reference tick after every operation
+    priceVolatility: float = 10
+    ## Scale of the distance of the orders to the reference tick
+    orderSpread: float = 600
+    ## Width of the range orders in tick spacings
+    rangeWidths: tuple = (1, 100)
+    ## Number of limit orders per ladder
+    ladderSizes: tuple = (1, 5)
+    ## Swaps stop this many ticks away from the reference tick
+    maxSlippageTicks: int = 5000
+    ## Open positions tracked for later burns, cancels and collects. Once reached, positions are closed.
+    maxOpenPositions: int = 10000
+
+
+## @notice Generates a stream of pool operations.
+## @param seed The seed of the flow, the same seed and config always generate the same operations
+## @param config OrderFlowConfig
+## @param count Number of operations to generate, unbounded if None. An initialize operation comes first.
+## @return operations Generator of (name, args), name being a ChainflipPool function
+def generateOperations(seed, config=None, count=None):
+    if config == None:
+        config = OrderFlowConfig()
+    rng = random.Random(seed)
+    spacing = config.tickSpacing
+    (minTick, maxTick) = (getMinTickLO(spacing), getMaxTickLO(spacing))
+    # Kind and cumulative weight
+    kinds = [kind for kind in KINDS if config.weights.get(kind, 0) > 0]
+    cumulativeWeights = []
+    for kind in kinds:
+        cumulativeWeights.append(
+            config.weights[kind] + (cumulativeWeights[-1] if cumulativeWeights else 0)
+        )
+    # Open positions: ("range", owner, tickLower, tickUpper, amount) or ("limit", token, owner, tick, amount)
+    openPositions = []
+
+    def clampTick(tick):
+        return max(minTick, min(maxTick, tick))
+
+    def spacedTick(tick):
+        return clampTick(tick // spacing * spacing)
+
+    # Removes a random open position of the given type, None if none is found after a few tries
+    def takePosition(positionType):
+        for _ in range(8):
+            if len(openPositions) == 0:
+                return None
+            index = rng.randrange(len(openPositions))
+            if openPositions[index][0] == positionType:
+                # Swap with the last one to remove it in O(1)
+                (openPositions[index], openPositions[-1]) = (
+                    openPositions[-1],
+                    openPositions[index],
+                )
+                return openPositions.pop()
+        return None
+
+    reference = config.initialTick
+    yield ("initialize", (TickMath.getSqrtRatioAtTick(reference),))
+
+    generated = 0
+    while count == None or generated < count:
+        if len(openPositions) >= config.maxOpenPositions:
+            # Close the last position opened
+            kind = "burn" if openPositions[-1][0] == "range" else "cancel"
+            position = openPositions.pop()
+        else:
+            kind = rng.choices(kinds, cum_weights=cumulativeWeights)[0]
+            if kind == "burn":
+                position = takePosition("range")
+            elif kind == "cancel":
+                position = takePosition("limit")
+        owner = "lp" + str(rng.randrange(config.owners))
+
+        if kind == "mint":
+            width = rng.randint(*config.rangeWidths) * spacing
+            center = reference + config.priceDistribution(rng, config.orderSpread)
+            tickLower = spacedTick(center - width // 2)
+            tickUpper = spacedTick(center + width // 2)
+            if tickUpper == tickLower:
+                tickUpper = tickLower + spacing
+            amount = config.sizeDistribution(rng, *config.liquidityAmounts)
+            openPositions.append(("range", owner, tickLower, tickUpper, amount))
+            operations = [("mint", (owner, tickLower, tickUpper, amount))]
+
+        elif kind == "burn":
+            if position == None:
+                continue
+            (_, owner, tickLower, tickUpper, amount) = position
+            operations = [
+                ("burn", (owner, tickLower, tickUpper, amount)),
+                ("collect", (owner, tickLower, tickUpper, MAX_UINT128, MAX_UINT128)),
+            ]
+
+        elif kind == "limitLadder":
+            # Token0 limit orders are placed above the reference tick and token1 ones below
+            isToken0 = rng.random() < 0.5
+            token = config.token0 if isToken0 else config.token1
+            direction = 1 if isToken0 else -1
+            distance = abs(config.priceDistribution(rng, config.orderSpread))
+            step = rng.randint(1, 10) * spacing
+            amount = config.sizeDistribution(rng, *config.liquidityAmounts)
+            rungs = rng.randint(*config.ladderSizes)
+            operations = []
+            for rung in range(rungs):
+                tick = spacedTick(reference + direction * (distance + rung * step))
+                openPositions.append(("limit", token, owner, tick, amount // rungs))
+                operations.append(
+                    ("mintLimitOrder", (token, owner, tick, amount // rungs))
+                )
+
+        elif kind == "cancel":
+            if position == None:
+                continue
+            (_, token, owner, tick, amount) = position
+            operations = [("burnLimitOrder", (token, owner, tick, amount))]
+
+        elif kind == "collect":
+            if len(openPositions) == 0:
+                continue
+            position = rng.choice(openPositions)
+            if position[0] == "range":
+                (_, owner, tickLower, tickUpper, _) = position
+                operations = [
+                    (
+                        "collect",
+                        (owner, tickLower, tickUpper, MAX_UINT128, MAX_UINT128),
+                    )
+                ]
+            else:
+                (_, token, owner, tick, _) = position
+                operations = [
+                    (
+                        "collectLimitOrder",
+                        (owner, token, tick, MAX_UINT128, MAX_UINT128),
+                    )
+                ]
+
+        else:
+            zeroForOne = rng.random() < 0.5
+            amount = config.sizeDistribution(rng, *config.swapAmounts)
+            if rng.random() < config.exactOutputFraction:
+                amount = -amount
+            limitTick = clampTick(
+                reference
+                + (-config.maxSlippageTicks if zeroForOne else config.maxSlippageTicks)
+            )
+            operations = [
+                (
+                    "swap",
+                    (
+                        "trader" + str(rng.randrange(config.owners)),
+                        zeroForOne,
+                        amount,
+                        TickMath.getSqrtRatioAtTick(limitTick),
+                    ),
+                )
+            ]
+
+        for operation in operations:
+            if count != None and generated == count:
+                break
+            generated += 1
+            yield operation
+        reference = clampTick(
+            reference + config.priceDistribution(rng, config.priceVolatility)
+        )
+
+
+## @notice Creates a pool for a flow. Accounts are created on demand and balances are not checked.
+def createPool(config=None):
+    if config == None:
+        config = OrderFlowConfig()
+    return ChainflipPool(
+        config.token0,
+        config.token1,
+        config.fee,
+        config.tickSpacing,
+        ReplayLedger([config.token0, config.token1]),
+    )
+
+
+## @notice Applies operations to a pool. Operations are called atomically (see ChainflipPool.atomicCall): the ones
+## that revert leave the pool unchanged and their exceptions are swallowed.
+## @param pool The ChainflipPool
+## @param operations Iterable of (name, args)
+## @return applied Number of operations applied, including the ones that reverted
+## @return reverted Number of operations that reverted
+def applyOperations(pool, operations):
+    applied = 0
+    reverted = 0
+    for name, args in operations:
+        try:
+            pool.atomicCall(name, *args)
+        except Exception:
+            reverted += 1
+        applied += 1
+    return applied, reverted
+
+
+## @notice Writes a flow to a pool journal (see PoolJournal), running it on a new journaled pool so the journal
+## records which operations revert.
+## @param file Binary file object to write the journal to
+## @param operations Iterable of (name, args)
+## @param config The OrderFlowConfig of the flow
+## @return applied Number of operations written
+## @return reverted Number of operations that reverted
+def writeJournal(file, operations, config=None):
+    pool = createPool(config)
+    pool.startJournal(PoolJournal.JournalWriter(file))
+    return applyOperations(pool, operations)
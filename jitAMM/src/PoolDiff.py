@@ -0,0 +1,113 @@
+import dataclasses
+import os
+
+from uniswapV3Python.src.libraries.Shared import *
+from .ChainflipPool import ChainflipPool
+
+### @title PoolDiff
+### @notice Structural diff between two pool states, e.g. to find where a replica diverged or why a test failed.
+### @dev Built on the pools' incremental digests (see ChainflipPool.digest): only the tick buckets whose digests
+### differ are compared entry by entry, so diffing two pools with maintained digests takes time proportional to
+### the differences (and the size of the buckets containing them) rather than to the size of the pools.
+
+
+@dataclass
+class PoolDifference:
+    ## "pool", "slot0", "protocolFees", "balances", "tick", "position", "limitTick" or "limitOrder"
+    kind: str
+    ## Field name for the pool fields, token for the balances or the state entry key for the books:
+    ## tick, (tickLower, tickUpper, owner), (tick, isToken0) or (tick, isToken0, owner)
+    key: object
+    ## Value in each pool, None if the entry doesn't exist
+    a: object
+    b: object
+
+
+## @notice Compares two pools, or two pool snapshot files.
+## @param a ChainflipPool or path of a snapshot (see ChainflipPool.save)
+## @param b ChainflipPool or path of a snapshot
+## @return differences List of PoolDifference sorted by kind and key
+def diffPools(a, b):
+    (a, b) = (loadPool(a), loadPool(b))
+    differences = []
+
+    def compare(kind, key, valueA, valueB):
+        if valueA != valueB:
+            differences.append(PoolDifference(kind, key, valueA, valueB))
+
+    for field in [
+        "token0",
+        "token1",
+        "fee",
+        "tickSpacing",
+        "liquidity",
+        "feeGrowthGlobal0X128",
+        "feeGrowthGlobal1X128",
+    ]:
+        compare("pool", field, getattr(a, field), getattr(b, field))
+    for field in dataclasses.fields(a.slot0):
+        compare(
+            "slot0",
+            field.name,
+            getattr(a.slot0, field.name),
+            getattr(b.slot0, field.name),
+        )
+    for field in dataclasses.fields(a.protocolFees):
+        compare(
+            "protocolFees",
+            field.name,
+            getattr(a.protocolFees, field.name),
+            getattr(b.protocolFees, field.name),
+        )
+    for token in sorted(set(a.balances) | set(b.balances)):
+        compare("balances", token, a.balances.get(token), b.balances.get(token))
+
+    # Books: only the buckets whose digests differ
+    (bucketsA, bucketsB) = (a.digestBuckets(), b.digestBuckets())
+    entryDifferences = []
+    for bucket in set(bucketsA) | set(bucketsB):
+        if bucketsA.get(bucket) == bucketsB.get(bucket):
+            continue
+        (entriesA, entriesB) = (a.digestEntries(bucket), b.digestEntries(bucket))
+        for key in set(entriesA) | set(entriesB):
+            if entriesA.get(key) != entriesB.get(key):
+                entryDifferences.append(
+                    PoolDifference(
+                        key[0],
+                        key[1:] if len(key) > 2 else key[1],
+                        getEntry(a, key),
+                        getEntry(b, key),
+                    )
+                )
+
+    kinds = ["tick", "position", "limitTick", "limitOrder"]
+    entryDifferences.sort(
+        key=lambda difference: (kinds.index(difference.kind), difference.key)
+    )
+    return differences + entryDifferences
+
+
+## @dev Returns a pool, loading it if a snapshot path is given. Loaded pools have no ledger.
+def loadPool(pool):
+    if isinstance(pool, ChainflipPool):
+        return pool
+    assert isinstance(pool, (str, os.PathLike)), "Not a pool or a snapshot path"
+    return ChainflipPool.load(pool, None)
+
+
+## @dev Returns the object stored in a pool for a state entry key (see ChainflipPool.digestEntries).
+def getEntry(pool, key):
+    kind = key[0]
+    if kind == "tick":
+        return pool.ticks.get(key[1])
+    elif kind == "position":
+        (_, tickLower, tickUpper, owner) = key
+        return pool.positions.get(hash((owner, tickLower, tickUpper)))
+    elif kind == "limitTick":
+        (_, tick, isToken0) = key
+        return (pool.ticksLimitTokens0 if isToken0 else pool.ticksLimitTokens1).get(
+            tick
+        )
+    else:
+        (_, tick, isToken0, owner) = key
+        return pool.limitOrders.get(getHashLimit(owner, tick, isToken0))
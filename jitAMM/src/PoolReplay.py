@@ -0,0 +1,106 @@
+import argparse
+import time
+
+from uniswapV3Python.src.libraries.Account import Account, Ledger
+from .ChainflipPool import ChainflipPool
+from .libraries import PoolJournal
+
+### @title PoolReplay
+### @notice Rebuilds a ChainflipPool from a PoolJournal.
+### @dev Ledger validation is switched off: accounts are created on first use and balances are not checked, so
+### user balances end up holding the net token flows with the pool (they can be negative). The pool math and
+### its health checks are part of the state transition and are kept. Transfers the live ledger rejected are
+### rejected again (see replay).
+
+
+class ReplayLedger(Ledger):
+    def __init__(self, tokens):
+        super().__init__([])
+        self.tokens = tokens
+        # Number of transfers accepted before rejecting one, None to accept all of them
+        self.transfersLeft = None
+
+    def getAccountWithAddress(self, address):
+        account = self.accounts.get(address)
+        if account == None:
+            account = Account(address, self.tokens, [0] * len(self.tokens))
+            # Keep the journaled address
+            account.address = address
+            self.accounts[address] = account
+        return account
+
+    def transferToken(self, sender, recipient, token, amount):
+        if self.transfersLeft != None:
+            assert self.transfersLeft > 0, "Transfer rejected by the live ledger"
+            self.transfersLeft -= 1
+        if type(recipient) == str:
+            recipient = self.getAccountWithAddress(recipient)
+        if type(sender) == str:
+            sender = self.getAccountWithAddress(sender)
+        sender.balances[token] -= amount
+        recipient.balances[token] += amount
+
+    def receiveToken(self, recipient, token, amount):
+        if type(recipient) == str:
+            recipient = self.getAccountWithAddress(recipient)
+        recipient.balances[token] += amount
+
+
+### @notice Rebuilds a pool by replaying a journal.
+### @dev Calls that reverted in the live pool are replayed too, since they might have modified the pool state
+### before reverting. Their transfer rejected by the live ledger, if any, is rejected again so they stop at the same
+### point, and they must revert again. Reverted calls made through ChainflipPool.atomicCall have left the live pool
+### unchanged, so with atomic=True they are skipped.
+### @param file Binary file object positioned at the start of the journal
+### @param atomic Whether the reverted calls were made atomically
+### @return pool The rebuilt pool
+### @return operations The number of operations replayed
+def replay(file, atomic=False):
+    records = PoolJournal.readRecords(file)
+    (name, (token0, token1, fee, tickSpacing, precisionEpochs), _, _) = next(records)
+    assert name == "pool", "Journal without a pool record"
+
+    pool = ChainflipPool(
+        token0, token1, fee, tickSpacing, ReplayLedger([token0, token1])
+    )
+    pool.precisionEpochs = precisionEpochs
+
+    operations = 0
+    for name, args, reverted, rejectedTransfer in records:
+        function = getattr(pool, name)
+        if not reverted:
+            function(*args)
+        elif not atomic:
+            pool.ledger.transfersLeft = rejectedTransfer
+            try:
+                function(*args)
+            except Exception:
+                pass
+            else:
+                # Health check
+                assert False, "Reverted call succeeded on replay"
+            finally:
+                pool.ledger.transfersLeft = None
+        operations += 1
+
+    return pool, operations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild a pool from its journal")
+    parser.add_argument("journal", help="path to the pool journal")
+    parser.add_argument(
+        "--atomic",
+        action="store_true",
+        help="skip the reverted calls (journals of atomic calls)",
+    )
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(arguments.journal, "rb") as file:
+        (pool, operations) = replay(file, arguments.atomic)
+    elapsed = time.perf_counter() - start
+
+    print("operations: ", operations)
+    print("ops/sec:    ", round(operations / elapsed) if elapsed > 0 else operations)
+    print("state hash: ", pool.stateHash())
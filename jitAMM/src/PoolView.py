@@ -0,0 +1,144 @@
+import mmap
+import os
+
+from uniswapV3Python.src.libraries.Shared import *
+from uniswapV3Python.src.libraries import TickMath
+from .libraries import LiquidityCurve, PoolSnapshot
+
+### @title PoolView
+### @notice Read-only view of a pool backed by a memory-mapped snapshot (see ChainflipPool.save).
+### @dev The limit and range ticks are read directly from the sorted fixed-width sections of the mapped file and
+### decoded on access, so the quotes don't build any per-tick Python objects. Processes mapping the same
+### snapshot share a single physical copy through the page cache. Snapshots are published atomically, so a view
+### keeps working on the snapshot it mapped until it is reopened.
+
+
+class PoolView:
+    ## @param path The path of the snapshot file
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.inode = os.fstat(file.fileno()).st_ino
+
+        (counts, strings, offset) = PoolSnapshot.readHeader(self.data)
+        offsets = PoolSnapshot.sectionOffsets(counts, offset)
+        assert offsets[-1] == len(self.data), "Corrupted snapshot"
+
+        (
+            token0,
+            token1,
+            self.fee,
+            self.tickSpacing,
+            sqrtPriceX96,
+            self.tick,
+            _,
+            liquidity,
+            *_,
+        ) = PoolSnapshot.POOL.unpack_from(self.data, offset)
+        self.token0 = strings[token0]
+        self.token1 = strings[token1]
+        self.sqrtPriceX96 = PoolSnapshot.fromUint(sqrtPriceX96)
+        self.liquidity = PoolSnapshot.fromUint(liquidity)
+        self.stateVersion = counts[0]
+
+        # Sorted ticks and their infos, decoded on access
+        (rangeTicksCount, _, limitTicks0Count, limitTicks1Count) = counts[2:6]
+        self.rangeTicks = PoolSnapshot.RecordArray(
+            self.data,
+            offsets[0],
+            rangeTicksCount,
+            PoolSnapshot.RANGE_TICK,
+            PoolSnapshot.decodeTick,
+        )
+        self.rangeTickInfos = PoolSnapshot.RecordArray(
+            self.data,
+            offsets[0],
+            rangeTicksCount,
+            PoolSnapshot.RANGE_TICK,
+            PoolSnapshot.decodeRangeTick,
+        )
+        self.limitTicks = dict()
+        for isToken0, start, count in [
+            (True, offsets[2], limitTicks0Count),
+            (False, offsets[3], limitTicks1Count),
+        ]:
+            self.limitTicks[isToken0] = (
+                PoolSnapshot.RecordArray(
+                    self.data,
+                    start,
+                    count,
+                    PoolSnapshot.LIMIT_TICK,
+                    PoolSnapshot.decodeTick,
+                ),
+                PoolSnapshot.RecordArray(
+                    self.data,
+                    start,
+                    count,
+                    PoolSnapshot.LIMIT_TICK,
+                    PoolSnapshot.decodeLimitTick,
+                ),
+            )
+
+    ## @notice Whether a newer snapshot has been published at the view's path.
+    def isStale(self):
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            return True
+
+    def close(self):
+        self.data.close()
+
+    ## @dev Walks the mapped books of a swap in the given direction (see LiquidityCurve.walk).
+    def _walk(self, zeroForOne, sqrtPriceLimitX96):
+        # Swapping against token1 limit orders if zeroForOne, token0 otherwise
+        (limitTicks, limitTickInfos) = self.limitTicks[not zeroForOne]
+        return LiquidityCurve.walk(
+            zeroForOne,
+            self.sqrtPriceX96,
+            self.tick,
+            self.liquidity,
+            self.fee,
+            limitTicks,
+            limitTickInfos,
+            self.rangeTicks,
+            self.rangeTickInfos,
+            sqrtPriceLimitX96,
+        )
+
+    ## @notice Same as ChainflipPool.quoteLadder, walking the mapped books only as far as the largest amount.
+    def quoteLadder(self, zeroForOne, amounts):
+        checkInputTypes(bool=(zeroForOne))
+        return LiquidityCurve.quoteLadderWalk(
+            self._walk(
+                zeroForOne,
+                TickMath.MIN_SQRT_RATIO + 1
+                if zeroForOne
+                else TickMath.MAX_SQRT_RATIO - 1,
+            ),
+            zeroForOne,
+            self.fee,
+            amounts,
+            self.sqrtPriceX96,
+            self.liquidity,
+            self.tick,
+        )
+
+    ## @notice Same as ChainflipPool.quote.
+    def quote(self, zeroForOne, amountSpecified):
+        checkInputTypes(int256=(amountSpecified))
+        (result,) = self.quoteLadder(zeroForOne, [amountSpecified])
+        assert result != None, "Swap would revert"
+        return result
+
+    ## @notice Same as ChainflipPool.amountToReachPrice.
+    def amountToReachPrice(self, sqrtPriceTargetX96):
+        checkInputTypes(uint160=(sqrtPriceTargetX96))
+        assert (
+            TickMath.MIN_SQRT_RATIO < sqrtPriceTargetX96 < TickMath.MAX_SQRT_RATIO
+        ), "Target price out of range"
+        if sqrtPriceTargetX96 == self.sqrtPriceX96:
+            return 0, 0, []
+        zeroForOne = sqrtPriceTargetX96 < self.sqrtPriceX96
+        return LiquidityCurve.walkTotals(self._walk(zeroForOne, sqrtPriceTargetX96))
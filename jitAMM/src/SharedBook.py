@@ -0,0 +1,285 @@
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from uniswapV3Python.src.libraries.Shared import *
+from .ChainflipPool import BestLimitTick
+from .libraries import TickLimit
+
+### @title SharedBook
+### @notice Publishes the limit and range order books of a pool to shared memory so that worker processes can read
+### fresh top of book and depth data without pickling the pool.
+### @dev The segment is a header of uint64 words followed by struct-of-arrays sections, one per book, each holding
+### the initialized ticks sorted in ascending order. 128-bit amounts are split in high and low uint64 limbs
+### (the high limb of liquidityNet is signed). The first header word is a seqlock: the writer makes it odd before
+### updating the segment and even afterwards, and readers retry whenever it is odd or has changed during a read.
+### There is a single writer per segment. Requires Python >= 3.8 and numpy.
+
+MASK64 = (1 << 64) - 1
+
+## Header words
+SEQUENCE = 0
+STATE_VERSION = 1
+CAPACITY = 2
+COUNT_LIMIT_TICKS0 = 3
+COUNT_LIMIT_TICKS1 = 4
+COUNT_RANGE_TICKS = 5
+FEE = 6
+TICK = 7
+SQRT_PRICE_X96 = 8  # Three limbs, uint160
+LIQUIDITY = 11  # Two limbs, uint128
+HEADER_WORDS = 13
+
+## Columns of each section: limit ticks (token0 and token1) and range ticks
+LIMIT_COLUMNS = [
+    ("ticks", np.int64),
+    ("liquidityLeftHi", np.uint64),
+    ("liquidityLeftLo", np.uint64),
+]
+RANGE_COLUMNS = [
+    ("ticks", np.int64),
+    ("liquidityNetHi", np.int64),
+    ("liquidityNetLo", np.uint64),
+    ("liquidityGrossHi", np.uint64),
+    ("liquidityGrossLo", np.uint64),
+]
+SECTIONS = [
+    ("limitTicks0", LIMIT_COLUMNS, COUNT_LIMIT_TICKS0),
+    ("limitTicks1", LIMIT_COLUMNS, COUNT_LIMIT_TICKS1),
+    ("rangeTicks", RANGE_COLUMNS, COUNT_RANGE_TICKS),
+]
+
+
+## Names of the segments created by the writers of this process
+writerSegments = set()
+
+
+## @notice Size in bytes of a segment able to hold `capacity` ticks per book.
+def segmentSize(capacity):
+    columns = sum(len(columns) for _, columns, _ in SECTIONS)
+    return 8 * (HEADER_WORDS + columns * capacity)
+
+
+## @notice Zero-copy numpy views over a shared book segment.
+## @return header The header words
+## @return sections Dictionary section name => dictionary column name => full-capacity array
+def mapSegment(buffer, capacity):
+    header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=buffer)
+    sections = dict()
+    offset = 8 * HEADER_WORDS
+    for name, columns, _ in SECTIONS:
+        sections[name] = dict()
+        for column, dtype in columns:
+            sections[name][column] = np.ndarray(
+                (capacity,), dtype=dtype, buffer=buffer, offset=offset
+            )
+            offset += 8 * capacity
+    return header, sections
+
+
+## @notice Splits unsigned or signed integers in high and low 64-bit limbs.
+def splitLimbs(values):
+    return [value >> 64 for value in values], [value & MASK64 for value in values]
+
+
+## @notice Joins high and low 64-bit limbs back into Python integers.
+def joinLimbs(hi, lo):
+    return [(int(h) << 64) | int(l) for h, l in zip(hi, lo)]
+
+
+class SharedBookWriter:
+    ## @param pool The ChainflipPool to publish
+    ## @param capacity Maximum number of initialized ticks in each of the books
+    ## @param name Name of the shared memory segment. A unique name is generated if None.
+    def __init__(self, pool, capacity, name=None):
+        self.pool = pool
+        self.capacity = capacity
+        self.memory = shared_memory.SharedMemory(
+            name=name, create=True, size=segmentSize(capacity)
+        )
+        self.name = self.memory.name
+        writerSegments.add(self.name)
+        (self.header, self.sections) = mapSegment(self.memory.buf, capacity)
+        self.header[:] = 0
+        self.header[CAPACITY] = capacity
+        self.published = False
+
+    ## @notice Publishes the current state of the pool, unless it has already been published.
+    ## @return published Whether the segment has been updated
+    def publish(self):
+        pool = self.pool
+        if self.published and int(self.header[STATE_VERSION]) == pool.stateVersion:
+            return False
+
+        # Build the columns before entering the critical section to keep it short
+        columns = dict()
+        for name, ticksMap in [
+            ("limitTicks0", pool.ticksLimitTokens0),
+            ("limitTicks1", pool.ticksLimitTokens1),
+        ]:
+            ticks = sorted(
+                tick for tick, info in ticksMap.items() if info.oneMinusPercSwap > 0
+            )
+            (hi, lo) = splitLimbs(
+                [TickLimit.getLiquidityLeft(ticksMap[tick]) for tick in ticks]
+            )
+            columns[name] = dict(ticks=ticks, liquidityLeftHi=hi, liquidityLeftLo=lo)
+
+        ticks = sorted(pool.ticks)
+        (netHi, netLo) = splitLimbs([pool.ticks[tick].liquidityNet for tick in ticks])
+        (grossHi, grossLo) = splitLimbs(
+            [pool.ticks[tick].liquidityGross for tick in ticks]
+        )
+        columns["rangeTicks"] = dict(
+            ticks=ticks,
+            liquidityNetHi=netHi,
+            liquidityNetLo=netLo,
+            liquidityGrossHi=grossHi,
+            liquidityGrossLo=grossLo,
+        )
+
+        for name, _, _ in SECTIONS:
+            assert len(columns[name]["ticks"]) <= self.capacity, "Shared book full"
+
+        sqrtPriceX96 = pool.slot0.sqrtPriceX96
+
+        header = self.header
+        header[SEQUENCE] += 1
+        for name, _, countWord in SECTIONS:
+            count = len(columns[name]["ticks"])
+            for column, values in columns[name].items():
+                self.sections[name][column][:count] = values
+            header[countWord] = count
+        header[STATE_VERSION] = pool.stateVersion
+        header[FEE] = pool.fee
+        header[TICK] = pool.slot0.tick & MASK64
+        header[SQRT_PRICE_X96] = sqrtPriceX96 >> 128
+        header[SQRT_PRICE_X96 + 1] = (sqrtPriceX96 >> 64) & MASK64
+        header[SQRT_PRICE_X96 + 2] = sqrtPriceX96 & MASK64
+        header[LIQUIDITY] = pool.liquidity >> 64
+        header[LIQUIDITY + 1] = pool.liquidity & MASK64
+        header[SEQUENCE] += 1
+
+        self.published = True
+        return True
+
+    ## @notice Closes and removes the segment. Attached readers keep their mapping until they close it.
+    def close(self):
+        del self.header, self.sections
+        self.memory.close()
+        self.memory.unlink()
+        writerSegments.discard(self.name)
+
+
+## @notice Consistent view of a shared book, valid only within SharedBookReader.read.
+@dataclass
+class SharedBookState:
+    stateVersion: int
+    fee: int
+    tick: int
+    sqrtPriceX96: int
+    liquidity: int
+    ## Dictionary section name => dictionary column name => numpy view of the initialized ticks
+    sections: dict
+
+
+class SharedBookReader:
+    ## @param name Name of the shared memory segment created by a SharedBookWriter
+    def __init__(self, name):
+        self.memory = shared_memory.SharedMemory(name=name)
+        # Attaching registers the segment with the resource tracker, which would unlink it when the reader exits.
+        # The writer owns it, and the tracker only keeps one registration per segment.
+        if name not in writerSegments:
+            resource_tracker.unregister(self.memory._name, "shared_memory")
+        header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=self.memory.buf)
+        self.capacity = int(header[CAPACITY])
+        (self.header, self.sections) = mapSegment(self.memory.buf, self.capacity)
+
+    ## @notice Runs `function` on a consistent state of the book, retrying if the writer published meanwhile.
+    ## @dev The numpy arrays in the state are zero-copy views of the segment, so `function` must return values
+    ## derived from them (or copies) rather than the views themselves.
+    ## @param function Function taking a SharedBookState
+    ## @return result The value returned by `function`
+    def read(self, function):
+        header = self.header
+        while True:
+            sequence = int(header[SEQUENCE])
+            if sequence % 2 == 1:
+                # Publish in progress
+                time.sleep(0)
+                continue
+            try:
+                sections = dict()
+                for name, columns, countWord in SECTIONS:
+                    # A torn count might be out of bounds
+                    count = min(int(header[countWord]), self.capacity)
+                    sections[name] = {
+                        column: self.sections[name][column][:count]
+                        for column, _ in columns
+                    }
+                tick = int(header[TICK])
+                state = SharedBookState(
+                    int(header[STATE_VERSION]),
+                    int(header[FEE]),
+                    tick - (1 << 64) if tick >> 63 else tick,
+                    (int(header[SQRT_PRICE_X96]) << 128)
+                    | (int(header[SQRT_PRICE_X96 + 1]) << 64)
+                    | int(header[SQRT_PRICE_X96 + 2]),
+                    (int(header[LIQUIDITY]) << 64) | int(header[LIQUIDITY + 1]),
+                    sections,
+                )
+                result = function(state)
+            except Exception:
+                # Torn reads can make `function` fail, only raise if the state was consistent
+                if int(header[SEQUENCE]) == sequence:
+                    raise
+                continue
+            if int(header[SEQUENCE]) == sequence:
+                return result
+
+    ## @notice Same as ChainflipPool.topOfBook, as of the last publish.
+    def topOfBook(self):
+        def getTopOfBook(state):
+            best = []
+            for name, index in [("limitTicks0", 0), ("limitTicks1", -1)]:
+                section = state.sections[name]
+                if len(section["ticks"]) == 0:
+                    best.append(None)
+                else:
+                    best.append(
+                        BestLimitTick(
+                            int(section["ticks"][index]),
+                            (int(section["liquidityLeftHi"][index]) << 64)
+                            | int(section["liquidityLeftLo"][index]),
+                        )
+                    )
+            return best[0], best[1], state.sqrtPriceX96
+
+        return self.read(getTopOfBook)
+
+    ## @notice Returns the best `levels` limit ticks of one side of the book, as of the last publish.
+    ## @param isToken0 Whether to return the token0 or the token1 limit orders
+    ## @param levels Maximum number of ticks returned
+    ## @return depth List of (tick, liquidityLeft) from the best tick outwards
+    def depth(self, isToken0, levels):
+        checkInputTypes(bool=(isToken0))
+
+        def getDepth(state):
+            section = state.sections["limitTicks0" if isToken0 else "limitTicks1"]
+            # Best token0 ticks are the lowest ones, best token1 ticks the highest ones
+            levelsSlice = (
+                slice(None, levels) if isToken0 else slice(None, -levels - 1, -1)
+            )
+            ticks = section["ticks"][levelsSlice].tolist()
+            liquidityLeft = joinLimbs(
+                section["liquidityLeftHi"][levelsSlice],
+                section["liquidityLeftLo"][levelsSlice],
+            )
+            return list(zip(ticks, liquidityLeft))
+
+        return self.read(getDepth)
+
+    def close(self):
+        del self.header, self.sections
+        self.memory.close()
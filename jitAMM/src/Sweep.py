@@ -0,0 +1,255 @@
+import argparse
+import concurrent.futures
+import csv
+import dataclasses
+import itertools
+import math
+import os
+import tempfile
+import time
+
+from uniswapV3Python.src.libraries import TickMath
+from uniswapV3Python.src.libraries.Shared import *
+from .ChainflipPool import ChainflipPool
+from .PoolReplay import ReplayLedger
+from . import Backtest
+from .libraries import LimitOrderMath
+from .libraries.SharedLimitOrder import contextPrecision, getMinTickLO, getMaxTickLO
+
+### @title Sweep
+### @notice Runs the same workload (a Backtest operations file) on a grid of pool configurations, fee, tickSpacing
+### and limit order placement strategy, in parallel, and merges the results into one table.
+### @dev Configurations run in worker processes rather than threads: the pool math switches the rounding of the
+### process-global Decimal context back and forth (see LimitOrderMath.setDecimalPrecRound), so pools sharing a
+### context would corrupt each other's results. Every worker sets up its own context when it starts. Each worker
+### streams the workload file itself and only returns a summary row, so the sweep scales with the cores.
+
+## Limit order placement strategies. The ticks of the workload are snapped to the tick spacing of the
+## configuration: to the nearest spaced tick, away from the current price (token0 orders up and token1 orders
+## down) or towards it.
+STRATEGIES = ["nearest", "passive", "aggressive"]
+
+## Columns of the merged table
+COLUMNS = [
+    "fee",
+    "tickSpacing",
+    "strategy",
+    "blocks",
+    "operations",
+    "reverted",
+    "limitFillVolume0",
+    "limitFillVolume1",
+    "fees0",
+    "fees1",
+    "settledPositions",
+    "finalTick",
+    "elapsed",
+]
+
+
+@dataclass
+class SweepConfiguration:
+    fee: int
+    tickSpacing: int
+    strategy: str
+
+
+## @notice Snaps the ticks of the workload operations to a tick spacing.
+## @dev Range orders are widened to the spaced ticks around them. The same tick of the same token is always
+## snapped the same way, so burns and collects match their mints.
+## @param operations Iterable of (block, name, args)
+## @param token0 The pool's token0
+## @param tickSpacing The tick spacing to snap to
+## @param strategy One of STRATEGIES
+## @return operations Generator of (block, name, args)
+def placeOperations(operations, token0, tickSpacing, strategy):
+    assert strategy in STRATEGIES, "Unknown placement strategy"
+    (minTickLO, maxTickLO) = (getMinTickLO(tickSpacing), getMaxTickLO(tickSpacing))
+    (minTick, maxTick) = (
+        math.ceil(TickMath.MIN_TICK / tickSpacing) * tickSpacing,
+        math.floor(TickMath.MAX_TICK / tickSpacing) * tickSpacing,
+    )
+
+    def snapLimitTick(token, tick):
+        if strategy == "nearest":
+            spacedTick = round(tick / tickSpacing) * tickSpacing
+        elif (strategy == "passive") == (token == token0):
+            spacedTick = math.ceil(tick / tickSpacing) * tickSpacing
+        else:
+            spacedTick = math.floor(tick / tickSpacing) * tickSpacing
+        return max(minTickLO, min(maxTickLO, spacedTick))
+
+    for block, name, args in operations:
+        if name in ["mint", "burn", "collect"]:
+            (owner, tickLower, tickUpper, *amounts) = args
+            tickLower = max(minTick, tickLower // tickSpacing * tickSpacing)
+            tickUpper = min(maxTick, -(-tickUpper // tickSpacing) * tickSpacing)
+            if tickLower == tickUpper:
+                tickUpper += tickSpacing
+            args = [owner, tickLower, tickUpper, *amounts]
+        elif name in ["mintLimitOrder", "burnLimitOrder"]:
+            (token, owner, tick, *amounts) = args
+            args = [token, owner, snapLimitTick(token, tick), *amounts]
+        elif name == "collectLimitOrder":
+            (owner, token, tick, *amounts) = args
+            args = [owner, token, snapLimitTick(token, tick), *amounts]
+        yield block, name, args
+
+
+## @dev Sets up the Decimal context of a worker process.
+def initializeWorker():
+    LimitOrderMath.setDecimalPrecRound(contextPrecision, "ROUND_DOWN")
+
+
+## @notice Runs the workload on one configuration.
+## @param workload Path of the operations file (.jsonl or .csv)
+## @param configuration SweepConfiguration
+## @param tokens (token0, token1) of the workload
+## @param metricsDirectory Directory the per-block metrics are kept in, discarded if None
+## @param validation Backtest validation level
+## @return row Dictionary column => value (see COLUMNS)
+def runConfiguration(
+    workload,
+    configuration,
+    tokens,
+    metricsDirectory=None,
+    validation=Backtest.VALIDATION_NONE,
+):
+    start = time.perf_counter()
+    (token0, token1) = tokens
+    pool = ChainflipPool(
+        token0,
+        token1,
+        configuration.fee,
+        configuration.tickSpacing,
+        ReplayLedger([token0, token1]),
+    )
+    format = "csv" if str(workload).endswith(".csv") else "jsonl"
+
+    with tempfile.TemporaryDirectory() as directory:
+        metricsPath = os.path.join(
+            directory if metricsDirectory == None else metricsDirectory,
+            "{}_{}_{}.metrics".format(
+                configuration.fee, configuration.tickSpacing, configuration.strategy
+            ),
+        )
+        with open(workload, newline="") as file, open(metricsPath, "wb") as output:
+            operations = placeOperations(
+                Backtest.readOperations(file, format),
+                token0,
+                configuration.tickSpacing,
+                configuration.strategy,
+            )
+            (blocks, operationsCount) = Backtest.runBacktest(
+                pool, operations, output, validation
+            )
+
+        row = dict(dataclasses.asdict(configuration))
+        row.update(blocks=blocks, operations=operationsCount)
+        totals = [
+            "reverted",
+            "limitFillVolume0",
+            "limitFillVolume1",
+            "fees0",
+            "fees1",
+            "settledPositions",
+        ]
+        row.update(dict.fromkeys(totals, 0))
+        with open(metricsPath, "rb") as file:
+            for chunk in Backtest.readMetrics(file):
+                for column in totals:
+                    row[column] += sum(chunk[column])
+
+    row["finalTick"] = pool.slot0.tick
+    row["elapsed"] = time.perf_counter() - start
+    return row
+
+
+## @notice Runs the workload on every configuration of a grid.
+## @param workload Path of the operations file
+## @param fees Fees of the grid
+## @param tickSpacings Tick spacings of the grid
+## @param strategies Limit order placement strategies of the grid
+## @param workers Number of worker processes, the number of cores if None
+## @return table List of rows (see runConfiguration) in grid order
+def runSweep(
+    workload,
+    fees,
+    tickSpacings,
+    strategies,
+    tokens=("token0", "token1"),
+    workers=None,
+    metricsDirectory=None,
+    validation=Backtest.VALIDATION_NONE,
+):
+    configurations = [
+        SweepConfiguration(fee, tickSpacing, strategy)
+        for fee, tickSpacing, strategy in itertools.product(
+            fees, tickSpacings, strategies
+        )
+    ]
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=initializeWorker
+    ) as executor:
+        futures = [
+            executor.submit(
+                runConfiguration,
+                workload,
+                configuration,
+                tokens,
+                metricsDirectory,
+                validation,
+            )
+            for configuration in configurations
+        ]
+        return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pool configuration sweep")
+    parser.add_argument("workload", help="path to the operations file (.jsonl or .csv)")
+    parser.add_argument("--fees", type=int, nargs="+", default=[500, 3000, 10000])
+    parser.add_argument("--tickSpacings", type=int, nargs="+", default=[10, 60, 200])
+    parser.add_argument(
+        "--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES
+    )
+    parser.add_argument("--token0", default="token0")
+    parser.add_argument("--token1", default="token1")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--metricsDirectory", default=None)
+    parser.add_argument(
+        "--validation",
+        choices=[
+            Backtest.VALIDATION_NONE,
+            Backtest.VALIDATION_BLOCK,
+            Backtest.VALIDATION_OPERATION,
+        ],
+        default=Backtest.VALIDATION_NONE,
+    )
+    parser.add_argument("--output", default="sweep.csv")
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    table = runSweep(
+        arguments.workload,
+        arguments.fees,
+        arguments.tickSpacings,
+        arguments.strategies,
+        (arguments.token0, arguments.token1),
+        arguments.workers,
+        arguments.metricsDirectory,
+        arguments.validation,
+    )
+    elapsed = time.perf_counter() - start
+
+    with open(arguments.output, "w", newline="") as file:
+        writer = csv.DictWriter(file, COLUMNS)
+        writer.writeheader()
+        writer.writerows(table)
+    print("configurations: ", len(table))
+    print("elapsed (s):    ", round(elapsed, 2))
+    print(
+        "speedup:        ",
+        round(sum(row["elapsed"] for row in table) / elapsed, 2),
+    )
+    print("table written to", arguments.output)
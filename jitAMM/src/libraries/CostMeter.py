@@ -0,0 +1,178 @@
+import contextlib
+
+from uniswapV3Python.src.libraries import FullMath, Shared
+from . import LimitOrderMath, LimitOrderSwapMath, PositionLimit, TickLimit
+
+### @title CostMeter
+### @notice Counts the primitive operations performed by pool calls (see ChainflipPool.meteredCall), to fit a
+### weight model of how the cost of a call grows with the ticks crossed and the positions settled. Unlike
+### timings, the counts are deterministic: the same call on the same state always gives the same counts.
+### @dev While attached, the meter replaces the math helpers in their modules with counting wrappers (every
+### caller goes through the module attribute), and the pool's tick maps with CountingDicts. Decimal is a C type
+### whose operators can't be wrapped, so Decimal operations are counted at the granularity of the helpers doing
+### the limit order Decimal math, each weighted by the number of Decimal operations it performs itself. The
+### few inline operations of PositionLimit.update (constant per position update) are not counted. Attaching
+### copies the tick maps, and the patches are process-wide, so only one meter can be attached at a time.
+
+## mulDiv: FullMath mulDiv and mulDivRoundingUp plus the unchecked LimitOrderMath versions
+## decimalOperations: Decimal arithmetic operations in the limit order math
+## tickLookups: Reads of the range and limit tick maps (item access, membership and get)
+## tickWrites: Insertions and removals in the tick maps
+## tickScans: Entries iterated over when scanning the tick maps (e.g. UniswapPool.nextTick)
+## ledgerTransfers: Token transfers between the pool and the accounts
+## settlementIterations: Limit order positions burnt when settling the crossed limit ticks at the end of a swap
+COUNTERS = [
+    "mulDiv",
+    "decimalOperations",
+    "tickLookups",
+    "tickWrites",
+    "tickScans",
+    "ledgerTransfers",
+    "settlementIterations",
+]
+
+## Module, function name, counter and weight of the counting wrappers
+PATCHES = [
+    (FullMath, "mulDiv", "mulDiv", 1),
+    (FullMath, "mulDivRoundingUp", "mulDiv", 1),
+    (LimitOrderMath, "unsafeMulDiv", "mulDiv", 1),
+    (LimitOrderMath, "unsafeMulDivRoundingUp", "mulDiv", 1),
+    # Division and multiplication
+    (LimitOrderMath, "getAmountSwappedFromTickPercentatge", "decimalOperations", 2),
+    (
+        LimitOrderMath,
+        "getAmountSwappedFromTickPercentatgeRoundUp",
+        "decimalOperations",
+        2,
+    ),
+    # Subtraction
+    (LimitOrderMath, "subtractDecimalRoundingUp", "decimalOperations", 1),
+    # Position amounts swapped: subtraction and two divisions, then two multiplications
+    (PositionLimit, "getPercSwapped", "decimalOperations", 3),
+    (PositionLimit, "getAmountsSwapped", "decimalOperations", 2),
+    # Division, multiplication and subtraction. The helpers it calls are counted separately.
+    (LimitOrderSwapMath, "calculateAmounts", "decimalOperations", 3),
+    # Multiplication
+    (TickLimit, "getLiquidityLeft", "decimalOperations", 1),
+]
+
+TICK_MAPS = ["ticks", "ticksLimitTokens0", "ticksLimitTokens1"]
+
+## Meter currently attached, if any
+activeMeter = None
+
+
+class CountingDict(dict):
+    ## @param counts Dictionary counter => count the accesses are added to
+    def __init__(self, counts, items):
+        super().__init__(items)
+        self.counts = counts
+
+    def __getitem__(self, key):
+        self.counts["tickLookups"] += 1
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.counts["tickLookups"] += 1
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        self.counts["tickLookups"] += 1
+        return super().get(key, default)
+
+    def __setitem__(self, key, value):
+        self.counts["tickWrites"] += 1
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.counts["tickWrites"] += 1
+        super().__delitem__(key)
+
+    def pop(self, *args):
+        self.counts["tickWrites"] += 1
+        return super().pop(*args)
+
+    def __iter__(self):
+        self.counts["tickScans"] += len(self)
+        return super().__iter__()
+
+    def keys(self):
+        self.counts["tickScans"] += len(self)
+        return super().keys()
+
+    def values(self):
+        self.counts["tickScans"] += len(self)
+        return super().values()
+
+    def items(self):
+        self.counts["tickScans"] += len(self)
+        return super().items()
+
+
+## @dev The tick maps are type checked as dictionaries (Tick.update, TickLimit.update...)
+def checkDict(input):
+    assert type(input) in (dict, CountingDict)
+
+
+class CostMeter:
+    def __init__(self):
+        ## Dictionary counter => count
+        self.counts = dict.fromkeys(COUNTERS, 0)
+
+    ## @notice Adds to a counter.
+    def count(self, counter, amount=1):
+        self.counts[counter] += amount
+
+    ## @notice Context manager counting the operations of the calls made on a pool until it exits.
+    ## @dev Counts keep accumulating across attachments, the caller can reset them.
+    ## @param pool The ChainflipPool to meter
+    @contextlib.contextmanager
+    def attach(self, pool):
+        global activeMeter
+        assert activeMeter == None, "Cost meter already attached"
+        activeMeter = self
+
+        originals = [
+            (module, name, getattr(module, name)) for module, name, _, _ in PATCHES
+        ]
+        originalCheckDict = Shared.checkDict
+        ledger = pool.ledger
+        try:
+            for module, name, counter, weight in PATCHES:
+                setattr(
+                    module,
+                    name,
+                    self._countingWrapper(getattr(module, name), counter, weight),
+                )
+            Shared.checkDict = checkDict
+            for name in TICK_MAPS:
+                setattr(pool, name, CountingDict(self.counts, getattr(pool, name)))
+            if ledger != None:
+                ledger.transferToken = self._countingWrapper(
+                    ledger.transferToken, "ledgerTransfers", 1
+                )
+            pool.costMeter = self
+
+            yield self
+        finally:
+            pool.costMeter = None
+            if ledger != None and "transferToken" in vars(ledger):
+                del ledger.transferToken
+            for name in TICK_MAPS:
+                ticksMap = getattr(pool, name)
+                if type(ticksMap) == CountingDict:
+                    # Copying without going through the counting accessors
+                    setattr(pool, name, dict(dict.items(ticksMap)))
+            Shared.checkDict = originalCheckDict
+            for module, name, function in originals:
+                setattr(module, name, function)
+            activeMeter = None
+
+    def _countingWrapper(self, function, counter, weight):
+        counts = self.counts
+
+        def wrapper(*args):
+            counts[counter] += weight
+            return function(*args)
+
+        return wrapper
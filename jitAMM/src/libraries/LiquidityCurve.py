@@ -0,0 +1,564 @@
+import bisect
+
+from uniswapV3Python.src.libraries import SwapMath, TickMath, LiquidityMath
+from uniswapV3Python.src.libraries.Shared import *
+from . import LimitOrderSwapMath, LimitOrderTickMath
+
+### @title LiquidityCurve
+### @notice Piecewise representation of the cumulative amount out versus amount in of a swap across the combined
+### limit and range order books. Each segment is either a limit order tick (fixed price) or a range order step
+### between initialized ticks.
+### @dev The curve is built by walking the books in the same way as ChainflipPool.swap but consuming every segment
+### fully. Swap steps are targeted independently of the amount remaining, so any swap follows the same segments
+### until its amount runs out. A quote is then a binary search plus a single computeSwapStep.
+
+
+@dataclass
+class CurveSegment:
+    ## whether the segment is a limit order tick or a range order step
+    isLimitOrder: bool
+    ## limit order tick (limit order step) or next range order tick (range order step)
+    tick: int
+    ## pool state at the beginning of the segment
+    sqrtPriceStartX96: int
+    tickStart: int
+    liquidityStart: int
+    ## limit order step: price at the tick (priceX96), tick liquidity and swap percentatge status
+    priceX96: int = None
+    liquidityGross: int = None
+    oneMinusPercSwap: Decimal = None
+    ## range order step: price the step swaps to, price at the next range tick and its initialization
+    sqrtRatioTargetX96: int = None
+    sqrtPriceNextX96: int = None
+    initialized: bool = None
+    liquidityNet: int = None
+
+
+@dataclass
+class LiquidityCurve:
+    ## the direction of the swap
+    zeroForOne: bool
+    ## the fee taken from the input amount, expressed in hundredths of a bip
+    feePips: int
+    ## segments in the order they are consumed by a swap
+    segments: list
+    ## cumulative amount in (including fees) and amount out at the end of each segment
+    amountsInCumulative: list
+    amountsOutCumulative: list
+    ## pool state once the whole curve has been consumed (price limit reached)
+    sqrtPriceX96: int
+    liquidity: int
+    tick: int
+
+
+### @notice Walks the books in the same way as ChainflipPool.swap, consuming every segment fully.
+### @dev The limit tick sequences contain the ticks of the side of the book being swapped against (token1 limit
+### orders if zeroForOne, token0 otherwise). Sequences only need to support len() and indexing, so they can be
+### backed by a memory-mapped snapshot. Segments are generated lazily, so the walk can be stopped at any point.
+### @param zeroForOne The direction of the swap
+### @param sqrtPriceX96 The current range order pool sqrt price
+### @param tick The current range order pool tick
+### @param liquidity The current range order pool liquidity
+### @param feePips The fee taken from the input amount, expressed in hundredths of a bip
+### @param limitTicks Limit ticks sorted in ascending order
+### @param limitTickInfos Limit tick infos (liquidityGross, oneMinusPercSwap) aligned with limitTicks
+### @param rangeTicks Initialized range ticks sorted in ascending order
+### @param rangeTickInfos Range tick infos (liquidityNet) aligned with rangeTicks
+### @param sqrtPriceLimitX96 The Q64.96 sqrt price limit of the swap
+### @return Generator of (segment, amountIn, amountOut, sqrtPriceX96, liquidity, tick) where the amounts are the
+### ones of the segment (amountIn including fees) and the pool state is the one after the segment
+def walk(
+    zeroForOne,
+    sqrtPriceX96,
+    tick,
+    liquidity,
+    feePips,
+    limitTicks,
+    limitTickInfos,
+    rangeTicks,
+    rangeTickInfos,
+    sqrtPriceLimitX96,
+):
+    checkInputTypes(
+        bool=(zeroForOne),
+        uint160=(sqrtPriceX96, sqrtPriceLimitX96),
+        int24=(tick),
+        uint128=(liquidity),
+        uint24=(feePips),
+    )
+    # Same checks as in the swap
+    if zeroForOne:
+        assert (
+            sqrtPriceLimitX96 < sqrtPriceX96
+            and sqrtPriceLimitX96 > TickMath.MIN_SQRT_RATIO
+        ), "SPL"
+    else:
+        assert (
+            sqrtPriceLimitX96 > sqrtPriceX96
+            and sqrtPriceLimitX96 < TickMath.MAX_SQRT_RATIO
+        ), "SPL"
+
+    # Limit ticks are consumed from the best one: highest token1 tick (zeroForOne) or lowest token0 tick.
+    limitIndex = len(limitTicks) - 1 if zeroForOne else 0
+    limitIndexStep = -1 if zeroForOne else 1
+
+    while sqrtPriceX96 != sqrtPriceLimitX96:
+        # Skip ticks that have been fully swapped (oneMinusPercSwap == 0)
+        while (
+            0 <= limitIndex < len(limitTicks)
+            and limitTickInfos[limitIndex].oneMinusPercSwap == 0
+        ):
+            limitIndex += limitIndexStep
+
+        limitTickNext = None
+        if 0 <= limitIndex < len(limitTicks):
+            limitTickNext = limitTicks[limitIndex]
+
+        if limitTickNext != None and (
+            limitTickNext > tick if zeroForOne else limitTickNext <= tick
+        ):
+            tickLimitInfo = limitTickInfos[limitIndex]
+            segment = CurveSegment(
+                True,
+                limitTickNext,
+                sqrtPriceX96,
+                tick,
+                liquidity,
+                priceX96=LimitOrderTickMath.getPriceAtTick(limitTickNext),
+                liquidityGross=tickLimitInfo.liquidityGross,
+                oneMinusPercSwap=tickLimitInfo.oneMinusPercSwap,
+            )
+            limitIndex += limitIndexStep
+        else:
+            (tickNext, initialized) = nextRangeTick(rangeTicks, tick, zeroForOne)
+            sqrtPriceNextX96 = TickMath.getSqrtRatioAtTick(tickNext)
+
+            # Stop at the next limit order price (see ChainflipPool.swap)
+            if limitTickNext != None:
+                nextLOatPrice = TickMath.getSqrtRatioAtTick(
+                    limitTickNext - 1 if zeroForOne else limitTickNext
+                )
+            else:
+                nextLOatPrice = sqrtPriceLimitX96
+
+            if zeroForOne:
+                sqrtRatioTargetX96 = max(
+                    sqrtPriceLimitX96, sqrtPriceNextX96, nextLOatPrice
+                )
+            else:
+                sqrtRatioTargetX96 = min(
+                    sqrtPriceLimitX96, sqrtPriceNextX96, nextLOatPrice
+                )
+
+            segment = CurveSegment(
+                False,
+                tickNext,
+                sqrtPriceX96,
+                tick,
+                liquidity,
+                sqrtRatioTargetX96=sqrtRatioTargetX96,
+                sqrtPriceNextX96=sqrtPriceNextX96,
+                initialized=initialized,
+                liquidityNet=rangeTickInfos[
+                    bisect.bisect_left(rangeTicks, tickNext)
+                ].liquidityNet
+                if initialized
+                else 0,
+            )
+
+        # Consume the whole segment
+        (
+            stepAmountIn,
+            stepAmountOut,
+            stepFeeAmount,
+            sqrtPriceX96,
+            liquidity,
+            tick,
+            _,
+        ) = computeSegmentStep(segment, MAX_INT256, feePips, zeroForOne)
+
+        yield (
+            segment,
+            stepAmountIn + stepFeeAmount,
+            stepAmountOut,
+            sqrtPriceX96,
+            liquidity,
+            tick,
+        )
+
+
+### @notice Consumes a walk of the books.
+### @param segments Generator returned by walk
+### @return amountIn The total amount in, including fees
+### @return amountOut The total amount out
+### @return limitTicksConsumed The limit ticks consumed, in the order they are swapped
+def walkTotals(segments):
+    amountIn = amountOut = 0
+    limitTicksConsumed = []
+    for (segment, stepAmountIn, stepAmountOut, _, _, _) in segments:
+        amountIn += stepAmountIn
+        amountOut += stepAmountOut
+        if segment.isLimitOrder:
+            limitTicksConsumed.append(segment.tick)
+    return amountIn, amountOut, limitTicksConsumed
+
+
+### @notice Builds the liquidity curve of a swap in the given direction from the state of the books.
+### @dev See walk for the parameters.
+### @return curve The liquidity curve
+def build(
+    zeroForOne,
+    sqrtPriceX96,
+    tick,
+    liquidity,
+    feePips,
+    limitTicks,
+    limitTickInfos,
+    rangeTicks,
+    rangeTickInfos,
+    sqrtPriceLimitX96,
+):
+    segments = []
+    amountsInCumulative = []
+    amountsOutCumulative = []
+    amountIn = amountOut = 0
+
+    for (segment, stepAmountIn, stepAmountOut, sqrtPriceX96, liquidity, tick) in walk(
+        zeroForOne,
+        sqrtPriceX96,
+        tick,
+        liquidity,
+        feePips,
+        limitTicks,
+        limitTickInfos,
+        rangeTicks,
+        rangeTickInfos,
+        sqrtPriceLimitX96,
+    ):
+        amountIn += stepAmountIn
+        amountOut += stepAmountOut
+        segments.append(segment)
+        amountsInCumulative.append(amountIn)
+        amountsOutCumulative.append(amountOut)
+
+    return LiquidityCurve(
+        zeroForOne,
+        feePips,
+        segments,
+        amountsInCumulative,
+        amountsOutCumulative,
+        sqrtPriceX96,
+        liquidity,
+        tick,
+    )
+
+
+### @notice Computes the swap step of a segment given the amount remaining to be swapped.
+### @dev Same step math and state transitions as in ChainflipPool.swap.
+### @param segment The curve segment
+### @param amountRemaining How much input or output amount is remaining to be swapped in#out
+### @param feePips The fee taken from the input amount, expressed in hundredths of a bip
+### @param zeroForOne The direction of the swap
+### @return amountIn The amount swapped in, without fees
+### @return amountOut The amount swapped out
+### @return feeAmount The amount of input taken as a fee
+### @return sqrtPriceX96 The range order pool sqrt price after the step
+### @return liquidity The range order pool liquidity after the step
+### @return tick The range order pool tick after the step
+### @return tickCrossed Whether the limit order tick was crossed. Always False for range order steps.
+def computeSegmentStep(segment, amountRemaining, feePips, zeroForOne):
+    if segment.isLimitOrder:
+        (
+            amountIn,
+            amountOut,
+            feeAmount,
+            tickCrossed,
+            _,
+        ) = LimitOrderSwapMath.computeSwapStep(
+            segment.priceX96,
+            segment.liquidityGross,
+            amountRemaining,
+            feePips,
+            zeroForOne,
+            segment.oneMinusPercSwap,
+        )
+        # Limit orders don't modify the range order pool
+        return (
+            amountIn,
+            amountOut,
+            feeAmount,
+            segment.sqrtPriceStartX96,
+            segment.liquidityStart,
+            segment.tickStart,
+            tickCrossed,
+        )
+
+    (sqrtPriceX96, amountIn, amountOut, feeAmount) = SwapMath.computeSwapStep(
+        segment.sqrtPriceStartX96,
+        segment.sqrtRatioTargetX96,
+        segment.liquidityStart,
+        amountRemaining,
+        feePips,
+    )
+
+    liquidity = segment.liquidityStart
+    ## shift tick if we reached the next price
+    if sqrtPriceX96 == segment.sqrtPriceNextX96:
+        if segment.initialized:
+            liquidity = LiquidityMath.addDelta(
+                liquidity,
+                -segment.liquidityNet if zeroForOne else segment.liquidityNet,
+            )
+        tick = (segment.tick - 1) if zeroForOne else segment.tick
+    elif sqrtPriceX96 != segment.sqrtPriceStartX96:
+        tick = TickMath.getTickAtSqrtRatio(sqrtPriceX96)
+    else:
+        tick = segment.tickStart
+
+    return (amountIn, amountOut, feeAmount, sqrtPriceX96, liquidity, tick, False)
+
+
+### @notice Quotes a swap against a liquidity curve.
+### @dev Binary search of the segment where the amount runs out plus a single step in that segment.
+### @param self The liquidity curve
+### @param amountSpecified The amount of the swap, exact input (positive), or exact output (negative)
+### @return amount0 The delta of the balance of token0 of the pool
+### @return amount1 The delta of the balance of token1 of the pool
+### @return sqrtPriceX96 The range order pool sqrt price after the swap
+### @return liquidity The range order pool liquidity after the swap
+### @return tick The range order pool tick after the swap
+def quote(self, amountSpecified):
+    checkInputTypes(int256=(amountSpecified))
+    assert amountSpecified != 0, "AS"
+
+    exactInput = amountSpecified > 0
+    amountsCumulative = (
+        self.amountsInCumulative if exactInput else self.amountsOutCumulative
+    )
+    # First segment that completes the amount specified
+    index = bisect.bisect_left(amountsCumulative, abs(amountSpecified))
+
+    return quoteAtSegment(self, amountSpecified, index)
+
+
+### @notice Quotes a list of swaps against a liquidity curve in a single walk.
+### @dev Amounts are sorted and the curve is walked once, so the cost is O(segments + amounts) on top of
+### sorting. Results are returned in the same order as the amounts.
+### @param self The liquidity curve
+### @param amountsSpecified The amounts of the swaps, exact input (positive), or exact output (negative)
+### @return quotes For each amount, the same tuple as quote, or None if the swap would revert
+def quoteLadder(self, amountsSpecified):
+    quotes = [None] * len(amountsSpecified)
+
+    for exactInput in [True, False]:
+        amountsCumulative = (
+            self.amountsInCumulative if exactInput else self.amountsOutCumulative
+        )
+        indexes = [
+            i
+            for i in range(len(amountsSpecified))
+            if (amountsSpecified[i] > 0) == exactInput
+        ]
+        indexes.sort(key=lambda i: abs(amountsSpecified[i]))
+
+        # Segment cursor only moves forward as amounts are sorted
+        index = 0
+        for i in indexes:
+            amountSpecified = amountsSpecified[i]
+            checkInputTypes(int256=(amountSpecified))
+            assert amountSpecified != 0, "AS"
+            while index < len(self.segments) and amountsCumulative[index] < abs(
+                amountSpecified
+            ):
+                index += 1
+            try:
+                quotes[i] = quoteAtSegment(self, amountSpecified, index)
+            except AssertionError:
+                # Swap of this amount would revert
+                quotes[i] = None
+
+    return quotes
+
+
+### @notice Quotes a swap that runs out in the given segment of the liquidity curve.
+### @param self The liquidity curve
+### @param amountSpecified The amount of the swap, exact input (positive), or exact output (negative)
+### @param index The index of the first segment that completes the amount specified
+### @return Same as quote
+def quoteAtSegment(self, amountSpecified, index):
+    exactInput = amountSpecified > 0
+
+    if index == len(self.segments):
+        # Whole curve consumed - price limit reached
+        amountIn = self.amountsInCumulative[-1] if index > 0 else 0
+        amountOut = self.amountsOutCumulative[-1] if index > 0 else 0
+        return getSwapAmounts(self.zeroForOne, exactInput, amountIn, amountOut) + (
+            self.sqrtPriceX96,
+            self.liquidity,
+            self.tick,
+        )
+
+    amountInBefore = self.amountsInCumulative[index - 1] if index > 0 else 0
+    amountOutBefore = self.amountsOutCumulative[index - 1] if index > 0 else 0
+
+    return quoteInSegment(
+        self.segments[index],
+        self.zeroForOne,
+        self.feePips,
+        amountSpecified,
+        amountInBefore,
+        amountOutBefore,
+    )
+
+
+### @notice Quotes a swap that runs out in the given segment.
+### @param segment The curve segment where the swap runs out
+### @param zeroForOne The direction of the swap
+### @param feePips The fee taken from the input amount, expressed in hundredths of a bip
+### @param amountSpecified The amount of the swap, exact input (positive), or exact output (negative)
+### @param amountInBefore The amount in (including fees) of the previous segments
+### @param amountOutBefore The amount out of the previous segments
+### @return Same as quote
+def quoteInSegment(
+    segment, zeroForOne, feePips, amountSpecified, amountInBefore, amountOutBefore
+):
+    exactInput = amountSpecified > 0
+    amountRemaining = (
+        amountSpecified - amountInBefore
+        if exactInput
+        else amountSpecified + amountOutBefore
+    )
+    (
+        stepAmountIn,
+        stepAmountOut,
+        stepFeeAmount,
+        sqrtPriceX96,
+        liquidity,
+        tick,
+        tickCrossed,
+    ) = computeSegmentStep(segment, amountRemaining, feePips, zeroForOne)
+
+    if segment.isLimitOrder and not tickCrossed:
+        # Same health check as in the swap - swap should be completed
+        if exactInput:
+            assert amountRemaining - (stepAmountIn + stepFeeAmount) == 0
+        else:
+            assert amountRemaining + stepAmountOut == 0
+
+    return getSwapAmounts(
+        zeroForOne,
+        exactInput,
+        amountInBefore + stepAmountIn + stepFeeAmount,
+        amountOutBefore + stepAmountOut,
+    ) + (sqrtPriceX96, liquidity, tick)
+
+
+### @notice Quotes a list of swaps while walking the books, without building the curve.
+### @dev The walk is stopped as soon as the largest amount has been quoted, so only the segments needed are
+### generated. Results are the same as quoteLadder on the built curve.
+### @param segments Generator returned by walk
+### @param zeroForOne The direction of the swaps
+### @param feePips The fee taken from the input amount, expressed in hundredths of a bip
+### @param amountsSpecified The amounts of the swaps, exact input (positive), or exact output (negative)
+### @param sqrtPriceX96 The range order pool sqrt price before the swaps
+### @param liquidity The range order pool liquidity before the swaps
+### @param tick The range order pool tick before the swaps
+### @return quotes For each amount, the same tuple as quote, or None if the swap would revert
+def quoteLadderWalk(
+    segments, zeroForOne, feePips, amountsSpecified, sqrtPriceX96, liquidity, tick
+):
+    for amountSpecified in amountsSpecified:
+        checkInputTypes(int256=(amountSpecified))
+        assert amountSpecified != 0, "AS"
+
+    quotes = [None] * len(amountsSpecified)
+
+    # Pending amounts for each mode, sorted by size
+    pending = dict()
+    for exactInput in [True, False]:
+        pending[exactInput] = [
+            i
+            for i in range(len(amountsSpecified))
+            if (amountsSpecified[i] > 0) == exactInput
+        ]
+        pending[exactInput].sort(key=lambda i: abs(amountsSpecified[i]), reverse=True)
+
+    amountIn = amountOut = 0
+    for (
+        segment,
+        stepAmountIn,
+        stepAmountOut,
+        sqrtPriceX96,
+        liquidity,
+        tick,
+    ) in segments:
+        for exactInput in [True, False]:
+            amountAfter = (
+                amountIn + stepAmountIn if exactInput else amountOut + stepAmountOut
+            )
+            queue = pending[exactInput]
+            # Smallest pending amount is at the end of the queue
+            while len(queue) > 0 and amountAfter >= abs(amountsSpecified[queue[-1]]):
+                i = queue.pop()
+                try:
+                    quotes[i] = quoteInSegment(
+                        segment,
+                        zeroForOne,
+                        feePips,
+                        amountsSpecified[i],
+                        amountIn,
+                        amountOut,
+                    )
+                except AssertionError:
+                    # Swap of this amount would revert
+                    quotes[i] = None
+        amountIn += stepAmountIn
+        amountOut += stepAmountOut
+        if len(pending[True]) == 0 and len(pending[False]) == 0:
+            return quotes
+
+    # Price limit reached before completing the remaining amounts
+    for exactInput in [True, False]:
+        for i in pending[exactInput]:
+            quotes[i] = getSwapAmounts(zeroForOne, exactInput, amountIn, amountOut) + (
+                sqrtPriceX96,
+                liquidity,
+                tick,
+            )
+    return quotes
+
+
+### @notice Converts the total amounts in and out of a swap into the pool balance deltas returned by the swap.
+### @param zeroForOne The direction of the swap
+### @param exactInput Whether the swap is exact input or exact output
+### @param amountIn The amount swapped in, including fees
+### @param amountOut The amount swapped out
+### @return amount0 The delta of the balance of token0 of the pool
+### @return amount1 The delta of the balance of token1 of the pool
+def getSwapAmounts(zeroForOne, exactInput, amountIn, amountOut):
+    if exactInput:
+        (amountSpecified, amountCalculated) = (amountIn, -amountOut)
+    else:
+        (amountSpecified, amountCalculated) = (-amountOut, amountIn)
+    if zeroForOne == exactInput:
+        return (amountSpecified, amountCalculated)
+    return (amountCalculated, amountSpecified)
+
+
+### @notice Same as UniswapPool.nextTick but using a binary search over the sorted initialized range ticks.
+### @param rangeTicks Initialized range ticks sorted in ascending order
+### @param tick The starting tick
+### @param lte Whether to search for the next initialized tick to the left (less than or equal to the starting tick)
+### @return tickNext Next tick with liquidity to be used in the swap function.
+### @return initialized Whether tickNext is an initialized tick or the boundary
+def nextRangeTick(rangeTicks, tick, lte):
+    index = bisect.bisect_right(rangeTicks, tick)
+    if lte:
+        if index == 0:
+            # No tick to the left
+            return TickMath.MIN_TICK, False
+        return rangeTicks[index - 1], True
+    if index == len(rangeTicks):
+        # No tick to the right
+        return TickMath.MAX_TICK, False
+    return rangeTicks[index], True
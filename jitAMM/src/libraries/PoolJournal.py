@@ -0,0 +1,181 @@
+import struct
+
+from uniswapV3Python.src.libraries.Shared import *
+
+### @title PoolJournal
+### @notice Append-only binary journal of the state-changing calls of a ChainflipPool.
+### @dev File layout: MAGIC | uint16 version | records. Every record is length-prefixed:
+### uint16 payload length | uint8 opcode | uint8 flags | fields.
+### Fields are encoded following the signature of the operation:
+###     s - string, as an uint32 index in the journal's string table
+###     i - integer, as an uint8 byte length followed by the little-endian two's complement value
+###     b - bool, as an uint8
+### Strings (addresses and tokens) are defined once by a string record and referenced by index afterwards.
+### The first record after the strings it references is the pool record (token0, token1, fee, tickSpacing), flagged
+### FLAG_PRECISION_EPOCHS if the pool has ChainflipPool.precisionEpochs set.
+### Records of reverted calls are flagged. If the ledger rejected one of the call's transfers, they are also flagged
+### FLAG_LEDGER_REJECTED and the index of that transfer in the call is written as an extra integer field.
+
+MAGIC = b"CFPJ"
+VERSION = 2
+
+## Record opcodes
+OP_STRING = 0
+OP_POOL = 1
+
+## Journaled pool functions and the signature of their arguments, in opcode order (starting at 2)
+OPERATIONS = [
+    ("initialize", "i"),
+    ("mint", "siii"),
+    ("collect", "siiii"),
+    ("burn", "siii"),
+    ("setFeeProtocol", "ii"),
+    ("collectProtocol", "sii"),
+    ("mintLimitOrder", "ssii"),
+    ("burnLimitOrder", "ssii"),
+    ("collectLimitOrder", "ssiii"),
+    ("swap", "sbii"),
+]
+OPCODES = {name: opcode for opcode, (name, _) in enumerate(OPERATIONS, start=2)}
+
+POOL_SIGNATURE = "ssii"
+
+## Record flags
+FLAG_REVERTED = 1
+FLAG_LEDGER_REJECTED = 2
+FLAG_PRECISION_EPOCHS = 4
+
+_header = struct.Struct("<4sH")
+_recordHeader = struct.Struct("<HBB")
+_uint32 = struct.Struct("<I")
+
+
+class JournalWriter:
+    ## @param file Binary file object the journal is appended to
+    def __init__(self, file):
+        self.file = file
+        # string => index in the string table
+        self.strings = dict()
+        self.file.write(_header.pack(MAGIC, VERSION))
+
+    ## @notice Writes the pool record. Should be the first operation written.
+    def writePool(self, token0, token1, fee, tickSpacing, precisionEpochs=False):
+        self._writeRecord(
+            OP_POOL,
+            FLAG_PRECISION_EPOCHS if precisionEpochs else 0,
+            POOL_SIGNATURE,
+            (token0, token1, fee, tickSpacing),
+        )
+
+    ## @notice Writes a call to a pool function.
+    ## @param name The name of the pool function
+    ## @param args The arguments of the call
+    ## @param reverted Whether the call reverted
+    ## @param rejectedTransfer Index of the transfer of the call rejected by the ledger, None if none was
+    def writeOperation(self, name, args, reverted, rejectedTransfer=None):
+        opcode = OPCODES[name]
+        signature = OPERATIONS[opcode - 2][1]
+        flags = FLAG_REVERTED if reverted else 0
+        if rejectedTransfer != None:
+            flags |= FLAG_LEDGER_REJECTED
+            signature += "i"
+            args = (*args, rejectedTransfer)
+        self._writeRecord(opcode, flags, signature, args)
+
+    ## @dev Copies of a journaled pool (e.g. to simulate calls) are not journaled
+    def __deepcopy__(self, memo):
+        return None
+
+    def flush(self):
+        self.file.flush()
+
+    def _writeRecord(self, opcode, flags, signature, args):
+        assert len(signature) == len(args)
+        fields = []
+        for fieldType, value in zip(signature, args):
+            if fieldType == "s":
+                fields.append(_uint32.pack(self._stringIndex(value)))
+            elif fieldType == "i":
+                length = (value.bit_length() + 8) // 8
+                fields.append(bytes((length,)))
+                fields.append(value.to_bytes(length, "little", signed=True))
+            else:
+                fields.append(b"\x01" if value else b"\x00")
+        payload = b"".join(fields)
+        # Payload length includes the opcode and flags
+        self.file.write(_recordHeader.pack(len(payload) + 2, opcode, flags) + payload)
+
+    def _stringIndex(self, string):
+        index = self.strings.get(string)
+        if index == None:
+            checkInputTypes(string=(string))
+            index = len(self.strings)
+            self.strings[string] = index
+            encoded = string.encode()
+            self.file.write(
+                _recordHeader.pack(len(encoded) + 2, OP_STRING, 0) + encoded
+            )
+        return index
+
+
+### @notice Reads the records of a journal. String records are resolved and not returned.
+### @param file Binary file object positioned at the start of the journal
+### @return Generator of (name, args, reverted, rejectedTransfer), rejectedTransfer being the index of the transfer
+### rejected by the ledger or None. The first one is
+### ("pool", (token0, token1, fee, tickSpacing, precisionEpochs), False, None)
+def readRecords(file):
+    data = file.read()
+    (magic, version) = _header.unpack_from(data, 0)
+    assert magic == MAGIC, "Not a pool journal"
+    # Version 1 journals are version 2 journals without ledger rejections nor precisionEpochs
+    assert 0 < version <= VERSION, "Unsupported journal version"
+
+    strings = []
+    offset = _header.size
+    end = len(data)
+    while offset < end:
+        # Truncated record (e.g. crash while appending) - ignore it
+        if offset + _recordHeader.size > end:
+            return
+        (length, opcode, flags) = _recordHeader.unpack_from(data, offset)
+        offset += 2
+        recordEnd = offset + length
+        if recordEnd > end:
+            return
+        offset += 2
+
+        if opcode == OP_STRING:
+            strings.append(data[offset:recordEnd].decode())
+            offset = recordEnd
+            continue
+
+        if opcode == OP_POOL:
+            (name, signature) = ("pool", POOL_SIGNATURE)
+        else:
+            (name, signature) = OPERATIONS[opcode - 2]
+        if flags & FLAG_LEDGER_REJECTED:
+            signature += "i"
+
+        args = []
+        for fieldType in signature:
+            if fieldType == "s":
+                args.append(strings[_uint32.unpack_from(data, offset)[0]])
+                offset += 4
+            elif fieldType == "i":
+                length = data[offset]
+                args.append(
+                    int.from_bytes(
+                        data[offset + 1 : offset + 1 + length], "little", signed=True
+                    )
+                )
+                offset += 1 + length
+            else:
+                args.append(data[offset] == 1)
+                offset += 1
+        # Health check
+        assert offset == recordEnd
+
+        if opcode == OP_POOL:
+            args.append(flags & FLAG_PRECISION_EPOCHS != 0)
+        rejectedTransfer = args.pop() if flags & FLAG_LEDGER_REJECTED else None
+        yield name, tuple(args), flags & FLAG_REVERTED != 0, rejectedTransfer
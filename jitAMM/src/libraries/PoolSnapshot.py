@@ -0,0 +1,670 @@
+import struct
+
+from uniswapV3Python.src.libraries.Shared import *
+from uniswapV3Python.src.libraries.Position import PositionInfo
+from uniswapV3Python.src.UniswapPool import Slot0, ProtocolFees
+from .SharedLimitOrder import TickInfoLimit
+from .PositionLimit import PositionLimitInfo
+
+### @title PoolSnapshot
+### @notice Versioned binary snapshot of the state of a ChainflipPool.
+### @dev File layout: header | string table | pool record | sections. Each section is an array of fixed-width
+### records, sorted by tick (and owner), so sections can be located from the header counts alone:
+###     range ticks     (RANGE_TICK)
+###     range positions (POSITION)
+###     token0 limit ticks and token1 limit ticks (LIMIT_TICK)
+###     limit tick owners (OWNER) - ownerPositions of all the limit ticks, in limit tick order
+###     limit positions (LIMIT_ORDER)
+### Integers are little-endian: int24 ticks as int32, liquidities as 16 bytes and the rest of amounts and fee
+### growths as 32 bytes. Decimals are encoded exactly as sign, 32-byte coefficient and int32 exponent.
+### Strings (tokens and owners) are stored once in the string table and referenced by uint32 index.
+### Delta snapshots (writeDelta) have the same layout with only the entries changed since a base snapshot,
+### followed by the keys of the removed entries.
+
+MAGIC = b"CFPS"
+VERSION = 2
+
+## magic, version, stateVersion and the number of strings, range ticks, range positions, token0 limit ticks,
+## token1 limit ticks, limit tick owners and limit positions
+HEADER = struct.Struct("<4sHQIIIIIII")
+STRING_LENGTH = struct.Struct("<H")
+## token0, token1, fee, tickSpacing, slot0 (sqrtPriceX96, tick, feeProtocol), liquidity, feeGrowthGlobal0X128,
+## feeGrowthGlobal1X128, protocolFees (token0, token1), pool balances (token0, token1), flags
+POOL = struct.Struct("<IIIi32siB16s32s32s32s32s32s32sB")
+## Pool record flags
+POOL_PRECISION_EPOCHS = 1
+## tick, liquidityGross, liquidityNet, feeGrowthOutside0X128, feeGrowthOutside1X128
+RANGE_TICK = struct.Struct("<i16s16s32s32s")
+## owner, tickLower, tickUpper, liquidity, feeGrowthInside0LastX128, feeGrowthInside1LastX128, tokensOwed0,
+## tokensOwed1
+POSITION = struct.Struct("<Iii16s32s32s32s32s")
+## tick, liquidityGross, oneMinusPercSwap (sign, coefficient, exponent), feeGrowthInsideX128, number of owners
+LIMIT_TICK = struct.Struct("<i16sB32si32sI")
+OWNER = struct.Struct("<I")
+## owner, tick, isToken0, liquidity, oneMinusPercSwapMint (sign, coefficient, exponent), tokensOwed0,
+## tokensOwed1, feeGrowthInsideLastX128
+LIMIT_ORDER = struct.Struct("<IiB16sB32si32s32s32s")
+
+DELTA_MAGIC = b"CFPD"
+## magic, version, base stateVersion, stateVersion, the same counts as HEADER and the number of removed range
+## ticks, range positions, token0 limit ticks, token1 limit ticks and limit positions
+DELTA_HEADER = struct.Struct("<4sHQQIIIIIIIIIIII")
+## Keys of the removed entries: tick, (owner, tickLower, tickUpper) and (owner, tick, isToken0)
+TICK_KEY = struct.Struct("<i")
+POSITION_KEY = struct.Struct("<Iii")
+LIMIT_ORDER_KEY = struct.Struct("<IiB")
+
+
+@dataclass
+class PoolSnapshot:
+    token0: str
+    token1: str
+    fee: int
+    tickSpacing: int
+    stateVersion: int
+    slot0: Slot0
+    liquidity: int
+    feeGrowthGlobal0X128: int
+    feeGrowthGlobal1X128: int
+    protocolFees: ProtocolFees
+    balance0: int
+    balance1: int
+    ## pool setting changing the swap transitions (see ChainflipPool.precisionEpochs)
+    precisionEpochs: bool
+    ## range ticks, range positions and their owners (same mappings as in ChainflipPool)
+    ticks: dict
+    positions: dict
+    positionOwners: dict
+    ## limit ticks, limit positions and their owners (same mappings as in ChainflipPool)
+    ticksLimitTokens0: dict
+    ticksLimitTokens1: dict
+    limitOrders: dict
+    limitOrderOwners: dict
+
+
+@dataclass
+class PoolDelta:
+    ## state version of the snapshot the delta applies on
+    baseVersion: int
+    ## pool fields and changed entries
+    snapshot: PoolSnapshot
+    ## removed entries: ticks and owner tuples of the positions. Entries created and removed after the base are
+    ## also listed, so they may not be in the base.
+    removedTicks: list
+    removedPositions: list
+    removedLimitTicks0: list
+    removedLimitTicks1: list
+    removedLimitOrders: list
+
+
+def toUint(value, length):
+    return value.to_bytes(length, "little")
+
+
+def toInt(value, length):
+    return value.to_bytes(length, "little", signed=True)
+
+
+def fromUint(data):
+    return int.from_bytes(data, "little")
+
+
+def fromInt(data):
+    return int.from_bytes(data, "little", signed=True)
+
+
+### @notice Splits a Decimal into its exact (sign, coefficient, exponent) representation.
+def fromDecimal(value):
+    (sign, digits, exponent) = value.as_tuple()
+    # Only finite values are expected
+    assert type(exponent) == int
+    coefficient = 0
+    for digit in digits:
+        coefficient = coefficient * 10 + digit
+    return sign, toUint(coefficient, 32), exponent
+
+
+def toDecimal(sign, coefficient, exponent):
+    # String construction is exact (not affected by the context precision)
+    return Decimal(
+        ("-" if sign else "") + str(fromUint(coefficient)) + "E" + str(exponent)
+    )
+
+
+## @notice Read-only sequence over a section of fixed-width records, e.g. of a memory-mapped snapshot.
+## @dev Records are decoded on access, nothing is materialized. Supports len(), indexing and bisect.
+class RecordArray:
+    ## @param data Snapshot buffer (bytes, memoryview or mmap)
+    ## @param offset The offset of the first record
+    ## @param count The number of records
+    ## @param record The struct of the records
+    ## @param decode Function decoding an unpacked record
+    def __init__(self, data, offset, count, record, decode):
+        self.data = data
+        self.offset = offset
+        self.count = count
+        self.record = record
+        self.decode = decode
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError("record index out of range")
+        return self.decode(
+            self.record.unpack_from(self.data, self.offset + index * self.record.size)
+        )
+
+
+def decodeTick(record):
+    return record[0]
+
+
+def decodeRangeTick(record):
+    (
+        _,
+        liquidityGross,
+        liquidityNet,
+        feeGrowthOutside0X128,
+        feeGrowthOutside1X128,
+    ) = record
+    return TickInfo(
+        fromUint(liquidityGross),
+        fromInt(liquidityNet),
+        fromUint(feeGrowthOutside0X128),
+        fromUint(feeGrowthOutside1X128),
+    )
+
+
+## @dev Owners are stored in their own section so they are not decoded here
+def decodeLimitTick(record):
+    (_, liquidityGross, sign, coefficient, exponent, feeGrowthInsideX128, _) = record
+    return TickInfoLimit(
+        fromUint(liquidityGross),
+        toDecimal(sign, coefficient, exponent),
+        fromUint(feeGrowthInsideX128),
+        [],
+    )
+
+
+### @notice Writes a snapshot of the pool state.
+### @param file Binary file object to write to
+### @param pool The ChainflipPool
+def write(file, pool):
+    strings = StringTable()
+    (entries, _) = sortedEntries(pool, pool._stateEntries())
+    # Tokens first in the string table
+    poolRecord = encodePool(pool, strings)
+    (sections, ownersCount) = encodeSections(pool, entries, strings)
+
+    file.write(
+        HEADER.pack(
+            MAGIC,
+            VERSION,
+            pool.stateVersion,
+            len(strings),
+            *[len(entries[kind]) for kind in ENTRY_KINDS[:4]],
+            ownersCount,
+            len(entries["limitOrder"]),
+        )
+    )
+    strings.write(file)
+    file.write(poolRecord)
+    file.write(b"".join(sections))
+
+
+### @notice Writes a delta snapshot: the pool record plus the entries changed since a base snapshot (upserted
+### with the same records as a snapshot) and the keys of the entries removed since then.
+### @param file Binary file object to write to
+### @param pool The ChainflipPool
+### @param baseVersion The state version of the snapshot (or delta) the delta applies on
+### @param changedEntries Keys of the state entries changed since the base (see ChainflipPool.digestEntries)
+def writeDelta(file, pool, baseVersion, changedEntries):
+    strings = StringTable()
+    (entries, removed) = sortedEntries(pool, changedEntries)
+    # Tokens first in the string table
+    poolRecord = encodePool(pool, strings)
+    (sections, ownersCount) = encodeSections(pool, entries, strings)
+
+    for tick in removed["tick"]:
+        sections.append(TICK_KEY.pack(tick))
+    for owner, tickLower, tickUpper in removed["position"]:
+        sections.append(POSITION_KEY.pack(strings.index(owner), tickLower, tickUpper))
+    for kind in ["limitTick0", "limitTick1"]:
+        for tick in removed[kind]:
+            sections.append(TICK_KEY.pack(tick))
+    for owner, tick, isToken0 in removed["limitOrder"]:
+        sections.append(LIMIT_ORDER_KEY.pack(strings.index(owner), tick, isToken0))
+
+    file.write(
+        DELTA_HEADER.pack(
+            DELTA_MAGIC,
+            VERSION,
+            baseVersion,
+            pool.stateVersion,
+            len(strings),
+            *[len(entries[kind]) for kind in ENTRY_KINDS[:4]],
+            ownersCount,
+            len(entries["limitOrder"]),
+            *[len(removed[kind]) for kind in ENTRY_KINDS],
+        )
+    )
+    strings.write(file)
+    file.write(poolRecord)
+    file.write(b"".join(sections))
+
+
+## @dev String table being built while encoding
+class StringTable:
+    def __init__(self):
+        self.strings = dict()
+
+    def __len__(self):
+        return len(self.strings)
+
+    def index(self, string):
+        index = self.strings.get(string)
+        if index == None:
+            index = len(self.strings)
+            self.strings[string] = index
+        return index
+
+    def write(self, file):
+        # Dicts are insertion ordered so the strings are in index order
+        for string in self.strings:
+            encoded = string.encode()
+            file.write(STRING_LENGTH.pack(len(encoded)))
+            file.write(encoded)
+
+
+## Entry kinds in section order
+ENTRY_KINDS = ["tick", "position", "limitTick0", "limitTick1", "limitOrder"]
+
+
+## @dev Groups state entry keys (see ChainflipPool.digestEntries) in sorted sections: range ticks,
+## (key, (owner, tickLower, tickUpper)) of the range positions, token0 and token1 limit ticks and
+## (key, (owner, tick, isToken0)) of the limit positions.
+## @return entries The sections of the entries in the pool
+## @return removed The sections of the entries not in the pool, with owner tuples instead of (key, owner tuple)
+def sortedEntries(pool, keys):
+    entries = {kind: [] for kind in ENTRY_KINDS}
+    removed = {kind: [] for kind in ENTRY_KINDS}
+    for key in keys:
+        kind = key[0]
+        if kind == "tick":
+            (entries if key[1] in pool.ticks else removed)[kind].append(key[1])
+        elif kind == "position":
+            (_, tickLower, tickUpper, owner) = key
+            positionKey = hash((owner, tickLower, tickUpper))
+            if positionKey in pool.positions:
+                entries[kind].append((positionKey, (owner, tickLower, tickUpper)))
+            else:
+                removed[kind].append((owner, tickLower, tickUpper))
+        elif kind == "limitTick":
+            (_, tick, isToken0) = key
+            (kind, ticksLimitMap) = (
+                ("limitTick0", pool.ticksLimitTokens0)
+                if isToken0
+                else ("limitTick1", pool.ticksLimitTokens1)
+            )
+            (entries if tick in ticksLimitMap else removed)[kind].append(tick)
+        else:
+            (_, tick, isToken0, owner) = key
+            positionKey = hash((owner, tick, isToken0))
+            if positionKey in pool.limitOrders:
+                entries[kind].append((positionKey, (owner, tick, isToken0)))
+            else:
+                removed[kind].append((owner, tick, isToken0))
+
+    for kind in ["position", "limitOrder"]:
+        entries[kind].sort(key=lambda item: item[1])
+    for sections in [entries, removed]:
+        for kind in ["tick", "limitTick0", "limitTick1"]:
+            sections[kind].sort()
+    removed["position"].sort()
+    removed["limitOrder"].sort()
+    return entries, removed
+
+
+## @dev Encodes the pool record.
+def encodePool(pool, strings):
+    return POOL.pack(
+        strings.index(pool.token0),
+        strings.index(pool.token1),
+        pool.fee,
+        pool.tickSpacing,
+        toUint(pool.slot0.sqrtPriceX96, 32),
+        pool.slot0.tick,
+        pool.slot0.feeProtocol,
+        toUint(pool.liquidity, 16),
+        toUint(pool.feeGrowthGlobal0X128, 32),
+        toUint(pool.feeGrowthGlobal1X128, 32),
+        toUint(pool.protocolFees.token0, 32),
+        toUint(pool.protocolFees.token1, 32),
+        toUint(pool.balances[pool.token0], 32),
+        toUint(pool.balances[pool.token1], 32),
+        POOL_PRECISION_EPOCHS if pool.precisionEpochs else 0,
+    )
+
+
+## @dev Encodes the records of the given entries (see sortedEntries).
+## @return sections The encoded records, in section order
+## @return ownersCount The number of limit tick owner records
+def encodeSections(pool, entries, strings):
+    sections = []
+    for tick in entries["tick"]:
+        info = pool.ticks[tick]
+        sections.append(
+            RANGE_TICK.pack(
+                tick,
+                toUint(info.liquidityGross, 16),
+                toInt(info.liquidityNet, 16),
+                toUint(info.feeGrowthOutside0X128, 32),
+                toUint(info.feeGrowthOutside1X128, 32),
+            )
+        )
+    for key, (owner, tickLower, tickUpper) in entries["position"]:
+        position = pool.positions[key]
+        sections.append(
+            POSITION.pack(
+                strings.index(owner),
+                tickLower,
+                tickUpper,
+                toUint(position.liquidity, 16),
+                toUint(position.feeGrowthInside0LastX128, 32),
+                toUint(position.feeGrowthInside1LastX128, 32),
+                toUint(position.tokensOwed0, 32),
+                toUint(position.tokensOwed1, 32),
+            )
+        )
+    owners = []
+    for ticksLimitMap, kind in [
+        (pool.ticksLimitTokens0, "limitTick0"),
+        (pool.ticksLimitTokens1, "limitTick1"),
+    ]:
+        for tick in entries[kind]:
+            info = ticksLimitMap[tick]
+            sections.append(
+                LIMIT_TICK.pack(
+                    tick,
+                    toUint(info.liquidityGross, 16),
+                    *fromDecimal(info.oneMinusPercSwap),
+                    toUint(info.feeGrowthInsideX128, 32),
+                    len(info.ownerPositions),
+                )
+            )
+            for owner in info.ownerPositions:
+                owners.append(OWNER.pack(strings.index(owner)))
+    sections.extend(owners)
+    for key, (owner, tick, isToken0) in entries["limitOrder"]:
+        position = pool.limitOrders[key]
+        sections.append(
+            LIMIT_ORDER.pack(
+                strings.index(owner),
+                tick,
+                isToken0,
+                toUint(position.liquidity, 16),
+                *fromDecimal(position.oneMinusPercSwapMint),
+                toUint(position.tokensOwed0, 32),
+                toUint(position.tokensOwed1, 32),
+                toUint(position.feeGrowthInsideLastX128, 32),
+            )
+        )
+    return sections, len(owners)
+
+
+## @dev Reads a string table.
+## @return strings The strings
+## @return offset The offset after the string table
+def readStrings(data, count, offset):
+    strings = []
+    for _ in range(count):
+        (length,) = STRING_LENGTH.unpack_from(data, offset)
+        offset += STRING_LENGTH.size
+        strings.append(bytes(data[offset : offset + length]).decode())
+        offset += length
+    return strings, offset
+
+
+### @notice Reads the header and the string table of a snapshot.
+### @param data Snapshot bytes (or any buffer supporting slicing)
+### @return counts The header counts (stateVersion, strings, range ticks, range positions, token0 limit ticks,
+### token1 limit ticks, limit tick owners, limit positions)
+### @return strings The string table
+### @return offset The offset of the pool record
+def readHeader(data):
+    (magic, version, *counts) = HEADER.unpack_from(data, 0)
+    assert magic == MAGIC, "Not a pool snapshot"
+    assert version == VERSION, "Unsupported snapshot version"
+    (strings, offset) = readStrings(data, counts[1], HEADER.size)
+    return counts, strings, offset
+
+
+### @notice Returns the offsets of the sections of a snapshot.
+### @param counts The header counts as returned by readHeader
+### @param offset The offset of the pool record
+### @return offsets The offsets of the range ticks, range positions, token0 limit ticks, token1 limit ticks,
+### limit tick owners and limit positions sections, plus the end of the snapshot
+def sectionOffsets(counts, offset):
+    offsets = [offset + POOL.size]
+    for count, record in zip(
+        counts[2:], [RANGE_TICK, POSITION, LIMIT_TICK, LIMIT_TICK, OWNER, LIMIT_ORDER]
+    ):
+        offsets.append(offsets[-1] + count * record.size)
+    return offsets
+
+
+### @notice Reads a snapshot, decoding every section in a single pass that also builds the pool mappings.
+### @param file Binary file object to read from
+### @return snapshot The decoded PoolSnapshot
+def read(file):
+    data = memoryview(file.read())
+    (counts, strings, offset) = readHeader(data)
+    offsets = sectionOffsets(counts, offset)
+    assert offsets[-1] == len(data), "Corrupted snapshot"
+    return decode(data, counts, strings, offset, offsets)
+
+
+### @notice Reads a delta snapshot (see writeDelta).
+### @param file Binary file object to read from
+### @return delta The decoded PoolDelta
+def readDelta(file):
+    data = memoryview(file.read())
+    (magic, version, baseVersion, *counts) = DELTA_HEADER.unpack_from(data, 0)
+    assert magic == DELTA_MAGIC, "Not a pool delta snapshot"
+    assert version == VERSION, "Unsupported snapshot version"
+    (counts, removedCounts) = (counts[:8], counts[8:])
+    (strings, offset) = readStrings(data, counts[1], DELTA_HEADER.size)
+    offsets = sectionOffsets(counts, offset)
+
+    removedOffsets = [offsets[-1]]
+    for count, record in zip(
+        removedCounts, [TICK_KEY, POSITION_KEY, TICK_KEY, TICK_KEY, LIMIT_ORDER_KEY]
+    ):
+        removedOffsets.append(removedOffsets[-1] + count * record.size)
+    assert removedOffsets[-1] == len(data), "Corrupted snapshot"
+
+    def unpack(record, index):
+        return record.iter_unpack(
+            data[removedOffsets[index] : removedOffsets[index + 1]]
+        )
+
+    return PoolDelta(
+        baseVersion,
+        decode(data, counts, strings, offset, offsets),
+        [tick for (tick,) in unpack(TICK_KEY, 0)],
+        [
+            (strings[owner], tickLower, tickUpper)
+            for owner, tickLower, tickUpper in unpack(POSITION_KEY, 1)
+        ],
+        [tick for (tick,) in unpack(TICK_KEY, 2)],
+        [tick for (tick,) in unpack(TICK_KEY, 3)],
+        [
+            (strings[owner], tick, isToken0 == 1)
+            for owner, tick, isToken0 in unpack(LIMIT_ORDER_KEY, 4)
+        ],
+    )
+
+
+### @notice Applies a delta onto a decoded snapshot, which becomes the snapshot of the delta state version.
+### @param snapshot The PoolSnapshot of the delta base
+### @param delta The PoolDelta
+def applyDelta(snapshot, delta):
+    assert delta.baseVersion == snapshot.stateVersion, "Delta base mismatch"
+    changes = delta.snapshot
+    for field in [
+        "stateVersion",
+        "slot0",
+        "liquidity",
+        "feeGrowthGlobal0X128",
+        "feeGrowthGlobal1X128",
+        "protocolFees",
+        "balance0",
+        "balance1",
+        "precisionEpochs",
+    ]:
+        setattr(snapshot, field, getattr(changes, field))
+
+    for mapping in [
+        "ticks",
+        "positions",
+        "positionOwners",
+        "ticksLimitTokens0",
+        "ticksLimitTokens1",
+        "limitOrders",
+        "limitOrderOwners",
+    ]:
+        getattr(snapshot, mapping).update(getattr(changes, mapping))
+
+    # Entries created and removed since the base (or touched by a reverted call) are removed without being in
+    # the base
+    for tick in delta.removedTicks:
+        snapshot.ticks.pop(tick, None)
+    for owner in delta.removedPositions:
+        snapshot.positions.pop(hash(owner), None)
+        snapshot.positionOwners.pop(hash(owner), None)
+    for tick in delta.removedLimitTicks0:
+        snapshot.ticksLimitTokens0.pop(tick, None)
+    for tick in delta.removedLimitTicks1:
+        snapshot.ticksLimitTokens1.pop(tick, None)
+    for owner in delta.removedLimitOrders:
+        snapshot.limitOrders.pop(hash(owner), None)
+        snapshot.limitOrderOwners.pop(hash(owner), None)
+
+
+## @dev Decodes the pool record and the sections of a snapshot or delta.
+def decode(data, counts, strings, offset, offsets):
+    (
+        token0,
+        token1,
+        fee,
+        tickSpacing,
+        sqrtPriceX96,
+        tick,
+        feeProtocol,
+        liquidity,
+        feeGrowthGlobal0X128,
+        feeGrowthGlobal1X128,
+        protocolFees0,
+        protocolFees1,
+        balance0,
+        balance1,
+        flags,
+    ) = POOL.unpack_from(data, offset)
+    token0 = strings[token0]
+    token1 = strings[token1]
+
+    ticks = dict()
+    for record in RANGE_TICK.iter_unpack(data[offsets[0] : offsets[1]]):
+        ticks[record[0]] = decodeRangeTick(record)
+
+    positions = dict()
+    positionOwners = dict()
+    for (
+        owner,
+        tickLower,
+        tickUpper,
+        liquidityPosition,
+        feeGrowthInside0LastX128,
+        feeGrowthInside1LastX128,
+        tokensOwed0,
+        tokensOwed1,
+    ) in POSITION.iter_unpack(data[offsets[1] : offsets[2]]):
+        owner = strings[owner]
+        key = hash((owner, tickLower, tickUpper))
+        positions[key] = PositionInfo(
+            fromUint(liquidityPosition),
+            fromUint(feeGrowthInside0LastX128),
+            fromUint(feeGrowthInside1LastX128),
+            fromUint(tokensOwed0),
+            fromUint(tokensOwed1),
+        )
+        positionOwners[key] = (owner, tickLower, tickUpper)
+
+    owners = [
+        strings[owner] for (owner,) in OWNER.iter_unpack(data[offsets[4] : offsets[5]])
+    ]
+    ownersIndex = 0
+    ticksLimit = []
+    for start, end in [(offsets[2], offsets[3]), (offsets[3], offsets[4])]:
+        ticksLimitMap = dict()
+        for record in LIMIT_TICK.iter_unpack(data[start:end]):
+            info = decodeLimitTick(record)
+            ownersCount = record[-1]
+            info.ownerPositions = owners[ownersIndex : ownersIndex + ownersCount]
+            ownersIndex += ownersCount
+            ticksLimitMap[record[0]] = info
+        ticksLimit.append(ticksLimitMap)
+
+    limitOrders = dict()
+    limitOrderOwners = dict()
+    for (
+        owner,
+        tickLimit,
+        isToken0,
+        liquidityPosition,
+        sign,
+        coefficient,
+        exponent,
+        tokensOwed0,
+        tokensOwed1,
+        feeGrowthInsideLastX128,
+    ) in LIMIT_ORDER.iter_unpack(data[offsets[5] : offsets[6]]):
+        owner = strings[owner]
+        isToken0 = isToken0 == 1
+        # Same key as getHashLimit, skipping the input checks
+        key = hash((owner, tickLimit, isToken0))
+        limitOrders[key] = PositionLimitInfo(
+            fromUint(liquidityPosition),
+            toDecimal(sign, coefficient, exponent),
+            fromUint(tokensOwed0),
+            fromUint(tokensOwed1),
+            fromUint(feeGrowthInsideLastX128),
+        )
+        limitOrderOwners[key] = (owner, tickLimit, isToken0)
+
+    return PoolSnapshot(
+        token0,
+        token1,
+        fee,
+        tickSpacing,
+        counts[0],
+        Slot0(fromUint(sqrtPriceX96), tick, feeProtocol),
+        fromUint(liquidity),
+        fromUint(feeGrowthGlobal0X128),
+        fromUint(feeGrowthGlobal1X128),
+        ProtocolFees(fromUint(protocolFees0), fromUint(protocolFees1)),
+        fromUint(balance0),
+        fromUint(balance1),
+        flags & POOL_PRECISION_EPOCHS != 0,
+        ticks,
+        positions,
+        positionOwners,
+        ticksLimit[0],
+        ticksLimit[1],
+        limitOrders,
+        limitOrderOwners,
+    )
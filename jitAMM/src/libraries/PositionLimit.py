@@ -1,3 +1,5 @@
+import math
+
 from uniswapV3Python.src.libraries.Shared import *
 from uniswapV3Python.src.libraries import LiquidityMath, FullMath
 from . import LimitOrderMath
@@ -89,19 +91,7 @@ def update(
         liquidityNext = LiquidityMath.addDelta(self.liquidity, liquidityDelta)
 
     # TokensOwed is not in liquidity token
-    tokensOwed = FullMath.mulDiv(
-        toUint256(feeGrowthInsideX128 - self.feeGrowthInsideLastX128),
-        self.liquidity,
-        FixedPoint128_Q128,
-    )
-
-    # NOTE: TokensOwed can be > MAX_UINT128 and < MAX_UINT256. Uniswap cast tokensOwed into uint128. This in itself
-    # is an overflow and it can overflow again when adding self.tokensOwed0 += tokensOwed0. Uniswap finds this
-    # acceptable to save gas and it is kept that way.
-
-    # Mimic Uniswap's solidity code overflow - uint128(tokensOwed0)
-    if tokensOwed > MAX_UINT128:
-        tokensOwed = tokensOwed & (2**128 - 1)
+    tokensOwed = getFeesOwed(self, feeGrowthInsideX128)
 
     # if we are burning calculate a proportional part of the position's liquidity
     # Then on the burn function we will remove them
@@ -180,43 +170,10 @@ def update(
         # totalAmountSwapped = percSwappedAfterMint * self.liquidity
 
         # percSwap - percSwapMint === (1 - percSwapMint) - (1 - percSwap)
-        assert self.oneMinusPercSwapMint > 0
-
-        # We round down the calculation
-        percSwapDecrease = self.oneMinusPercSwapMint - oneMinusPercSwap
-
-        amountSwappedPrev = LimitOrderMath.getAmountSwappedFromTickPercentatge(
-            percSwapDecrease,
-            self.oneMinusPercSwapMint,
-            self.liquidity,
-        )
-
-        # Same issue as in SwapMath
-        amountSwappedPrevRounding = (
-            LimitOrderMath.getAmountSwappedFromTickPercentatgeRoundUp(
-                percSwapDecrease,
-                self.oneMinusPercSwapMint,
-                self.liquidity,
-            )
+        (amountSwappedPrev, liquidityLeft) = getAmountsSwapped(
+            self, *getPercSwapped(self.oneMinusPercSwapMint, oneMinusPercSwap)
         )
 
-        # Calculate current position ratio
-        if isToken0:
-            currentPosition0 = LiquidityMath.addDelta(
-                self.liquidity, -amountSwappedPrevRounding
-            )
-            currentPosition1 = LimitOrderMath.calculateAmount1LO(
-                amountSwappedPrev, pricex96, False
-            )
-
-        else:
-            currentPosition1 = LiquidityMath.addDelta(
-                self.liquidity, -amountSwappedPrevRounding
-            )
-            currentPosition0 = LimitOrderMath.calculateAmount0LO(
-                amountSwappedPrev, pricex96, False
-            )
-
         ### Calculate the amount of liquidity that should be burnt from liquidityLeft and liquiditySwapped
 
         liquidityToRemove = abs(liquidityDelta)
@@ -227,35 +184,22 @@ def update(
         liquiditySwappedDelta = -FullMath.mulDiv(
             liquidityToRemove, amountSwappedPrev, self.liquidity
         )
-        if isToken0:
-            liquidityLeftDelta = -FullMath.mulDiv(
-                liquidityToRemove, currentPosition0, self.liquidity
-            )
-        else:
-            liquidityLeftDelta = -FullMath.mulDiv(
-                liquidityToRemove, currentPosition1, self.liquidity
-            )
-        # Mimic Uniswap's solidity code overflow - uint128(tokensOwed0)
-        if currentPosition0 > MAX_UINT128:
-            currentPosition0 = currentPosition0 & (2**128 - 1)
-        if currentPosition1 > MAX_UINT128:
-            currentPosition1 = currentPosition1 & (2**128 - 1)
+        liquidityLeftDelta = -FullMath.mulDiv(
+            liquidityToRemove, liquidityLeft, self.liquidity
+        )
 
         # No need to update oneMinusPercSwapMint. We should update this
         # when the position is fully burnt (1) but we can't burn more than that anyway,
         # so no need to self.oneMinusPercSwapMint = oneMinusPercSwap
 
+        # Update position owed in their tokens
+        liquiditySwappedDelta = convertSwapped(
+            abs(liquiditySwappedDelta), isToken0, pricex96
+        )
         if isToken0:
-            # Update position owed in their tokens
             self.tokensOwed0 += abs(liquidityLeftDelta)
-            liquiditySwappedDelta = LimitOrderMath.calculateAmount1LO(
-                abs(liquiditySwappedDelta), pricex96, False
-            )
             self.tokensOwed1 += liquiditySwappedDelta
         else:
-            liquiditySwappedDelta = LimitOrderMath.calculateAmount0LO(
-                abs(liquiditySwappedDelta), pricex96, False
-            )
             self.tokensOwed0 += liquiditySwappedDelta
             self.tokensOwed1 += abs(liquidityLeftDelta)
 
@@ -276,3 +220,128 @@ def update(
 
     # Returning liquidityLeftDelta amd liquiditySwappedDelta to return as a result of the burn function
     return liquidityLeftDelta, liquiditySwappedDelta
+
+
+### @notice Fraction of a position's liquidity swapped since it was minted, rounded down and up, as used by update and
+### getOwed. It only depends on oneMinusPercSwapMint, so it is shared by all the positions of a tick
+### minted at the same oneMinusPercSwap.
+### @param oneMinusPercSwapMint The position's oneMinusPercSwapMint
+### @param oneMinusPercSwap The tick swap percentatge status
+### @return percSwapped The fraction swapped, rounded down
+### @return percSwappedRoundUp The fraction swapped, rounded up
+def getPercSwapped(oneMinusPercSwapMint, oneMinusPercSwap):
+    checkInputTypes(decimal=(oneMinusPercSwapMint, oneMinusPercSwap))
+    assert oneMinusPercSwapMint > 0
+
+    percSwapDecrease = oneMinusPercSwapMint - oneMinusPercSwap
+    percSwapped = percSwapDecrease / oneMinusPercSwapMint
+    LimitOrderMath.setDecimalPrecRound(getcontext().prec, "ROUND_UP")
+    percSwappedRoundUp = percSwapDecrease / oneMinusPercSwapMint
+    LimitOrderMath.setDecimalPrecRound(getcontext().prec, "ROUND_DOWN")
+    return percSwapped, percSwappedRoundUp
+
+
+### @notice Fees accrued by a position since it was last updated, in the token opposite to its liquidity.
+### @param self The individual position
+### @param feeGrowthInsideX128 The all-time fee growth in !isToken0.
+### @return tokensOwed The fees owed
+def getFeesOwed(self, feeGrowthInsideX128):
+    tokensOwed = FullMath.mulDiv(
+        toUint256(feeGrowthInsideX128 - self.feeGrowthInsideLastX128),
+        self.liquidity,
+        FixedPoint128_Q128,
+    )
+
+    # NOTE: TokensOwed can be > MAX_UINT128 and < MAX_UINT256. Uniswap cast tokensOwed into uint128. This in itself
+    # is an overflow and it can overflow again when adding self.tokensOwed0 += tokensOwed0. Uniswap finds this
+    # acceptable to save gas and it is kept that way.
+
+    # Mimic Uniswap's solidity code overflow - uint128(tokensOwed0)
+    if tokensOwed > MAX_UINT128:
+        tokensOwed = tokensOwed & (2**128 - 1)
+    return tokensOwed
+
+
+### @notice Splits a position's liquidity into the amount swapped and the liquidity left since it was minted.
+### @dev Same as getAmountSwappedFromTickPercentatge and getAmountSwappedFromTickPercentatgeRoundUp, with the
+### fractions computed once by getPercSwapped. The amount swapped is rounded down and the liquidity left too.
+### @param self The individual position
+### @param percSwapped The fraction of the position swapped, rounded down (see getPercSwapped)
+### @param percSwappedRoundUp The fraction of the position swapped, rounded up (see getPercSwapped)
+### @return amountSwapped The liquidity swapped, in the position's token
+### @return liquidityLeft The liquidity not swapped yet, in the position's token
+def getAmountsSwapped(self, percSwapped, percSwappedRoundUp):
+    amountSwapped = math.floor(self.liquidity * percSwapped)
+    liquidityLeft = LiquidityMath.addDelta(
+        self.liquidity, -math.ceil(self.liquidity * percSwappedRoundUp)
+    )
+    return amountSwapped, liquidityLeft
+
+
+### @notice Converts an amount of a position's token swapped into the other token at the tick price, rounding down.
+### @param amount The amount swapped, in the position's token
+### @param isToken0 Whether the position's liquidity is in token0 or token1
+### @param pricex96 The price at the position's tick
+### @return amountOther The amount in the other token
+def convertSwapped(amount, isToken0, pricex96):
+    if isToken0:
+        return LimitOrderMath.calculateAmount1LO(amount, pricex96, False)
+    return LimitOrderMath.calculateAmount0LO(amount, pricex96, False)
+
+
+### @notice Computes what a position is owed without modifying it: its tokensOwed plus the fees accrued and the
+### amount swapped since it was last updated, as a burn of the whole position would credit them.
+### @param self The individual position
+### @param percSwapped The fraction of the position swapped, rounded down (see getPercSwapped)
+### @param percSwappedRoundUp The fraction of the position swapped, rounded up (see getPercSwapped)
+### @param isToken0 Whether the position's liquidity is in token0 or token1
+### @param pricex96 The price at the position's tick
+### @param feeGrowthInsideX128 The all-time fee growth in !isToken0.
+### @return tokensOwed0 The amount of token0 owed
+### @return tokensOwed1 The amount of token1 owed
+### @return liquidityLeft The position's liquidity not swapped yet, in isToken0 token
+def getOwed(
+    self, percSwapped, percSwappedRoundUp, isToken0, pricex96, feeGrowthInsideX128
+):
+    (amountSwappedPrev, liquidityLeft) = getAmountsSwapped(
+        self, percSwapped, percSwappedRoundUp
+    )
+    # The amount swapped and the fees are both in the other token
+    owedOther = convertSwapped(amountSwappedPrev, isToken0, pricex96) + getFeesOwed(
+        self, feeGrowthInsideX128
+    )
+    if isToken0:
+        return self.tokensOwed0, self.tokensOwed1 + owedOther, liquidityLeft
+    else:
+        return self.tokensOwed0 + owedOther, self.tokensOwed1, liquidityLeft
+
+
+### @notice Checkpoints a position when its tick rolls into a new epoch. The amount swapped and the fees accrued are
+### credited to the tokens owed, as a burn of the whole position would, and the liquidity left becomes the position's
+### liquidity at the start of the epoch.
+### @dev The amounts are rounded exactly as in update, so the position ends up with the same tokens as if it had been
+### fully burnt at the checkpoint.
+### @param self The individual position to checkpoint
+### @param oneMinusPercSwap The tick swap percentatge status at the end of the epoch
+### @param isToken0 Whether the position's liquidity is in token0 or token1
+### @param pricex96 The price at the position's tick
+### @param feeGrowthInsideX128 The all-time fee growth in !isToken0.
+### @return liquidity The position's liquidity in the new epoch
+def checkpoint(self, oneMinusPercSwap, isToken0, pricex96, feeGrowthInsideX128):
+    checkInputTypes(
+        uint256=(feeGrowthInsideX128, pricex96),
+        decimal=(oneMinusPercSwap),
+        bool=(isToken0),
+    )
+
+    (self.tokensOwed0, self.tokensOwed1, liquidityLeft) = getOwed(
+        self,
+        *getPercSwapped(self.oneMinusPercSwapMint, oneMinusPercSwap),
+        isToken0,
+        pricex96,
+        feeGrowthInsideX128,
+    )
+    self.liquidity = liquidityLeft
+    self.oneMinusPercSwapMint = Decimal("1")
+    self.feeGrowthInsideLastX128 = feeGrowthInsideX128
+    return liquidityLeft
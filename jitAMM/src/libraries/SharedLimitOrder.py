@@ -12,6 +12,12 @@ MAX_TICK_LO = -MIN_TICK_LO
 ## Mimicking a float point number with a 256 bit mantissa (== 10E77)
 contextPrecision = 77
 
+## With ChainflipPool.precisionEpochs set, a limit tick left with a oneMinusPercSwap below this after a partial swap
+## rolls into a new epoch: its positions are checkpointed and it restarts at 1 (see ChainflipPool._rollLimitTickEpoch). Position amounts are derived from
+## oneMinusPercSwap ratios, so their error is around liquidity * 10**-contextPrecision / oneMinusPercSwap, which the
+## threshold keeps far below one unit for any uint128 liquidity.
+EPOCH_THRESHOLD = Decimal("1e-24")
+
 # ------------------ Shared dataclasses ------------------ #
 
 ## info stored for each initialized individual tick
@@ -38,6 +44,9 @@ class TickInfoLimit:
     # and to skip recomputing the has when burning the position.
     ownerPositions: list
 
+    ## pool state version (ChainflipPool.stateVersion) of the last modification of the tick
+    lastModified: int = 0
+
 
 # ------------------ Shared utility functions ------------------ #
 
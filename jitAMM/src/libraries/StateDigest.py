@@ -0,0 +1,73 @@
+import hashlib
+
+### @title StateDigest
+### @notice Incrementally maintained digest of a set of pool state entries (ticks, positions...).
+### @dev Additive multiset hash: the digest of a set of entries is the sum modulo 2**256 of the sha256 of each
+### entry, so it doesn't depend on the order the entries are added in, and an entry is updated in O(1) by
+### subtracting its old hash and adding the new one. Entries are grouped in buckets of BUCKET_TICKS ticks, each
+### with its own digest, so two replicas can narrow down where they diverge: compare the root digests, then the
+### bucket digests, then the entries of the buckets that differ.
+
+MODULUS = 1 << 256
+
+## Ticks per bucket. With the maximum tick range (-887272, 887272) there are at most 434 buckets.
+BUCKET_TICKS = 4096
+
+
+## @notice Hash of a single entry.
+## @param key Tuple identifying the entry, its second element being the tick the entry belongs to
+## @param value Tuple with the entry values. Must have a deterministic repr.
+## @return entryHash The entry hash as an integer
+def entryHash(key, value):
+    return int.from_bytes(
+        hashlib.sha256(repr((key, value)).encode()).digest(), "little"
+    )
+
+
+## @notice Bucket an entry belongs to.
+def bucketOf(key):
+    return key[1] // BUCKET_TICKS
+
+
+class StateDigest:
+    def __init__(self):
+        # Bucket => dictionary key => entry hash
+        self.buckets = dict()
+        # Bucket => digest of the bucket entries
+        self.bucketDigests = dict()
+        self.root = 0
+
+    ## @notice Sets the value of an entry, or removes the entry if value is None.
+    ## @param key Tuple identifying the entry, its second element being the tick the entry belongs to
+    ## @param value Tuple with the entry values or None
+    def update(self, key, value):
+        bucket = bucketOf(key)
+        entries = self.buckets.get(bucket)
+        if entries == None:
+            entries = self.buckets[bucket] = dict()
+            self.bucketDigests[bucket] = 0
+
+        delta = -entries.pop(key, 0)
+        if value != None:
+            entries[key] = entryHash(key, value)
+            delta += entries[key]
+
+        self.root = (self.root + delta) % MODULUS
+        if len(entries) == 0:
+            del self.buckets[bucket]
+            del self.bucketDigests[bucket]
+        else:
+            self.bucketDigests[bucket] = (self.bucketDigests[bucket] + delta) % MODULUS
+
+    ## @notice Digest of the entries in the buckets between two ticks, both included.
+    def rangeDigest(self, tickLower, tickUpper):
+        bucketLower = tickLower // BUCKET_TICKS
+        bucketUpper = tickUpper // BUCKET_TICKS
+        return (
+            sum(
+                digest
+                for bucket, digest in self.bucketDigests.items()
+                if bucketLower <= bucket <= bucketUpper
+            )
+            % MODULUS
+        )
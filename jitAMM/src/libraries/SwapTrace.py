@@ -0,0 +1,109 @@
+import array
+import csv
+
+### @title SwapTrace
+### @notice Columnar record of the iterations of a swap (see ChainflipPool.swapWithTrace), to find out whether a swap
+### spends its time in limit order steps, range order steps, tick crossings or the final settlement.
+### @dev Columns are preallocated and grown by doubling. The amounts are uint256 so they are kept as Python ints.
+
+STEP_LIMIT = 0
+STEP_RANGE = 1
+## Token transfers and burning of the crossed limit ticks at the end of the swap
+STEP_SETTLEMENT = 2
+STEP_NAMES = ["limit", "range", "settlement"]
+
+COLUMNS = [
+    "stepType",
+    "tickNext",
+    "amountIn",
+    "amountOut",
+    "feeAmount",
+    "crossed",
+    "elapsedNs",
+]
+
+
+class SwapTrace:
+    ## @param capacity Number of steps preallocated
+    def __init__(self, capacity=64):
+        self.length = 0
+        self.capacity = capacity
+        self.stepType = array.array("b", bytes(capacity))
+        self.tickNext = array.array("i", bytes(4 * capacity))
+        self.amountIn = [0] * capacity
+        self.amountOut = [0] * capacity
+        self.feeAmount = [0] * capacity
+        self.crossed = array.array("b", bytes(capacity))
+        self.elapsedNs = array.array("q", bytes(8 * capacity))
+
+    def __len__(self):
+        return self.length
+
+    ## @notice Records a step.
+    ## @param stepType STEP_LIMIT, STEP_RANGE or STEP_SETTLEMENT
+    ## @param tickNext Tick the step swapped towards (the final tick for the settlement)
+    ## @param amountIn Amount swapped in, without fees (the total amount in for the settlement)
+    ## @param amountOut Amount swapped out (the total amount out for the settlement)
+    ## @param feeAmount Fee earned by the liquidity providers, the protocol fee excluded
+    ## @param crossed Whether the step crossed its tick (whether limit ticks were burnt for the settlement)
+    ## @param elapsedNs Time spent in the step in nanoseconds
+    def record(
+        self, stepType, tickNext, amountIn, amountOut, feeAmount, crossed, elapsedNs
+    ):
+        if self.length == self.capacity:
+            self._grow()
+        index = self.length
+        self.stepType[index] = stepType
+        self.tickNext[index] = tickNext
+        self.amountIn[index] = amountIn
+        self.amountOut[index] = amountOut
+        self.feeAmount[index] = feeAmount
+        self.crossed[index] = crossed
+        self.elapsedNs[index] = elapsedNs
+        self.length += 1
+
+    def _grow(self):
+        for column in COLUMNS:
+            values = getattr(self, column)
+            if isinstance(values, list):
+                values.extend([0] * self.capacity)
+            else:
+                values.extend(
+                    array.array(values.typecode, bytes(values.itemsize * self.capacity))
+                )
+        self.capacity *= 2
+
+    ## @notice Returns the recorded columns as NumPy arrays.
+    ## @dev Requires numpy. Amounts don't fit in NumPy integer types so they are object arrays of Python ints.
+    ## @return columns Dictionary column name => array
+    def toNumpy(self):
+        import numpy as np
+
+        length = self.length
+        return {
+            "stepType": np.array(self.stepType[:length], dtype=np.int8),
+            "tickNext": np.array(self.tickNext[:length], dtype=np.int32),
+            "amountIn": np.array(self.amountIn[:length], dtype=object),
+            "amountOut": np.array(self.amountOut[:length], dtype=object),
+            "feeAmount": np.array(self.feeAmount[:length], dtype=object),
+            "crossed": np.array(self.crossed[:length], dtype=np.bool_),
+            "elapsedNs": np.array(self.elapsedNs[:length], dtype=np.int64),
+        }
+
+    ## @notice Writes the recorded steps as CSV, with a header row and the step type names.
+    ## @param file Text file object to write to
+    def toCsv(self, file):
+        writer = csv.writer(file)
+        writer.writerow(COLUMNS)
+        for index in range(self.length):
+            writer.writerow(
+                [
+                    STEP_NAMES[self.stepType[index]],
+                    self.tickNext[index],
+                    self.amountIn[index],
+                    self.amountOut[index],
+                    self.feeAmount[index],
+                    self.crossed[index],
+                    self.elapsedNs[index],
+                ]
+            )
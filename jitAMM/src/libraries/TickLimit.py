@@ -1,3 +1,5 @@
+import math
+
 from uniswapV3Python.src.libraries import LiquidityMath
 from .SharedLimitOrder import *
 
@@ -60,3 +62,12 @@ def update(
 
     # No longer require flip to signal if it has been initialized but it is needed for when it is cleared
     return flipped
+
+
+### @notice Returns the amount of liquidity left in a limit order tick, that is the amount of the tick's token
+### that has not been swapped yet.
+### @dev Rounded down, same as the liquidity used in LimitOrderSwapMath.computeSwapStep
+### @param self The tick info
+### @return liquidityLeft The liquidity available to be swapped
+def getLiquidityLeft(self):
+    return math.floor(self.liquidityGross * self.oneMinusPercSwap)
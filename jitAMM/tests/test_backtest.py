@@ -0,0 +1,79 @@
+import io
+
+from ..src.Backtest import *
+from ..src.OrderFlow import *
+
+
+# Order flow split in blocks of 10 operations, limit orders filled and no exact output swaps (see
+# LimitOrderSwapMath.computeSwapStep)
+def createBlockOperations(count):
+    config = OrderFlowConfig(exactOutputFraction=0, maxSlippageTicks=500)
+    return [
+        (index // 10, name, args)
+        for index, (name, args) in enumerate(generateOperations(5, config, count))
+    ]
+
+
+def readAllMetrics(output):
+    output.seek(0)
+    metrics = {column: [] for column in COLUMNS}
+    for chunk in readMetrics(output):
+        for column in COLUMNS:
+            metrics[column] += chunk[column]
+    return metrics
+
+
+def test_backtest_formats():
+    print("JSONL and CSV operations give the same metrics, whatever the chunk size")
+    operations = createBlockOperations(600)
+    results = []
+    for format, chunkSize in [("jsonl", 7), ("csv", 1000)]:
+        file = io.StringIO()
+        writeOperations(file, operations, format)
+        file.seek(0)
+        pool = createPool()
+        output = io.BytesIO()
+        assert runBacktest(
+            pool, readOperations(file, format), output, VALIDATION_BLOCK, chunkSize
+        ) == (61, 601)
+        results.append((readAllMetrics(output), pool.stateHash()))
+    assert results[0] == results[1]
+
+    # Same final state as applying the operations directly
+    pool = createPool()
+    applyOperations(pool, [(name, args) for _, name, args in operations])
+    assert pool.stateHash() == results[0][1]
+
+
+def test_backtest_metrics():
+    operations = createBlockOperations(600)
+    pool = createPool()
+    output = io.BytesIO()
+    runBacktest(pool, operations, output, VALIDATION_OPERATION)
+    metrics = readAllMetrics(output)
+
+    assert metrics["block"] == list(range(61))
+    assert sum(metrics["operations"]) == 601
+    assert metrics["tick"][-1] == pool.slot0.tick
+    assert metrics["sqrtPriceX96"][-1] == pool.slot0.sqrtPriceX96
+    assert metrics["liquidity"][-1] == pool.liquidity
+    for column in ["limitFillVolume0", "limitFillVolume1", "fees0", "fees1"]:
+        assert sum(metrics[column]) > 0
+    assert 0 < sum(metrics["settledTicks"]) <= sum(metrics["settledPositions"])
+    # The pool is not patched to count the settlements
+    assert "burnCrossedTicksAndPositions" not in vars(pool)
+
+
+def test_backtest_defaultFlow():
+    print("the default flow, exact output swaps included, keeps the pool valid")
+    operations = [
+        (index // 10, name, args)
+        for index, (name, args) in enumerate(generateOperations(1, count=3000))
+    ]
+    pool = createPool()
+    output = io.BytesIO()
+    assert runBacktest(pool, operations, output, VALIDATION_BLOCK) == (301, 3001)
+    metrics = readAllMetrics(output)
+    assert 0 < sum(metrics["reverted"]) < 3001 // 10
+    assert sum(metrics["settledTicks"]) > 0
+    validatePool(pool)
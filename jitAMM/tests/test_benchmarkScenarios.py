@@ -0,0 +1,24 @@
+from ..benchmarks.benchmarkScenarios import *
+
+
+def test_scenarios_growth():
+    print(
+        "no operation count of the adversarial scenarios grows faster than its threshold"
+    )
+    for name in SCENARIOS:
+        assert checkScenario(name, 16) == []
+
+
+def test_scenarios_counts():
+    scenario = crowdedTick(16)
+    counts = runScenario(scenario, "count")
+    # Every owner on the crossed tick is settled, the burnt limit order excluded
+    assert counts["swap"]["settlementIterations"] == 16
+    assert counts["mintLimitOrder"]["ledgerTransfers"] == 1
+    # The quadratic scans are caught by the thresholds
+    exponents = growthExponents("dustLadder", 16)
+    assert (
+        1.9
+        < exponents[("swap", "tickScans")]
+        <= SUPERLINEAR[("dustLadder", "swap", "tickScans")]
+    )
@@ -0,0 +1,56 @@
+import pytest
+
+from ..benchmarks.benchmarkWeights import *
+
+VALUES = [8, 16, 32, 64, 128]
+
+
+def test_weights_fitLinear():
+    print("the fit of linear data recovers its base and slope")
+    assert fitLinear(VALUES, [100 + 3 * x for x in VALUES]) == pytest.approx((100, 3))
+
+
+def test_weights_linearNotFlagged():
+    print("linear models are not flagged superlinear")
+    model = fitModel(VALUES, [1000 + 50 * x for x in VALUES])
+    assert (model["base"], model["slope"]) == pytest.approx((1000, 50))
+    assert model["worstCase"] == 1000 + 50 * 128
+    assert not model["superlinear"]
+    # Nor is noise around a linear model
+    noise = [30, -20, 25, -30, 20]
+    model = fitModel(VALUES, [1000 + 50 * x + n for x, n in zip(VALUES, noise)])
+    assert not model["superlinear"]
+
+
+def test_weights_quadraticFlagged():
+    print("quadratic models are flagged superlinear")
+    model = fitModel(VALUES, [100 + x**2 for x in VALUES])
+    assert model["superlinear"]
+    # Unless the growth of the upper half is small compared to the worst case
+    model = fitModel(VALUES, [10**6 + x**2 for x in VALUES])
+    upperGrowth = 128**2 - 32**2
+    assert upperGrowth < NOISE_FRACTION * model["worstCase"]
+    assert not model["superlinear"]
+
+
+def test_weights_benchmarkComponent():
+    print("benchmarking a component with small values meters every function")
+    values = [1, 2, 3]
+    result = benchmarkComponent(setupLimitTicksCrossed, values, 1)
+    assert sorted(result) == sorted(FUNCTIONS)
+    for function in FUNCTIONS:
+        points = result[function]["points"]
+        assert [point["component"] for point in points] == values
+        assert all(point["timeNs"] > 0 for point in points)
+        assert sorted(result[function]["models"]) == sorted(
+            ["timeNs"] + list(CostMeter.COUNTERS)
+        )
+    # One owner settled per crossed tick
+    model = result["burnCrossedTicksAndPositions"]["models"]["settlementIterations"]
+    assert (model["base"], model["slope"], model["worstCase"]) == pytest.approx(
+        (0, 1, 3)
+    )
+    assert not model["superlinear"]
+    # Minting does not depend on the crossed ticks
+    model = result["mintLimitOrder"]["models"]["ledgerTransfers"]
+    assert (model["base"], model["slope"]) == pytest.approx((1, 0))
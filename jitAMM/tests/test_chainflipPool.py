@@ -3869,6 +3869,59 @@ def test_precision_closeTo1(createPoolLow, accounts):
     assert liquidityLeft == 4
 
 
+def test_precision_epoch():
+    print("Heavily swapped limit ticks roll into a new epoch")
+
+    def swapAndBurn(pool, accounts):
+        tick = 0
+        pool.mintLimitOrder(TEST_TOKENS[1], accounts[0], tick, 10**32)
+        pool.mintLimitOrder(TEST_TOKENS[1], accounts[2], tick, 3 * 10**29 + 7)
+        oneMinusPercSwaps = []
+        for i in range(45):
+            info = pool.ticksLimitTokens1[tick]
+            liquidityLeft = math.floor(info.liquidityGross * info.oneMinusPercSwap)
+            swapExact0For1(pool, liquidityLeft * 3 // 4, accounts[1], None)
+            oneMinusPercSwaps.append(pool.ticksLimitTokens1[tick].oneMinusPercSwap)
+
+        amounts = []
+        for account in [accounts[0], accounts[2]]:
+            position = pool.limitOrders[getHashLimit(account, tick, False)]
+            (_, _, _, amountBurnt0, amountBurnt1) = pool.burnLimitOrder(
+                TEST_TOKENS[1], account, tick, position.liquidity
+            )
+            amounts.append((amountBurnt0, amountBurnt1))
+        assert not pool.ticksLimitTokens1.__contains__(tick)
+        assert pool.balances[TEST_TOKENS[0]] >= 0
+        assert pool.balances[TEST_TOKENS[1]] >= 0
+        return oneMinusPercSwaps, amounts
+
+    pool, _, _, _, accounts = poolRandomTests(False)
+    pool.precisionEpochs = True
+    (oneMinusPercSwaps, amounts) = swapAndBurn(pool, accounts)
+    # The tick has rolled into a new epoch and never went below the threshold
+    assert (
+        sum(
+            oneMinusPercSwaps[i] > oneMinusPercSwaps[i - 1]
+            for i in range(1, len(oneMinusPercSwaps))
+        )
+        >= 1
+    )
+    assert min(oneMinusPercSwaps) >= EPOCH_THRESHOLD
+
+    # Same swaps without epochs, which are off by default
+    pool, _, _, _, accounts = poolRandomTests(False)
+    assert not pool.precisionEpochs
+    (oneMinusPercSwapsNoEpochs, amountsNoEpochs) = swapAndBurn(pool, accounts)
+    assert min(oneMinusPercSwapsNoEpochs) < EPOCH_THRESHOLD
+
+    # Without fees the positions get the same amounts, up to the rounding of the checkpoints
+    for (amount0, amount1), (amount0NoEpochs, amount1NoEpochs) in zip(
+        amounts, amountsNoEpochs
+    ):
+        assert abs(amount0 - amount0NoEpochs) <= 2
+        assert abs(amount1 - amount1NoEpochs) <= 2
+
+
 # Trying random LO positions on top of RO and check behaviour. Also check that pool RO pool behaves the same
 # if there are LO that are not used as if there were are none.
 @given(
@@ -4190,6 +4243,189 @@ def test_randomLO_onRO_oneForZero(st_isToken0, st_swapAmounts, st_tick, st_mintA
                 assert False, "Should never reach this"
 
 
+def test_topOfBook_mintBurn(initializedMediumPoolNoLO, accounts):
+    print("top of book tracks the best live limit tick when minting and burning")
+    (
+        pool,
+        _,
+        _,
+        _,
+        tickSpacing,
+        closeAligniniTickiRDown,
+        closeAligniniTickRUp,
+    ) = initializedMediumPoolNoLO
+
+    assert pool.topOfBook() == (None, None, pool.slot0.sqrtPriceX96)
+
+    tick0 = closeAligniniTickRUp
+    tick1 = closeAligniniTickiRDown
+
+    pool.mintLimitOrder(
+        TEST_TOKENS[0], accounts[0], tick0 + tickSpacing * 2, expandTo18Decimals(1)
+    )
+    pool.mintLimitOrder(TEST_TOKENS[0], accounts[0], tick0, expandTo18Decimals(2))
+    pool.mintLimitOrder(
+        TEST_TOKENS[1], accounts[0], tick1 - tickSpacing * 2, expandTo18Decimals(3)
+    )
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[0], tick1, expandTo18Decimals(4))
+
+    # Token0 limit orders are best at the lowest tick and token1 at the highest tick
+    assert pool.topOfBook() == (
+        BestLimitTick(tick0, expandTo18Decimals(2)),
+        BestLimitTick(tick1, expandTo18Decimals(4)),
+        pool.slot0.sqrtPriceX96,
+    )
+
+    # Minting worse ticks doesn't change the top of book
+    pool.mintLimitOrder(TEST_TOKENS[0], accounts[1], tick0 + tickSpacing * 4, 1)
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[1], tick1 - tickSpacing * 4, 1)
+    assert pool.bestLimitTick0 == BestLimitTick(tick0, expandTo18Decimals(2))
+    assert pool.bestLimitTick1 == BestLimitTick(tick1, expandTo18Decimals(4))
+
+    # Partially burning the best tick only updates the liquidity left
+    pool.burnLimitOrder(TEST_TOKENS[0], accounts[0], tick0, expandTo18Decimals(1))
+    assert pool.bestLimitTick0 == BestLimitTick(tick0, expandTo18Decimals(1))
+
+    # Fully burning the best tick moves the top of book to the next best tick
+    pool.burnLimitOrder(TEST_TOKENS[0], accounts[0], tick0, expandTo18Decimals(1))
+    pool.burnLimitOrder(TEST_TOKENS[1], accounts[0], tick1, expandTo18Decimals(4))
+    assert pool.bestLimitTick0 == BestLimitTick(
+        tick0 + tickSpacing * 2, expandTo18Decimals(1)
+    )
+    assert pool.bestLimitTick1 == BestLimitTick(
+        tick1 - tickSpacing * 2, expandTo18Decimals(3)
+    )
+
+    # Minting a better tick replaces the top of book
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[1], tick1 + tickSpacing, 5)
+    assert pool.bestLimitTick1 == BestLimitTick(tick1 + tickSpacing, 5)
+
+    pool.burnLimitOrder(
+        TEST_TOKENS[0], accounts[0], tick0 + tickSpacing * 2, expandTo18Decimals(1)
+    )
+    pool.burnLimitOrder(TEST_TOKENS[0], accounts[1], tick0 + tickSpacing * 4, 1)
+    assert pool.bestLimitTick0 == None
+    assert pool.bestLimitTick1 == findBestLimitTick(pool.ticksLimitTokens1, False)
+
+
+def test_topOfBook_swap(initializedMediumPoolNoLO, accounts):
+    print("top of book tracks partial fills and crossed ticks during a swap")
+    (
+        pool,
+        _,
+        _,
+        _,
+        tickSpacing,
+        _,
+        closeAligniniTickRUp,
+    ) = initializedMediumPoolNoLO
+
+    tickBest = closeAligniniTickRUp + tickSpacing * 10
+    tickNext = closeAligniniTickRUp + tickSpacing * 5
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[0], tickBest, expandTo18Decimals(1))
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[0], tickNext, expandTo18Decimals(1))
+    assert pool.bestLimitTick1 == BestLimitTick(tickBest, expandTo18Decimals(1))
+
+    # Partial fill of the best tick
+    swapExact0For1(pool, expandTo18Decimals(1) // 10, accounts[1], None)
+    assert pool.bestLimitTick1.tick == tickBest
+    assert pool.bestLimitTick1.liquidityLeft < expandTo18Decimals(1)
+    assert pool.bestLimitTick1.liquidityLeft == TickLimit.getLiquidityLeft(
+        pool.ticksLimitTokens1[tickBest]
+    )
+
+    # Cross the best tick and partially fill the next one
+    swapExact0For1(pool, expandTo18Decimals(10), accounts[1], None)
+    assert not pool.ticksLimitTokens1.__contains__(tickBest)
+    assert pool.bestLimitTick1.tick == tickNext
+    assert pool.bestLimitTick1.liquidityLeft < expandTo18Decimals(1)
+    assert pool.bestLimitTick1 == findBestLimitTick(pool.ticksLimitTokens1, False)
+    assert nextLimitTick(pool.ticksLimitTokens1, False, pool.slot0.tick) == (
+        pool._nextLimitTick(True, pool.slot0.tick)
+    )
+    assert pool.bestLimitTick0 == None
+
+
+def test_crossTickSeveralOwners(initializedMediumPoolNoLO, accounts):
+    print("crossing a limit tick burns the positions of all its owners")
+    (
+        pool,
+        _,
+        _,
+        _,
+        tickSpacing,
+        _,
+        closeAligniniTickRUp,
+    ) = initializedMediumPoolNoLO
+
+    tickLO = closeAligniniTickRUp + tickSpacing * 5
+    for account in accounts[:3]:
+        pool.mintLimitOrder(TEST_TOKENS[1], account, tickLO, expandTo18Decimals(1))
+
+    swapExact0For1(pool, expandTo18Decimals(100), accounts[3], None)
+    assert not pool.ticksLimitTokens1.__contains__(tickLO)
+    for account in accounts[:3]:
+        Position.assertLimitPositionIsBurnt(pool.limitOrders, account, tickLO, False)
+
+
+def test_stateVersion_lastModified(initializedMediumPoolNoLO, accounts):
+    print("state version is bumped on every modification and ticks are stamped")
+    (
+        pool,
+        minTick,
+        maxTick,
+        _,
+        tickSpacing,
+        _,
+        closeAligniniTickRUp,
+    ) = initializedMediumPoolNoLO
+
+    version = pool.stateVersion
+    pool.mint(accounts[0], minTick, maxTick, expandTo18Decimals(1))
+    assert pool.stateVersion > version
+    assert pool.ticksLastModified[minTick] == pool.stateVersion
+    assert pool.ticksLastModified[maxTick] == pool.stateVersion
+    versionRangeMint = pool.stateVersion
+
+    tickLO = closeAligniniTickRUp + tickSpacing * 5
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[0], tickLO, expandTo18Decimals(1))
+    assert pool.stateVersion > versionRangeMint
+    assert pool.ticksLimitTokens1[tickLO].lastModified == pool.stateVersion
+    versionLimitMint = pool.stateVersion
+
+    # Partially swap the limit order - range ticks are not modified
+    swapExact0For1(pool, expandTo18Decimals(1) // 10, accounts[1], None)
+    assert pool.stateVersion > versionLimitMint
+    assert pool.ticksLimitTokens1[tickLO].lastModified == pool.stateVersion
+    assert pool.ticksLastModified[minTick] == versionRangeMint
+    versionSwap = pool.stateVersion
+
+    # Operations on other ticks don't modify the stamp
+    pool.mintLimitOrder(
+        TEST_TOKENS[0], accounts[0], tickLO + tickSpacing, expandTo18Decimals(1)
+    )
+    assert pool.ticksLimitTokens1[tickLO].lastModified == versionSwap
+
+    pool.burnLimitOrder(TEST_TOKENS[1], accounts[0], tickLO, 1)
+    assert pool.ticksLimitTokens1[tickLO].lastModified == pool.stateVersion
+
+    # Collecting doesn't modify the ticks but it modifies the pool state
+    versionBurn = pool.stateVersion
+    pool.collectLimitOrder(accounts[0], TEST_TOKENS[1], tickLO, 1, 1)
+    assert pool.stateVersion > versionBurn
+    assert pool.ticksLimitTokens1[tickLO].lastModified == versionBurn
+
+    # Stamps of cleared range ticks are dropped
+    pool.burn(accounts[0], minTick, maxTick, expandTo18Decimals(1))
+    assert not pool.ticks.__contains__(minTick)
+    assert not pool.ticksLastModified.__contains__(minTick)
+    assert not pool.ticksLastModified.__contains__(maxTick)
+
+    # Limit ticks removed when settled are no longer in their mapping
+    swapExact0For1(pool, expandTo18Decimals(10), accounts[1], None)
+    assert not pool.ticksLimitTokens1.__contains__(tickLO)
+
+
 ###### LO Testing utilities ######
 
 # Check partially swapped single limit order
@@ -4288,3 +4524,58 @@ def check_burn_limitOrderSwap_oneTick_exactIn(
 
     # No liquidity left and all tokensOwed collected - check that the position is cleared
     assertLimitPositionIsBurnt(pool.limitOrders, owner, tickLO, not zeroForOne)
+
+
+def test_limitPositionsOwed():
+    print("Read-only query of what limit positions are owed")
+    pool, _, _, _, accounts = poolRandomTests(True)
+    owners = accounts[:3]
+    for index, owner in enumerate(owners):
+        pool.mintLimitOrder(TEST_TOKENS[1], owner, -60, expandTo18Decimals(1))
+        pool.mintLimitOrder(TEST_TOKENS[1], owner, -120, expandTo18Decimals(index + 1))
+        pool.mintLimitOrder(TEST_TOKENS[0], owner, 60, expandTo18Decimals(1))
+    # Crosses tick -60 and partially swaps tick -120
+    swapExact0For1(pool, expandTo18Decimals(4), accounts[3], None)
+    # Minted on a partially swapped tick
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[4], -120, expandTo18Decimals(1))
+    swapExact0For1(pool, expandTo18Decimals(2), accounts[3], None)
+    # Burnt but not collected
+    pool.burnLimitOrder(TEST_TOKENS[0], owners[0], 60, expandTo18Decimals(1))
+
+    digest = pool.digest()
+    owed = pool.limitPositionsOwed(keys=list(pool.limitOrders))
+    assert pool.digest() == digest
+    assert list(owed) == list(pool.limitOrders)
+
+    for key, (tokensOwed0, tokensOwed1, liquidityLeft) in owed.items():
+        (owner, tick, isToken0) = pool.limitOrderOwners[key]
+        position = pool.limitOrders[key]
+        # Same as burning the whole position
+        (_, _, _, amountBurnt0, amountBurnt1) = copy.deepcopy(pool).burnLimitOrder(
+            TEST_TOKENS[0] if isToken0 else TEST_TOKENS[1],
+            owner,
+            tick,
+            position.liquidity,
+        )
+        if isToken0:
+            assert (amountBurnt0, amountBurnt1) == (
+                tokensOwed0 + liquidityLeft,
+                tokensOwed1,
+            )
+        else:
+            assert (amountBurnt0, amountBurnt1) == (
+                tokensOwed0,
+                tokensOwed1 + liquidityLeft,
+            )
+    # Fees and amounts swapped have been accrued
+    assert owed[getLimitPositionKey(owners[2], -120, False)][0] > 0
+    assert owed[getLimitPositionKey(accounts[4], -120, False)][0] > 0
+
+    # By owner
+    owedByOwner = pool.limitPositionsOwed(owners[1])
+    assert owedByOwner == {
+        key: owed[key] for key in owed if pool.limitOrderOwners[key][0] == owners[1]
+    }
+    # The positions of the crossed tick have been burnt and collected
+    assert len(owedByOwner) == 2
+    assert pool.limitPositionsOwed(accounts[5]) == dict()
@@ -0,0 +1,205 @@
+from hypothesis import given, strategies as st
+from hypothesis import settings
+import copy
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.tests.test_uniswapPool import (
+    createLedger,
+    getAccountsFromLedger,
+    ledger,
+    accounts,
+)
+from ..src.ChainflipPool import *
+
+
+def createQuotePool():
+    ledger = createLedger()
+    accounts = getAccountsFromLedger(ledger)
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    pool.initialize(encodePriceSqrt(1, 1))
+    # Range orders with liquidity changes on both sides of the current tick
+    pool.mint(accounts[0], -600, 600, expandTo18Decimals(1))
+    pool.mint(accounts[0], -6000, 1200, expandTo18Decimals(2))
+    pool.mint(
+        accounts[0],
+        getMinTick(TICK_SPACINGS[FeeAmount.MEDIUM]),
+        getMaxTick(TICK_SPACINGS[FeeAmount.MEDIUM]),
+        expandTo18Decimals(1),
+    )
+    # Limit orders on both sides of the book, some of them at range order ticks
+    for tick in [-300, -120, -60, 0, 60, 120, 300]:
+        pool.mintLimitOrder(
+            TEST_TOKENS[0], accounts[1], tick, expandTo18Decimals(1) // 3
+        )
+        pool.mintLimitOrder(
+            TEST_TOKENS[1], accounts[1], tick, expandTo18Decimals(1) // 3
+        )
+    return pool, accounts
+
+
+# Quotes should match the swap exactly or both should revert
+def checkQuoteMatchesSwap(pool, recipient, zeroForOne, amountSpecified):
+    try:
+        quote = pool.quote(zeroForOne, amountSpecified)
+    except AssertionError:
+        quote = None
+
+    poolCopy = copy.deepcopy(pool)
+    try:
+        (_, amount0, amount1, sqrtPriceX96, liquidity, tick) = poolCopy.swap(
+            recipient,
+            zeroForOne,
+            amountSpecified,
+            TickMath.MIN_SQRT_RATIO + 1 if zeroForOne else TickMath.MAX_SQRT_RATIO - 1,
+        )
+        swap = (amount0, amount1, sqrtPriceX96, liquidity, tick)
+    except AssertionError:
+        swap = None
+
+    assert quote == swap
+
+
+def test_quote_matchesSwap():
+    print("quote matches the swap result for exact input and exact output swaps")
+    pool, accounts = createQuotePool()
+    amounts = [1, 1000, 10**15, 10**17, expandTo18Decimals(1), 10**19, 10**21]
+    for zeroForOne in [True, False]:
+        for amount in amounts:
+            checkQuoteMatchesSwap(pool, accounts[2], zeroForOne, amount)
+            checkQuoteMatchesSwap(pool, accounts[2], zeroForOne, -amount)
+
+
+def test_quote_partiallySwappedTicks():
+    print("quote matches the swap after limit orders have been partially swapped")
+    pool, accounts = createQuotePool()
+    swapExact0For1(pool, expandTo18Decimals(1) // 2, accounts[0], None)
+    for zeroForOne in [True, False]:
+        for amount in [1, 10**16, expandTo18Decimals(1) // 7, 10**19]:
+            checkQuoteMatchesSwap(pool, accounts[2], zeroForOne, amount)
+            checkQuoteMatchesSwap(pool, accounts[2], zeroForOne, -amount)
+
+
+@given(
+    zeroForOne=st.booleans(),
+    amountSpecified=st.integers(min_value=-(10**21), max_value=10**21).filter(
+        lambda x: x != 0
+    ),
+)
+@settings(max_examples=50, deadline=None)
+def test_quote_matchesSwap_random(zeroForOne, amountSpecified):
+    pool, accounts = createQuotePool()
+    checkQuoteMatchesSwap(pool, accounts[2], zeroForOne, amountSpecified)
+
+
+def test_quote_cachedCurve():
+    print("liquidity curve is reused until the pool state changes")
+    pool, accounts = createQuotePool()
+    curve = pool.getLiquidityCurve(True)
+    pool.quote(True, expandTo18Decimals(1))
+    assert pool.getLiquidityCurve(True) is curve
+
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[1], 600, expandTo18Decimals(1))
+    newCurve = pool.getLiquidityCurve(True)
+    assert newCurve is not curve
+    assert newCurve.segments[0].isLimitOrder
+    assert newCurve.segments[0].tick == 600
+
+    # Quoting does not modify the pool state
+    stateVersion = pool.stateVersion
+    pool.quote(False, expandTo18Decimals(1))
+    assert pool.stateVersion == stateVersion
+
+
+def test_quoteLadder_matchesQuotes():
+    print("quote ladder matches standalone quotes in the input order")
+    pool, accounts = createQuotePool()
+    swapExact0For1(pool, expandTo18Decimals(1) // 2, accounts[0], None)
+    amounts = [
+        10**21,
+        1,
+        -(10**17),
+        expandTo18Decimals(1) // 7,
+        -1,
+        10**16,
+        -(10**21),
+        1000,
+        10**16,
+    ]
+    for zeroForOne in [True, False]:
+        ladder = pool.quoteLadder(zeroForOne, amounts)
+        assert len(ladder) == len(amounts)
+        for amount, result in zip(amounts, ladder):
+            try:
+                quote = pool.quote(zeroForOne, amount)
+            except AssertionError:
+                quote = None
+            assert result == quote
+            checkQuoteMatchesSwap(pool, accounts[2], zeroForOne, amount)
+
+
+def test_amountToReachPrice_matchesSwap():
+    print("amount to reach a price matches an unbounded swap with a price limit")
+    pool, accounts = createQuotePool()
+    for tick in [-4000, -310, -300, -61, 0, 59, 60, 700, 5000]:
+        sqrtPriceTargetX96 = TickMath.getSqrtRatioAtTick(tick)
+        if sqrtPriceTargetX96 == pool.slot0.sqrtPriceX96:
+            continue
+        zeroForOne = sqrtPriceTargetX96 < pool.slot0.sqrtPriceX96
+        stateVersion = pool.stateVersion
+        (amountIn, amountOut, limitTicksConsumed) = pool.amountToReachPrice(
+            sqrtPriceTargetX96
+        )
+        assert pool.stateVersion == stateVersion
+
+        poolCopy = copy.deepcopy(pool)
+        (_, amount0, amount1, sqrtPriceX96, _, _) = poolCopy.swap(
+            accounts[2], zeroForOne, MAX_INT128, sqrtPriceTargetX96
+        )
+        assert sqrtPriceX96 == sqrtPriceTargetX96
+        assert (amountIn, -amountOut) == (
+            (amount0, amount1) if zeroForOne else (amount1, amount0)
+        )
+        # Consumed limit ticks are burnt at the end of the swap
+        ticksLimitMap = pool.ticksLimitTokens1 if zeroForOne else pool.ticksLimitTokens0
+        ticksLimitMapCopy = (
+            poolCopy.ticksLimitTokens1 if zeroForOne else poolCopy.ticksLimitTokens0
+        )
+        assert sorted(limitTicksConsumed) == sorted(
+            set(ticksLimitMap) - set(ticksLimitMapCopy)
+        )
+
+
+def test_amountToReachPrice_currentPrice():
+    print("nothing is needed to reach the current price")
+    pool, accounts = createQuotePool()
+    assert pool.amountToReachPrice(pool.slot0.sqrtPriceX96) == (0, 0, [])
+    # Also after partially swapping a limit tick
+    swapExact0For1(pool, expandTo18Decimals(1) // 2, accounts[0], None)
+    assert pool.amountToReachPrice(pool.slot0.sqrtPriceX96) == (0, 0, [])
+
+
+def test_amountToReachPrice_outOfRange():
+    print("targets at or beyond the sqrt price bounds are rejected")
+    pool, accounts = createQuotePool()
+    for sqrtPriceTargetX96 in [
+        TickMath.MIN_SQRT_RATIO - 1,
+        TickMath.MIN_SQRT_RATIO,
+        TickMath.MAX_SQRT_RATIO,
+        TickMath.MAX_SQRT_RATIO + 1,
+    ]:
+        tryExceptHandler(
+            pool.amountToReachPrice, "Target price out of range", sqrtPriceTargetX96
+        )
+    # The bounds used as swap price limits are valid targets
+    for sqrtPriceTargetX96 in [
+        TickMath.MIN_SQRT_RATIO + 1,
+        TickMath.MAX_SQRT_RATIO - 1,
+    ]:
+        (amountIn, amountOut, _) = pool.amountToReachPrice(sqrtPriceTargetX96)
+        assert amountIn > 0 and amountOut > 0
@@ -0,0 +1,81 @@
+import copy
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.src.libraries import FullMath
+from ..src.ChainflipPool import *
+from ..src.libraries.CostMeter import *
+from .test_chainflipQuotes import createQuotePool
+
+
+def test_costMeter_deterministic():
+    print("metering counts the same operations every time and doesn't change the call")
+    pool, accounts = createQuotePool()
+    (poolCopy, poolUnmetered) = (copy.deepcopy(pool), copy.deepcopy(pool))
+    swapArgs = (accounts[0], True, expandTo18Decimals(3), TickMath.MIN_SQRT_RATIO + 1)
+
+    (result, counts) = pool.meteredCall("swap", *swapArgs)
+    assert (result, counts) == poolCopy.meteredCall("swap", *swapArgs)
+    assert result == poolUnmetered.swap(*swapArgs)
+    assert pool.stateHash() == poolUnmetered.stateHash()
+
+    assert list(counts) == COUNTERS
+    assert all(counts[counter] > 0 for counter in COUNTERS)
+    # Token1 limit orders crossed at 7 ticks, a single position each
+    assert counts["settlementIterations"] == 7
+
+    # Detached: plain tick maps and the original math
+    assert type(pool.ticks) == dict and type(pool.ticksLimitTokens0) == dict
+    assert pool.costMeter == None
+    assert FullMath.mulDiv(2, 3, 4) == 1 and FullMath.mulDiv.__name__ == "mulDiv"
+    assert "transferToken" not in vars(pool.ledger)
+
+
+def test_costMeter_growth():
+    print("the counts grow with the positions settled")
+    pool, accounts = createQuotePool()
+    poolMorePositions = copy.deepcopy(pool)
+    for tick in [-300, -120, -60, 0, 60, 120, 300]:
+        poolMorePositions.mintLimitOrder(
+            TEST_TOKENS[1], accounts[2], tick, expandTo18Decimals(1) // 3
+        )
+    swapArgs = (accounts[0], True, expandTo18Decimals(10), TickMath.MIN_SQRT_RATIO + 1)
+
+    (_, counts) = pool.meteredCall("swap", *swapArgs)
+    (_, countsMorePositions) = poolMorePositions.meteredCall("swap", *swapArgs)
+    assert countsMorePositions["settlementIterations"] == 14
+    for counter in ["mulDiv", "decimalOperations", "ledgerTransfers"]:
+        assert countsMorePositions[counter] > counts[counter]
+
+    # Limit order calls are metered the same way
+    (_, counts) = pool.meteredCall(
+        "mintLimitOrder", TEST_TOKENS[0], accounts[2], 600, expandTo18Decimals(1)
+    )
+    assert counts["ledgerTransfers"] == 1 and counts["settlementIterations"] == 0
+    (_, counts) = pool.meteredCall(
+        "burnLimitOrder", TEST_TOKENS[0], accounts[2], 600, expandTo18Decimals(1)
+    )
+    assert counts["ledgerTransfers"] == 1 and counts["tickWrites"] > 0
+
+
+def test_costMeter_revert():
+    print("a meter attached to the pool also counts the calls that revert")
+    pool, accounts = createQuotePool()
+    meter = CostMeter()
+    with meter.attach(pool):
+        try:
+            pool.burnLimitOrder(TEST_TOKENS[0], accounts[1], 0, 2**128 - 1)
+            reverted = False
+        except AssertionError:
+            reverted = True
+        assert reverted
+        # Only one meter at a time
+        try:
+            with CostMeter().attach(pool):
+                pass
+            nested = True
+        except AssertionError as msg:
+            nested = False
+            assert str(msg) == "Cost meter already attached"
+        assert not nested
+    assert meter.counts["tickLookups"] > 0
+    assert type(pool.ticksLimitTokens0) == dict and pool.costMeter == None
@@ -0,0 +1,39 @@
+from ..src.DifferentialFuzz import *
+
+
+# ChainflipPool with a bug in the fee growth of exact output swaps
+class FeeGrowthBugPool(ChainflipPool):
+    def swap(self, recipient, zeroForOne, amountSpecified, sqrtPriceLimitX96):
+        result = super().swap(recipient, zeroForOne, amountSpecified, sqrtPriceLimitX96)
+        if zeroForOne and amountSpecified < 0:
+            self.feeGrowthGlobal0X128 += 1
+        return result
+
+
+def test_fuzz_matchesReference(tmp_path):
+    print("ChainflipPool matches UniswapPool when limit orders are never better")
+    stats = runFuzz(1, 50, 2, str(tmp_path))
+    assert stats["cases"] == 100
+    assert stats["failures"] == []
+    # The workers share the corpus
+    assert stats["corpus"] > 0
+    assert len(os.listdir(tmp_path / "queue")) == stats["corpus"]
+
+
+def test_fuzz_shrinksFailures(tmp_path):
+    print("failing cases are shrunk and saved")
+    stats = fuzzWorker(0, 200, str(tmp_path), poolClass=FeeGrowthBugPool)
+    assert len(stats["failures"]) > 0
+
+    (case, mismatch, _) = loadCase(stats["failures"][0])
+    assert mismatch["field"] == "feeGrowthGlobal0X128"
+    assert mismatch["operation"] == "swap"
+    # A single exact output swap is enough, the amounts are simplified to their leading digit
+    assert len(case["operations"]) <= 2
+    (_, (_, zeroForOne, amount, _)) = case["operations"][mismatch["index"]]
+    assert zeroForOne and amount < 0
+    assert str(abs(amount)).strip("0") == str(abs(amount))[0]
+
+    # Saved cases replay
+    assert runCase(case, FeeGrowthBugPool)[0] == mismatch
+    assert runCase(case)[0] == None
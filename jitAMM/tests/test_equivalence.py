@@ -0,0 +1,52 @@
+import pytest
+
+from ..src.Equivalence import *
+
+
+# ChainflipPool with a bug in the fee growth of the limit ticks swapped
+class LimitFeeBugPool(ChainflipPool):
+    def _updateBestLimitTick(self, isToken0, tick):
+        ticksLimitMap = self.ticksLimitTokens0 if isToken0 else self.ticksLimitTokens1
+        if tick in ticksLimitMap and ticksLimitMap[tick].oneMinusPercSwap < 1:
+            ticksLimitMap[tick].feeGrowthInsideX128 += 1
+        return super()._updateBestLimitTick(isToken0, tick)
+
+
+def test_equivalence_currentPool():
+    print("the current pool matches the frozen reference")
+    for seed in range(3):
+        assertEquivalent(seed, 300)
+
+
+def test_equivalence_detectsDivergence():
+    print("a divergence in the limit order book is reported")
+    mismatch = None
+    for seed in range(10):
+        mismatch = checkStream(seed, 300, LimitFeeBugPool)
+        if mismatch != None:
+            break
+    assert mismatch != None
+    assert mismatch["operation"] == "swap"
+    # The swap returns the same amounts, only the state differs
+    assert mismatch["field"] != repr("outcome")
+
+    with pytest.raises(AssertionError):
+        assertEquivalent(mismatch["seed"], 300, LimitFeeBugPool)
+
+
+def test_equivalence_soak():
+    print("soak runs streams until the deadline")
+    stats = soak(1, 0, 50, 2)
+    assert stats["streams"] >= 2
+    assert stats["operations"] == 50 * stats["streams"]
+    assert stats["mismatches"] == []
+
+
+def test_equivalence_referenceIsolated():
+    print("the reference doesn't import jitAMM/src, only its own frozen modules")
+    directory = os.path.join(os.path.dirname(__file__), "..", "reference")
+    for name in os.listdir(directory):
+        if name.endswith(".py"):
+            with open(os.path.join(directory, name)) as file:
+                for line in file:
+                    assert not line.startswith(("from ..", "import jitAMM")), line
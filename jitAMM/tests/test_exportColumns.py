@@ -0,0 +1,88 @@
+import numpy as np
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.tests.test_uniswapPool import createLedger
+from ..src.ChainflipPool import *
+from .test_limitValuation import createValuationPool
+
+
+# Rows of every table read from the pool's dataclasses
+def getExpectedRows(pool):
+    return {
+        "ticks": [
+            (tick, *dataclasses.astuple(info)) for tick, info in pool.ticks.items()
+        ],
+        "positions": [
+            (owner, tickLower, tickUpper, *dataclasses.astuple(pool.positions[key]))
+            for key, (owner, tickLower, tickUpper) in pool.positionOwners.items()
+        ],
+        "limitTicks0": [
+            (tick, *dataclasses.astuple(info)[:3], info.lastModified)
+            for tick, info in pool.ticksLimitTokens0.items()
+        ],
+        "limitTicks1": [
+            (tick, *dataclasses.astuple(info)[:3], info.lastModified)
+            for tick, info in pool.ticksLimitTokens1.items()
+        ],
+        "limitOrders": [
+            (
+                key,
+                *pool.limitOrderOwners[key],
+                position.liquidity,
+                position.oneMinusPercSwapMint,
+                position.feeGrowthInsideLastX128,
+                position.tokensOwed0,
+                position.tokensOwed1,
+            )
+            for key, position in pool.limitOrders.items()
+        ],
+    }
+
+
+def getRows(columns, table):
+    return list(zip(*[columns[column].tolist() for column, _ in EXPORT_COLUMNS[table]]))
+
+
+def test_exportColumns_matchesPool():
+    print("the exported columns hold the pool state")
+    pool, _ = createValuationPool()
+    exported = pool.exportColumns()
+    expected = getExpectedRows(pool)
+    assert list(exported) == list(EXPORT_COLUMNS)
+
+    for table, columns in EXPORT_COLUMNS.items():
+        assert getRows(exported[table], table) == expected[table]
+        assert len(expected[table]) > 0
+        for column, dtype in columns:
+            assert exported[table][column].dtype == np.dtype(dtype)
+
+    # Subset of the tables
+    assert list(pool.exportColumns(["limitTicks1"])) == ["limitTicks1"]
+
+
+def test_exportColumns_chunks():
+    print("the streaming export yields bounded chunks of the same rows")
+    pool, _ = createValuationPool()
+    exported = pool.exportColumns()
+    for table in EXPORT_COLUMNS:
+        chunks = list(pool.exportColumnChunks(table, 4))
+        assert all(0 < len(next(iter(chunk.values()))) <= 4 for chunk in chunks)
+        rows = [row for chunk in chunks for row in getRows(chunk, table)]
+        assert rows == getRows(exported[table], table)
+
+
+def test_exportColumns_emptyPool():
+    print("tables without rows have empty columns")
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        createLedger(),
+    )
+    exported = pool.exportColumns()
+    for table, columns in EXPORT_COLUMNS.items():
+        for column, dtype in columns:
+            assert exported[table][column].shape == (0,)
+            assert exported[table][column].dtype == np.dtype(dtype)
+        assert list(pool.exportColumnChunks(table, 10)) == []
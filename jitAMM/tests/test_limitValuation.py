@@ -0,0 +1,132 @@
+import math
+
+from uniswapV3Python.tests.utilities import *
+from ..src.ChainflipPool import *
+from ..src.LimitValuation import exportLimitOrders, valueLimitOrders
+from .test_chainflipQuotes import createQuotePool
+
+
+def createValuationPool():
+    pool, accounts = createQuotePool()
+    for index, account in enumerate(accounts[2:5]):
+        for tick in [-120, -60, 60, 120]:
+            for token in TEST_TOKENS:
+                pool.mintLimitOrder(token, account, tick, 10**17 * (index + 1) + 7)
+    # Partially swap ticks on both sides, with positions minted in between
+    swapExact0For1(pool, expandTo18Decimals(1), accounts[5], None)
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[0], -120, 12345678901234567)
+    swapExact1For0(pool, expandTo18Decimals(2), accounts[5], None)
+    pool.mintLimitOrder(TEST_TOKENS[0], accounts[0], 120, 98765432109876543)
+    swapExact0For1(pool, expandTo18Decimals(1), accounts[5], None)
+    # Tokens owed waiting to be collected
+    pool.burnLimitOrder(TEST_TOKENS[1], accounts[2], -120, 10**16)
+    return pool, accounts
+
+
+def test_limitValuation_export():
+    print("the export has one row per limit position")
+    pool, _ = createValuationPool()
+    columns = exportLimitOrders(pool)
+    assert len(columns["key"]) == len(pool.limitOrders)
+    for index, key in enumerate(columns["key"]):
+        position = pool.limitOrders[key]
+        (owner, tick, isToken0) = pool.limitOrderOwners[key]
+        assert (
+            columns["owner"][index],
+            columns["tick"][index],
+            columns["isToken0"][index],
+        ) == (owner, tick, isToken0)
+        assert (
+            columns["liquidity"][index],
+            columns["oneMinusPercSwapMint"][index],
+            columns["feeGrowthInsideLastX128"][index],
+            columns["tokensOwed0"][index],
+            columns["tokensOwed1"][index],
+        ) == (
+            position.liquidity,
+            position.oneMinusPercSwapMint,
+            position.feeGrowthInsideLastX128,
+            position.tokensOwed0,
+            position.tokensOwed1,
+        )
+
+
+def test_limitValuation_matchesScalar():
+    print("the vectorized valuation matches the scalar path within its rounding")
+    pool, _ = createValuationPool()
+    columns = exportLimitOrders(pool)
+    valuation = valueLimitOrders(pool, columns)
+    owed = pool.limitPositionsOwed(keys=list(columns["key"]))
+
+    partiallySwapped = 0
+    for index, key in enumerate(columns["key"]):
+        (tokensOwed0, tokensOwed1, liquidityLeft) = owed[key]
+        isToken0 = columns["isToken0"][index]
+        priceX96 = LimitOrderTickMath.getPriceAtTick(int(columns["tick"][index]))
+        # Units of the other token the conversion of one unit of the position's token can be off by
+        tolerance = (
+            math.ceil(priceX96 / FixedPoint96_Q96)
+            if isToken0
+            else math.ceil(FixedPoint96_Q96 / priceX96)
+        )
+
+        assert liquidityLeft - 1 <= valuation["liquidityLeft"][index] <= liquidityLeft
+        (owedSwapped, vectorizedSwapped) = (
+            (tokensOwed1, valuation["tokensOwed1"][index])
+            if isToken0
+            else (tokensOwed0, valuation["tokensOwed0"][index])
+        )
+        assert owedSwapped - tolerance <= vectorizedSwapped <= owedSwapped
+        # The tokens owed in the position's token are exact
+        if isToken0:
+            assert valuation["tokensOwed0"][index] == tokensOwed0
+        else:
+            assert valuation["tokensOwed1"][index] == tokensOwed1
+
+        assert valuation["amount0"][index] == valuation["tokensOwed0"][index] + (
+            valuation["liquidityLeft"][index] if isToken0 else 0
+        )
+        assert valuation["amount1"][index] == valuation["tokensOwed1"][index] + (
+            0 if isToken0 else valuation["liquidityLeft"][index]
+        )
+        if 0 < valuation["amountSwapped"][index] < columns["liquidity"][index]:
+            partiallySwapped += 1
+    assert partiallySwapped > 0
+
+    # Values at the current price
+    priceX192 = pool.slot0.sqrtPriceX96**2
+    index = 0
+    assert valuation["value1"][index] == valuation["amount1"][index] + (
+        valuation["amount0"][index] * priceX192 >> 192
+    )
+    assert valuation["value0"][index] == valuation["amount0"][index] + (
+        (valuation["amount1"][index] << 192) // priceX192
+    )
+
+    # Nothing swapped nor accrued, the valuation is exact
+    pool, accounts = createQuotePool()
+    valuation = valueLimitOrders(pool)
+    owed = pool.limitPositionsOwed(accounts[1])
+    assert [
+        tuple(values)
+        for values in zip(
+            valuation["tokensOwed0"],
+            valuation["tokensOwed1"],
+            valuation["liquidityLeft"],
+        )
+    ] == list(owed.values())
+
+
+def test_limitValuation_emptyPool():
+    print("a pool without limit positions has empty columns")
+    pool, _ = createQuotePool()
+    for key in list(pool.limitOrderOwners):
+        (owner, tick, isToken0) = pool.limitOrderOwners[key]
+        pool.burnLimitOrder(
+            TEST_TOKENS[0] if isToken0 else TEST_TOKENS[1],
+            owner,
+            tick,
+            pool.limitOrders[key].liquidity,
+        )
+    valuation = valueLimitOrders(pool)
+    assert all(len(values) == 0 for values in valuation.values())
@@ -0,0 +1,115 @@
+import io
+import itertools
+
+from ..src.OrderFlow import *
+from ..src.PoolReplay import replay
+from ..src.Backtest import validatePool
+
+
+def test_orderFlow_deterministic():
+    print("the same seed generates the same flow")
+    operations = list(generateOperations(1, count=500))
+    assert len(operations) == 501
+    assert operations == list(generateOperations(1, count=500))
+    assert operations != list(generateOperations(2, count=500))
+    assert operations[0][0] == "initialize"
+
+    names = {name for name, _ in operations}
+    for name in [
+        "mint",
+        "burn",
+        "collect",
+        "mintLimitOrder",
+        "burnLimitOrder",
+        "collectLimitOrder",
+        "swap",
+    ]:
+        assert name in names
+    swaps = [args for name, args in operations if name == "swap"]
+    # Both directions, exact input and exact output
+    assert {(zeroForOne, amount > 0) for _, zeroForOne, amount, _ in swaps} == {
+        (True, True),
+        (True, False),
+        (False, True),
+        (False, False),
+    }
+
+
+def test_orderFlow_config():
+    config = OrderFlowConfig(
+        weights=dict(limitLadder=1, swap=1),
+        swapAmounts=(10, 100),
+        ladderSizes=(3, 3),
+        maxOpenPositions=30,
+    )
+    # Unbounded flows are lazy
+    operations = list(itertools.islice(generateOperations(7, config), 2000))
+    assert {name for name, _ in operations[1:]} == {
+        "mintLimitOrder",
+        "burnLimitOrder",
+        "swap",
+    }
+    assert all(10 <= abs(args[2]) <= 100 for name, args in operations if name == "swap")
+    assert all(
+        args[2] % config.tickSpacing == 0
+        for name, args in operations
+        if name == "mintLimitOrder"
+    )
+
+
+def test_orderFlow_journal():
+    print("a flow written to a journal replays to the same pool")
+    config = OrderFlowConfig(tickSpacing=10, fee=500)
+    pool = createPool(config)
+    (applied, reverted) = applyOperations(
+        pool, generateOperations(3, config, count=1000)
+    )
+    assert applied == 1001
+    validatePool(pool)
+
+    journal = io.BytesIO()
+    assert writeJournal(journal, generateOperations(3, config, count=1000), config) == (
+        applied,
+        reverted,
+    )
+    journal.seek(0)
+    (replayedPool, operations) = replay(journal, atomic=True)
+    assert operations == applied
+    assert replayedPool.stateHash() == pool.stateHash()
+
+
+def test_orderFlow_atomic():
+    print("operations that revert leave the pool unchanged")
+    pool = createPool()
+
+    # Accounts are created on first use, so accounts created by a call that reverts are still there
+    def balances():
+        return {
+            (address, token): balance
+            for address, account in pool.ledger.accounts.items()
+            for token, balance in account.balances.items()
+            if balance != 0
+        }
+
+    reverted = 0
+    for name, args in generateOperations(1, count=3000):
+        (stateHash, balancesBefore) = (pool.stateHash(), balances())
+        try:
+            pool.atomicCall(name, *args)
+        except Exception:
+            reverted += 1
+            assert pool.stateHash() == stateHash
+            assert balances() == balancesBefore
+    assert 0 < reverted < 3000 // 10
+    validatePool(pool)
+
+
+def test_orderFlow_collects():
+    print("generated collects of open positions succeed")
+    # Without swaps no limit order is settled, so every position generated is still open
+    config = OrderFlowConfig(weights=dict(mint=1, limitLadder=1, collect=2))
+    operations = list(generateOperations(4, config, count=500))
+    names = [name for name, _ in operations]
+    assert "collect" in names and "collectLimitOrder" in names
+    pool = createPool(config)
+    assert applyOperations(pool, operations) == (501, 0)
@@ -0,0 +1,86 @@
+import copy
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.tests.test_uniswapPool import (
+    createLedger,
+    getAccountsFromLedger,
+    ledger,
+    accounts,
+)
+from ..src.ChainflipPool import *
+from ..src.PoolDiff import diffPools, PoolDifference
+from .test_poolJournal import runOperations
+
+
+def createDiffPool(ledger, accounts):
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    runOperations(pool, accounts)
+    return pool
+
+
+def test_diffPools_equal(ledger, accounts):
+    pool = createDiffPool(ledger, accounts)
+    assert diffPools(pool, copy.deepcopy(pool)) == []
+
+
+def test_diffPools_books(ledger, accounts):
+    print("differences in the books are reported per entry")
+    pool = createDiffPool(ledger, accounts)
+    replica = copy.deepcopy(pool)
+    replica.mintLimitOrder(TEST_TOKENS[0], accounts[2], 12000, 1000)
+    # Out of range, the pool price is above tick 600
+    replica.mint(accounts[0], -600, 600, 1000)
+
+    differences = diffPools(pool, replica)
+    assert [(difference.kind, difference.key) for difference in differences] == [
+        ("balances", TEST_TOKENS[0]),
+        ("balances", TEST_TOKENS[1]),
+        ("tick", -600),
+        ("tick", 600),
+        ("position", (-600, 600, accounts[0])),
+        ("limitTick", (12000, True)),
+        ("limitOrder", (12000, True, accounts[2])),
+    ]
+    assert differences[0] == PoolDifference(
+        "balances",
+        TEST_TOKENS[0],
+        pool.balances[TEST_TOKENS[0]],
+        replica.balances[TEST_TOKENS[0]],
+    )
+    limitTick = differences[-2]
+    assert limitTick.a == None
+    assert limitTick.b == replica.ticksLimitTokens0[12000]
+
+    # Swapping moves the price and accrues fees
+    swapExact0For1(replica, expandTo18Decimals(1) // 10, accounts[4], None)
+    differences = diffPools(pool, replica)
+    assert (
+        PoolDifference(
+            "slot0",
+            "sqrtPriceX96",
+            pool.slot0.sqrtPriceX96,
+            replica.slot0.sqrtPriceX96,
+        )
+        in differences
+    )
+    assert "feeGrowthGlobal0X128" in [difference.key for difference in differences]
+
+
+def test_diffPools_snapshots(ledger, accounts, tmp_path):
+    print("snapshots can be diffed too")
+    pool = createDiffPool(ledger, accounts)
+    replica = copy.deepcopy(pool)
+    swapExact1For0(replica, expandTo18Decimals(1), accounts[4], None)
+
+    pool.save(tmp_path / "a.snapshot")
+    replica.save(tmp_path / "b.snapshot")
+    assert diffPools(tmp_path / "a.snapshot", tmp_path / "b.snapshot") == diffPools(
+        pool, replica
+    )
+    assert diffPools(tmp_path / "a.snapshot", pool) == []
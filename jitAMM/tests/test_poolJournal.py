@@ -0,0 +1,197 @@
+import copy
+import io
+import math
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.tests.test_uniswapPool import (
+    createLedger,
+    getAccountsFromLedger,
+    ledger,
+    accounts,
+)
+from ..src.ChainflipPool import *
+from ..src.PoolReplay import replay
+from ..src.libraries import PoolJournal
+
+
+def createJournaledPool(ledger, journalFile):
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    pool.startJournal(PoolJournal.JournalWriter(journalFile))
+    return pool
+
+
+def runOperations(pool, accounts):
+    pool.initialize(encodePriceSqrt(1, 1))
+    pool.setFeeProtocol(6, 6)
+    pool.mint(accounts[0], -600, 600, expandTo18Decimals(1))
+    pool.mint(
+        accounts[1],
+        getMinTick(TICK_SPACINGS[FeeAmount.MEDIUM]),
+        getMaxTick(TICK_SPACINGS[FeeAmount.MEDIUM]),
+        expandTo18Decimals(1),
+    )
+    for tick in [-120, -60, 60, 120]:
+        pool.mintLimitOrder(TEST_TOKENS[0], accounts[2], tick, expandTo18Decimals(1))
+        pool.mintLimitOrder(TEST_TOKENS[1], accounts[3], tick, expandTo18Decimals(1))
+    # Cross some limit orders and partially swap others
+    swapExact0For1(pool, expandTo18Decimals(2), accounts[4], None)
+    swapExact1For0(pool, expandTo18Decimals(1), accounts[4], None)
+    swapToHigherPrice(pool, accounts[5], encodePriceSqrt(11, 10))
+    # Reverted call - burning more than the position
+    try:
+        pool.burn(accounts[0], -600, 600, expandTo18Decimals(2))
+    except AssertionError:
+        pass
+    pool.burn(accounts[0], -600, 600, expandTo18Decimals(1) // 2)
+    pool.collect(accounts[0], -600, 600, MAX_UINT128, MAX_UINT128)
+    pool.burnLimitOrder(TEST_TOKENS[1], accounts[3], -120, expandTo18Decimals(1) // 3)
+    pool.collectLimitOrder(accounts[3], TEST_TOKENS[1], -120, MAX_UINT128, MAX_UINT128)
+    # Keyword arguments
+    pool.collectProtocol(
+        accounts[5], amount0Requested=MAX_UINT128, amount1Requested=MAX_UINT128
+    )
+
+
+# Swaps a heavily swapped limit tick below EPOCH_THRESHOLD, which rolls it into a new epoch with
+# ChainflipPool.precisionEpochs set
+def runEpochSwaps(pool, accounts):
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[0], 0, 10**30)
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[2], 0, 3 * 10**27 + 7)
+    for i in range(45):
+        info = pool.ticksLimitTokens1[0]
+        liquidityLeft = math.floor(info.liquidityGross * info.oneMinusPercSwap)
+        swapExact0For1(pool, liquidityLeft * 3 // 4, accounts[1], None)
+
+
+def test_journal_replay(ledger, accounts):
+    print("replaying the journal rebuilds the same pool state")
+    journalFile = io.BytesIO()
+    pool = createJournaledPool(ledger, journalFile)
+    runOperations(pool, accounts)
+
+    (replayedPool, operations) = replay(io.BytesIO(journalFile.getvalue()))
+
+    assert replayedPool.stateHash() == pool.stateHash()
+    assert replayedPool.stateVersion == pool.stateVersion
+
+    # Copies of the pool are not journaled
+    assert copy.deepcopy(pool).journal == None
+    # Nested calls (e.g. burning crossed limit orders) are not journaled
+    assert operations == 21
+
+
+def test_journal_truncated(ledger, accounts):
+    print("a truncated record at the end of the journal is ignored")
+    journalFile = io.BytesIO()
+    pool = createJournaledPool(ledger, journalFile)
+    pool.initialize(encodePriceSqrt(1, 1))
+    pool.mint(accounts[0], -600, 600, expandTo18Decimals(1))
+    stateHash = pool.stateHash()
+    pool.mint(accounts[0], -600, 600, expandTo18Decimals(1))
+
+    data = journalFile.getvalue()
+    for cut in [1, 3, 10]:
+        (replayedPool, operations) = replay(io.BytesIO(data[:-cut]))
+        assert operations == 2
+        assert replayedPool.stateHash() == stateHash
+
+
+def test_journal_startedOnModifiedPool(ledger, accounts):
+    print("journal can't be started on a pool that has been modified")
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    pool.initialize(encodePriceSqrt(1, 1))
+    tryExceptHandler(
+        pool.startJournal,
+        "Pool already modified",
+        PoolJournal.JournalWriter(io.BytesIO()),
+    )
+
+
+def test_stateHash(ledger, accounts):
+    print("state hash only depends on the pool state")
+    poolA = createJournaledPool(ledger, io.BytesIO())
+    poolB = createJournaledPool(ledger, io.BytesIO())
+    for pool in [poolA, poolB]:
+        pool.initialize(encodePriceSqrt(1, 1))
+        pool.mintLimitOrder(TEST_TOKENS[0], accounts[0], 60, expandTo18Decimals(1))
+    assert poolA.stateHash() == poolB.stateHash()
+
+    # Minting and burning leaves the same state but a different state version
+    poolB.mintLimitOrder(TEST_TOKENS[1], accounts[0], 60, expandTo18Decimals(1))
+    assert poolA.stateHash() != poolB.stateHash()
+    poolB.burnLimitOrder(TEST_TOKENS[1], accounts[0], 60, expandTo18Decimals(1))
+    assert poolA.stateVersion != poolB.stateVersion
+    assert poolA.stateHash() == poolB.stateHash()
+
+
+def test_journal_ledgerRejected():
+    print("calls reverted by the live ledger are replayed up to the rejected transfer")
+    for atomic in [False, True]:
+        ledger = createLedger()
+        accounts = getAccountsFromLedger(ledger)
+        journalFile = io.BytesIO()
+        pool = createJournaledPool(ledger, journalFile)
+        runOperations(pool, accounts)
+        for token in TEST_TOKENS[:2]:
+            ledger.setBalance(accounts[5], token, 0)
+
+        # Rejected before any transfer, and after the swap output has been sent.
+        # Called on the pool itself since tryExceptHandler calls a copy.
+        balances = dict(pool.balances)
+        for name, args in [
+            (
+                "mintLimitOrder",
+                (TEST_TOKENS[1], accounts[5], -60, expandTo18Decimals(1)),
+            ),
+            ("swap", (accounts[5], True, expandTo18Decimals(1), MIN_SQRT_RATIO + 1)),
+        ]:
+            try:
+                if atomic:
+                    pool.atomicCall(name, *args)
+                else:
+                    getattr(pool, name)(*args)
+                assert False, "Call should revert"
+            except AssertionError as error:
+                assert str(error) == "Insufficient balance"
+        if atomic:
+            assert pool.balances == balances
+        else:
+            assert pool.balances[TEST_TOKENS[1]] < balances[TEST_TOKENS[1]]
+
+        records = list(PoolJournal.readRecords(io.BytesIO(journalFile.getvalue())))
+        assert [record[2:] for record in records[-2:]] == [(True, 0), (True, 1)]
+
+        (replayedPool, _) = replay(io.BytesIO(journalFile.getvalue()), atomic)
+        assert replayedPool.stateHash() == pool.stateHash()
+
+
+def test_journal_precisionEpochs(ledger, accounts):
+    print("the precisionEpochs setting is journaled and restored on replay")
+    journalFile = io.BytesIO()
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    pool.precisionEpochs = True
+    pool.startJournal(PoolJournal.JournalWriter(journalFile))
+    runOperations(pool, accounts)
+    runEpochSwaps(pool, accounts)
+
+    (replayedPool, _) = replay(io.BytesIO(journalFile.getvalue()))
+    assert replayedPool.precisionEpochs
+    assert replayedPool.stateHash() == pool.stateHash()
@@ -0,0 +1,213 @@
+import io
+import os
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.tests.test_uniswapPool import (
+    createLedger,
+    getAccountsFromLedger,
+    ledger,
+    accounts,
+)
+from ..src.ChainflipPool import *
+from ..src.libraries import PoolSnapshot
+from .test_poolJournal import runOperations, runEpochSwaps
+
+
+def test_snapshot_saveLoad(ledger, accounts, tmp_path):
+    print("loading a saved snapshot rebuilds the same pool state")
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    runOperations(pool, accounts)
+
+    path = tmp_path / "pool.snapshot"
+    pool.save(path)
+    loadedPool = ChainflipPool.load(path, ledger)
+
+    assert loadedPool.stateHash() == pool.stateHash()
+    assert loadedPool.stateVersion == pool.stateVersion
+    assert loadedPool.topOfBook() == pool.topOfBook()
+    # Decimals are stored exactly
+    for tick, info in pool.ticksLimitTokens0.items():
+        assert str(loadedPool.ticksLimitTokens0[tick].oneMinusPercSwap) == str(
+            info.oneMinusPercSwap
+        )
+    for key, position in pool.limitOrders.items():
+        assert str(loadedPool.limitOrders[key].oneMinusPercSwapMint) == str(
+            position.oneMinusPercSwapMint
+        )
+
+    # The loaded pool keeps working as the original one
+    for p in [pool, loadedPool]:
+        swapExact0For1(p, expandTo18Decimals(1), accounts[4], None)
+        p.mintLimitOrder(TEST_TOKENS[1], accounts[3], -60, expandTo18Decimals(1))
+        p.burn(accounts[1], getMinTick(60), getMaxTick(60), expandTo18Decimals(1))
+        swapExact1For0(p, expandTo18Decimals(3), accounts[4], None)
+    assert loadedPool.stateHash() == pool.stateHash()
+
+
+def test_snapshot_layout(ledger, accounts):
+    print("snapshot sections can be located from the header")
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    runOperations(pool, accounts)
+    file = io.BytesIO()
+    PoolSnapshot.write(file, pool)
+    data = file.getvalue()
+
+    (counts, strings, offset) = PoolSnapshot.readHeader(data)
+    offsets = PoolSnapshot.sectionOffsets(counts, offset)
+    assert offsets[-1] == len(data)
+    assert strings[:2] == [TEST_TOKENS[0], TEST_TOKENS[1]]
+    assert counts[2:5] == [
+        len(pool.ticks),
+        len(pool.positionOwners),
+        len(pool.ticksLimitTokens0),
+    ]
+    # Range ticks are sorted
+    ticks = [
+        record[0]
+        for record in PoolSnapshot.RANGE_TICK.iter_unpack(data[offsets[0] : offsets[1]])
+    ]
+    assert ticks == sorted(pool.ticks)
+
+    # Truncated snapshot
+    tryExceptHandler(PoolSnapshot.read, "Corrupted snapshot", io.BytesIO(data[:-1]))
+
+
+def test_snapshot_deltas(ledger, accounts, tmp_path):
+    print("a snapshot plus its chain of deltas rebuilds the live pool")
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    tryExceptHandler(pool.saveDelta, "No base snapshot", tmp_path / "delta")
+    runOperations(pool, accounts)
+    # Changes are not tracked until there is a base snapshot
+    assert len(pool.deltaEntries) == 0
+    pool.save(tmp_path / "base")
+
+    deltaPaths = []
+
+    def saveDelta():
+        deltaPaths.append(tmp_path / ("delta" + str(len(deltaPaths))))
+        pool.saveDelta(deltaPaths[-1])
+        loadedPool = ChainflipPool.load(tmp_path / "base", ledger, deltaPaths)
+        assert loadedPool.stateHash() == pool.stateHash()
+        assert loadedPool.stateVersion == pool.stateVersion
+
+    # Partially swapped and crossed limit orders, which are removed
+    swapExact0For1(pool, expandTo18Decimals(1), accounts[4], None)
+    saveDelta()
+    # New range ticks and limit orders
+    pool.mint(accounts[2], -1200, 1200, expandTo18Decimals(1))
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[3], -1200, expandTo18Decimals(1))
+    saveDelta()
+    # Removed range ticks
+    pool.burn(accounts[2], -1200, 1200, expandTo18Decimals(1))
+    pool.collect(accounts[2], -1200, 1200, MAX_UINT128, MAX_UINT128)
+    saveDelta()
+    # Nothing changed
+    saveDelta()
+
+    # Deltas only contain the changes
+    assert os.path.getsize(deltaPaths[-1]) < os.path.getsize(tmp_path / "base") / 2
+
+    # Deltas must be applied on their base, in order
+    tryExceptHandler(
+        ChainflipPool.load,
+        "Delta base mismatch",
+        tmp_path / "base",
+        ledger,
+        deltaPaths[1:],
+    )
+
+    # Compacting the chain into a new base
+    ChainflipPool.compact(tmp_path / "base", deltaPaths, tmp_path / "base")
+    assert ChainflipPool.load(tmp_path / "base", ledger).stateHash() == pool.stateHash()
+    deltaPaths = []
+    swapExact1For0(pool, expandTo18Decimals(2), accounts[4], None)
+    saveDelta()
+
+
+def test_snapshot_deltaTransientEntries(ledger, accounts, tmp_path):
+    print("entries created and removed within a delta interval are not in the base")
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    runOperations(pool, accounts)
+    pool.save(tmp_path / "base")
+
+    pool.mintLimitOrder(TEST_TOKENS[1], accounts[3], 120, expandTo18Decimals(1))
+    pool.burnLimitOrder(TEST_TOKENS[1], accounts[3], 120, expandTo18Decimals(1))
+    assert not pool.ticksLimitTokens1.__contains__(120)
+    pool.mint(accounts[2], -1200, 1200, expandTo18Decimals(1))
+    pool.burn(accounts[2], -1200, 1200, expandTo18Decimals(1))
+    pool.collect(accounts[2], -1200, 1200, MAX_UINT128, MAX_UINT128)
+    pool.saveDelta(tmp_path / "delta0")
+    loadedPool = ChainflipPool.load(tmp_path / "base", ledger, [tmp_path / "delta0"])
+    assert loadedPool.stateHash() == pool.stateHash()
+
+    # Burning a position that doesn't exist reverts, and the entries it created are rolled back
+    tryExceptHandler(
+        pool.atomicCall,
+        "Position doesn't exist",
+        "burnLimitOrder",
+        TEST_TOKENS[1],
+        accounts[5],
+        -2400,
+        1,
+    )
+    pool.saveDelta(tmp_path / "delta1")
+    loadedPool = ChainflipPool.load(
+        tmp_path / "base", ledger, [tmp_path / "delta0", tmp_path / "delta1"]
+    )
+    assert loadedPool.stateHash() == pool.stateHash()
+
+
+def test_snapshot_precisionEpochs(ledger, accounts, tmp_path):
+    print("the precisionEpochs setting is saved and restored by snapshots and deltas")
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    pool.precisionEpochs = True
+    runOperations(pool, accounts)
+    pool.save(tmp_path / "base")
+
+    # The loaded pool makes the same epoch transitions
+    loadedPool = ChainflipPool.load(tmp_path / "base", ledger)
+    assert loadedPool.precisionEpochs
+    runEpochSwaps(pool, accounts)
+    runEpochSwaps(loadedPool, accounts)
+    assert loadedPool.stateHash() == pool.stateHash()
+
+    pool.saveDelta(tmp_path / "delta")
+    pool.precisionEpochs = False
+    pool.saveDelta(tmp_path / "delta1")
+    loadedPool = ChainflipPool.load(tmp_path / "base", ledger, [tmp_path / "delta"])
+    assert loadedPool.precisionEpochs
+    assert loadedPool.stateHash() == pool.stateHash()
+    loadedPool = ChainflipPool.load(
+        tmp_path / "base", ledger, [tmp_path / "delta", tmp_path / "delta1"]
+    )
+    assert not loadedPool.precisionEpochs
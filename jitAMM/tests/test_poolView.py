@@ -0,0 +1,88 @@
+import copy
+import os
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.tests.test_uniswapPool import (
+    createLedger,
+    getAccountsFromLedger,
+    ledger,
+    accounts,
+)
+from ..src.ChainflipPool import *
+from ..src.PoolView import PoolView
+from .test_chainflipQuotes import createQuotePool
+
+AMOUNTS = [1, 1000, 10**15, 10**17, expandTo18Decimals(1) // 7, 10**19, 10**21]
+
+
+def checkViewMatchesPool(view, pool):
+    for zeroForOne in [True, False]:
+        amounts = AMOUNTS + [-amount for amount in AMOUNTS]
+        assert view.quoteLadder(zeroForOne, amounts) == pool.quoteLadder(
+            zeroForOne, amounts
+        )
+        for amount in amounts:
+            try:
+                quote = pool.quote(zeroForOne, amount)
+            except AssertionError:
+                quote = None
+            if quote == None:
+                tryExceptHandler(view.quote, "Swap would revert", zeroForOne, amount)
+            else:
+                assert view.quote(zeroForOne, amount) == quote
+
+    for tick in [-4000, -310, -61, 59, 700, 5000]:
+        sqrtPriceTargetX96 = TickMath.getSqrtRatioAtTick(tick)
+        assert view.amountToReachPrice(sqrtPriceTargetX96) == pool.amountToReachPrice(
+            sqrtPriceTargetX96
+        )
+    assert view.amountToReachPrice(pool.slot0.sqrtPriceX96) == (0, 0, [])
+    tryExceptHandler(
+        view.amountToReachPrice, "Target price out of range", TickMath.MAX_SQRT_RATIO
+    )
+
+
+def test_poolView_quotes(tmp_path):
+    print("quotes on a mapped snapshot match the ones of the pool")
+    pool, accounts = createQuotePool()
+    # Partially swap some limit orders
+    swapExact0For1(pool, expandTo18Decimals(1) // 2, accounts[0], None)
+
+    path = tmp_path / "pool.snapshot"
+    pool.save(path)
+    view = PoolView(path)
+    assert view.stateVersion == pool.stateVersion
+    assert (view.sqrtPriceX96, view.tick, view.liquidity) == (
+        pool.slot0.sqrtPriceX96,
+        pool.slot0.tick,
+        pool.liquidity,
+    )
+    assert list(view.rangeTicks) == sorted(pool.ticks)
+    assert list(view.limitTicks[True][0]) == sorted(pool.ticksLimitTokens0)
+    checkViewMatchesPool(view, pool)
+    view.close()
+
+
+def test_poolView_publish(tmp_path):
+    print("publishing a new snapshot doesn't affect existing views")
+    pool, accounts = createQuotePool()
+    path = tmp_path / "pool.snapshot"
+    pool.save(path)
+    view = PoolView(path)
+    assert not view.isStale()
+
+    poolBefore = copy.deepcopy(pool)
+    swapExact1For0(pool, expandTo18Decimals(1), accounts[0], None)
+    pool.save(path)
+    # No temporary files are left behind
+    assert os.listdir(tmp_path) == ["pool.snapshot"]
+
+    # The old view keeps working on the snapshot it mapped
+    assert view.isStale()
+    checkViewMatchesPool(view, poolBefore)
+
+    newView = PoolView(path)
+    assert not newView.isStale()
+    checkViewMatchesPool(newView, pool)
+    view.close()
+    newView.close()
@@ -0,0 +1,126 @@
+import multiprocessing
+
+from uniswapV3Python.tests.utilities import *
+from ..src.ChainflipPool import *
+from ..src.SharedBook import SharedBookWriter, SharedBookReader, joinLimbs
+from .test_chainflipQuotes import createQuotePool
+
+
+def checkBookMatchesPool(reader, pool):
+    assert reader.topOfBook() == pool.topOfBook()
+
+    for isToken0, ticksMap in [
+        (True, pool.ticksLimitTokens0),
+        (False, pool.ticksLimitTokens1),
+    ]:
+        ticks = sorted(t for t, info in ticksMap.items() if info.oneMinusPercSwap > 0)
+        if not isToken0:
+            ticks.reverse()
+        assert reader.depth(isToken0, 3) == [
+            (tick, TickLimit.getLiquidityLeft(ticksMap[tick])) for tick in ticks[:3]
+        ]
+
+    def getRangeTicks(state):
+        section = state.sections["rangeTicks"]
+        return (
+            state.stateVersion,
+            state.tick,
+            state.liquidity,
+            dict(
+                zip(
+                    section["ticks"].tolist(),
+                    joinLimbs(section["liquidityNetHi"], section["liquidityNetLo"]),
+                )
+            ),
+        )
+
+    assert reader.read(getRangeTicks) == (
+        pool.stateVersion,
+        pool.slot0.tick,
+        pool.liquidity,
+        {tick: info.liquidityNet for tick, info in pool.ticks.items()},
+    )
+
+
+def test_sharedBook_publish():
+    print("readers see the published state of the pool")
+    pool, accounts = createQuotePool()
+    writer = SharedBookWriter(pool, 16)
+    reader = SharedBookReader(writer.name)
+    try:
+        assert writer.publish()
+        checkBookMatchesPool(reader, pool)
+        # Nothing to publish if the pool hasn't changed
+        assert not writer.publish()
+
+        # Cross ticks on both sides of the book, moving the price below tick 0
+        swapExact0For1(pool, expandTo18Decimals(3), accounts[0], None)
+        assert pool.slot0.tick < 0
+        assert writer.publish()
+        checkBookMatchesPool(reader, pool)
+
+        swapExact1For0(pool, expandTo18Decimals(1), accounts[0], None)
+        pool.mintLimitOrder(TEST_TOKENS[1], accounts[1], -1200, expandTo18Decimals(1))
+        pool.burnLimitOrder(
+            TEST_TOKENS[1], accounts[1], -1200, expandTo18Decimals(1) // 2
+        )
+        writer.publish()
+        checkBookMatchesPool(reader, pool)
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_sharedBook_full():
+    pool, _ = createQuotePool()
+    writer = SharedBookWriter(pool, 4)
+    try:
+        tryExceptHandler(writer.publish, "Shared book full")
+    finally:
+        writer.close()
+
+
+def test_sharedBook_tornRead():
+    print("reads overlapping a publish are retried")
+    pool, accounts = createQuotePool()
+    writer = SharedBookWriter(pool, 16)
+    reader = SharedBookReader(writer.name)
+    try:
+        writer.publish()
+        versionBefore = pool.stateVersion
+        reads = []
+
+        def publishDuringRead(state):
+            reads.append(state.stateVersion)
+            if len(reads) == 1:
+                swapExact0For1(pool, expandTo18Decimals(1), accounts[0], None)
+                writer.publish()
+            return state.stateVersion
+
+        assert reader.read(publishDuringRead) == pool.stateVersion
+        assert reads == [versionBefore, pool.stateVersion]
+    finally:
+        reader.close()
+        writer.close()
+
+
+def readTopOfBook(name, queue):
+    reader = SharedBookReader(name)
+    queue.put(reader.topOfBook())
+    reader.close()
+
+
+def test_sharedBook_workerProcess():
+    print("worker processes read the book without the pool")
+    pool, _ = createQuotePool()
+    writer = SharedBookWriter(pool, 16)
+    try:
+        writer.publish()
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        process = context.Process(target=readTopOfBook, args=(writer.name, queue))
+        process.start()
+        assert queue.get(timeout=60) == pool.topOfBook()
+        process.join()
+    finally:
+        writer.close()
@@ -0,0 +1,109 @@
+import copy
+import io
+
+from uniswapV3Python.tests.utilities import *
+from uniswapV3Python.tests.test_uniswapPool import (
+    createLedger,
+    getAccountsFromLedger,
+    ledger,
+    accounts,
+)
+from ..src.ChainflipPool import *
+from ..src.PoolReplay import replay
+from ..src.libraries import StateDigest
+from .test_poolJournal import createJournaledPool, runOperations
+
+
+# Digest computed from scratch, hashing every entry of the pool
+def recomputeDigest(pool):
+    poolCopy = copy.deepcopy(pool)
+    poolCopy.stateDigest = StateDigest.StateDigest()
+    poolCopy.changedEntries = set(poolCopy._stateEntries())
+    return poolCopy.digest(), poolCopy.digestBuckets()
+
+
+def checkDigest(pool):
+    digest = pool.digest()
+    assert (digest, pool.digestBuckets()) == recomputeDigest(pool)
+    return digest
+
+
+def test_stateDigest_incremental(ledger, accounts):
+    print("the incremental digest matches the digest of the whole pool")
+    journalFile = io.BytesIO()
+    pool = createJournaledPool(ledger, journalFile)
+    digests = [checkDigest(pool)]
+
+    # Check the digest after every operation
+    for name in ["mint", "mintLimitOrder", "swap", "burn", "burnLimitOrder"]:
+        function = getattr(pool, name)
+
+        def checkedFunction(*args, function=function):
+            result = function(*args)
+            digests.append(checkDigest(pool))
+            return result
+
+        setattr(pool, name, checkedFunction)
+
+    runOperations(pool, accounts)
+    assert checkDigest(pool) not in digests[:-1]
+
+    # Same state reached in another process/order gives the same digest
+    (replayedPool, _) = replay(io.BytesIO(journalFile.getvalue()))
+    assert replayedPool.digest() == pool.digest()
+
+
+def test_stateDigest_snapshot(ledger, accounts, tmp_path):
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    runOperations(pool, accounts)
+    pool.save(tmp_path / "pool.snapshot")
+    loadedPool = ChainflipPool.load(tmp_path / "pool.snapshot", createLedger())
+    assert loadedPool.digest() == pool.digest()
+
+
+def test_stateDigest_divergence(ledger, accounts):
+    print("bucket digests locate where two replicas diverge")
+    pool = ChainflipPool(
+        TEST_TOKENS[0],
+        TEST_TOKENS[1],
+        FeeAmount.MEDIUM,
+        TICK_SPACINGS[FeeAmount.MEDIUM],
+        ledger,
+    )
+    runOperations(pool, accounts)
+    replica = copy.deepcopy(pool)
+    assert replica.digest() == pool.digest()
+
+    tick = 12000
+    replica.mintLimitOrder(TEST_TOKENS[0], accounts[2], tick, 1000)
+    assert replica.digest() != pool.digest()
+
+    (buckets, replicaBuckets) = (pool.digestBuckets(), replica.digestBuckets())
+    diverging = [
+        bucket
+        for bucket in set(buckets) | set(replicaBuckets)
+        if buckets.get(bucket) != replicaBuckets.get(bucket)
+    ]
+    assert diverging == [tick // StateDigest.BUCKET_TICKS]
+    assert pool.rangeDigest(-6000, 6000) == replica.rangeDigest(-6000, 6000)
+    assert pool.rangeDigest(-6000, tick) != replica.rangeDigest(-6000, tick)
+
+    (entries, replicaEntries) = (
+        pool.digestEntries(diverging[0]),
+        replica.digestEntries(diverging[0]),
+    )
+    assert set(replicaEntries) - set(entries) == {
+        ("limitTick", tick, True),
+        ("limitOrder", tick, True, accounts[2]),
+    }
+
+    # Removing the order brings the replica back
+    replica.burnLimitOrder(TEST_TOKENS[0], accounts[2], tick, 1000)
+    assert replica.digest() == pool.digest()
+    assert replica.digestEntries(diverging[0]) == entries
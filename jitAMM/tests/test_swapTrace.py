@@ -0,0 +1,57 @@
+import copy
+import csv
+import io
+
+from uniswapV3Python.tests.utilities import *
+from ..src.ChainflipPool import *
+from ..src.libraries.SwapTrace import *
+from .test_chainflipQuotes import createQuotePool
+
+
+def test_swapTrace_steps():
+    print("a traced swap records every step and doesn't change the swap")
+    pool, accounts = createQuotePool()
+    poolCopy = copy.deepcopy(pool)
+    amount = expandTo18Decimals(3)
+
+    # Small capacity so the columns need to grow
+    (result, trace) = pool.swapWithTrace(
+        accounts[0], True, amount, TickMath.MIN_SQRT_RATIO + 1, SwapTrace(2)
+    )
+    assert result == poolCopy.swap(
+        accounts[0], True, amount, TickMath.MIN_SQRT_RATIO + 1
+    )
+    assert pool.stateHash() == poolCopy.stateHash()
+    assert pool.swapTrace == None
+
+    steps = list(zip(*[getattr(trace, column)[: len(trace)] for column in COLUMNS]))
+    # Token1 limit orders from the best tick down, all of them crossed
+    limitSteps = [step for step in steps if step[0] == STEP_LIMIT]
+    assert [step[1] for step in limitSteps] == [300, 120, 60, 0, -60, -120, -300]
+    assert all(step[5] for step in limitSteps)
+    assert any(step[0] == STEP_RANGE and step[5] for step in steps)
+
+    # Exact input: the steps add up to the amount swapped in
+    assert steps[-1][0] == STEP_SETTLEMENT
+    assert sum(step[2] + step[4] for step in steps[:-1]) <= amount
+    assert steps[-1][2:4] == (amount, -result[2])
+    assert all(step[6] >= 0 for step in steps)
+
+
+def test_swapTrace_export():
+    pool, accounts = createQuotePool()
+    (_, trace) = pool.swapWithTrace(
+        accounts[0], False, expandTo18Decimals(1), TickMath.MAX_SQRT_RATIO - 1
+    )
+
+    columns = trace.toNumpy()
+    assert list(columns) == COLUMNS
+    assert all(len(values) == len(trace) for values in columns.values())
+    assert columns["amountOut"].tolist() == trace.amountOut[: len(trace)]
+
+    file = io.StringIO()
+    trace.toCsv(file)
+    rows = list(csv.reader(io.StringIO(file.getvalue())))
+    assert rows[0] == COLUMNS
+    assert len(rows) == len(trace) + 1
+    assert rows[-1][0] == "settlement"
@@ -0,0 +1,71 @@
+from ..src.Sweep import *
+from ..src.OrderFlow import generateOperations, OrderFlowConfig
+
+
+# Without exact output swaps, which revert when they partially fill a limit tick (see
+# LimitOrderSwapMath.computeSwapStep)
+def createWorkload(path, count):
+    with open(path, "w") as file:
+        Backtest.writeOperations(
+            file,
+            (
+                (index // 10, name, args)
+                for index, (name, args) in enumerate(
+                    generateOperations(
+                        11, OrderFlowConfig(exactOutputFraction=0), count
+                    )
+                )
+            ),
+            "jsonl",
+        )
+
+
+def test_sweep_placement():
+    operations = [
+        (0, "mint", ["lp", -70, 70, 1]),
+        (0, "mintLimitOrder", ["token0", "lp", 130, 1]),
+        (0, "mintLimitOrder", ["token1", "lp", -130, 1]),
+        (0, "swap", ["trader", True, 1, 1]),
+    ]
+    for strategy, ticks in [
+        ("nearest", [120, -120]),
+        ("passive", [180, -180]),
+        ("aggressive", [120, -120]),
+    ]:
+        placed = list(placeOperations(operations, "token0", 60, strategy))
+        assert placed[0] == (0, "mint", ["lp", -120, 120, 1])
+        assert [args[2] for _, _, args in placed[1:3]] == ticks
+        assert placed[3] == operations[3]
+
+
+def test_sweep_processes(tmp_path):
+    print("the sweep runs every configuration and matches running them one by one")
+    workload = tmp_path / "workload.jsonl"
+    createWorkload(workload, 300)
+    # Block validation also validates the final pool of every configuration
+    table = runSweep(
+        workload,
+        [500, 3000],
+        [10, 60],
+        ["nearest", "passive"],
+        workers=2,
+        validation=Backtest.VALIDATION_BLOCK,
+    )
+
+    assert [(row["fee"], row["tickSpacing"], row["strategy"]) for row in table] == [
+        (fee, tickSpacing, strategy)
+        for fee in [500, 3000]
+        for tickSpacing in [10, 60]
+        for strategy in ["nearest", "passive"]
+    ]
+    assert all(list(row) == COLUMNS for row in table)
+    assert all(row["operations"] == 301 and row["reverted"] < 30 for row in table)
+    for row in [table[0], table[-1]]:
+        sequentialRow = runConfiguration(
+            workload,
+            SweepConfiguration(row["fee"], row["tickSpacing"], row["strategy"]),
+            ("token0", "token1"),
+            validation=Backtest.VALIDATION_BLOCK,
+        )
+        del row["elapsed"], sequentialRow["elapsed"]
+        assert row == sequentialRow